@@ -0,0 +1,56 @@
+"""
+Configuración de gunicorn (se lee automáticamente desde el directorio de trabajo).
+
+Quotes wait on Mapbox (up to ROUTING_LATENCY_BUDGET_SECONDS) and address
+lookups on Nominatim. With the default sync workers each of those calls
+blocks a whole worker process, so the app runs on cooperative workers:
+
+- gthread (default): WEB_CONCURRENCY processes x GUNICORN_THREADS threads.
+  No extra dependencies; the DB pool is sized from the same variables
+  (src/utils/db_pool.py).
+- gevent (GUNICORN_WORKER_CLASS=gevent): up to GUNICORN_WORKER_CONNECTIONS
+  greenlets per process. Needs requirements-gevent.txt (gevent, psycogreen).
+  Greenlets beyond the DB pool size wait for a connection (DB_POOL_TIMEOUT_SECONDS).
+
+Server-Sent Events (/events/stream) hold their thread or greenlet for as long
+as the page stays open. Under gthread that takes a request thread away from
+everything else, so each worker serves at most SSE_MAX_STREAMS_PER_WORKER
+streams (half of GUNICORN_THREADS by default) and answers 503 beyond that;
+pages then work without live updates. To keep live updates for many users,
+run gevent, where the default limit is 500 streams per worker.
+
+`flask quote-load-test` (tools/load_test.py, DEV_COMMANDS_ENABLED) compares the
+worker classes against a local Mapbox stub.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 100))
+
+# Un worker bloqueado más de `timeout` segundos se reinicia
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 20))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recicla los workers periódicamente (acota fugas de memoria); el jitter evita reinicios simultáneos
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# The app is loaded in each worker (not preloaded in the master): schedulers,
+# process pools and DB connections are created after the fork, and the gevent
+# worker patches the standard library before the app is imported.
+preload_app = False
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("gevent workers without psycogreen: PostgreSQL queries block the whole worker")
+        else:
+            patch_psycopg()
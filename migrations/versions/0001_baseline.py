@@ -0,0 +1,71 @@
+"""Baseline schema: users, service_requests, pricing_config
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases created earlier with db.create_all() already have these tables:
+run `flask db stamp 0001_baseline` once on them, then `flask db upgrade`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fullname', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('password_hash', sa.String(length=256), nullable=False),
+        sa.Column('user_type', sa.String(length=20), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.Column('service_zones_json', sa.Text(), nullable=True),
+        sa.Column('accepted_vehicle_types_json', sa.Text(), nullable=True),
+        sa.Column('is_available', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table(
+        'pricing_config',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fixed_base_fare', sa.Float(), nullable=True),
+        sa.Column('fare_per_km', sa.Float(), nullable=True),
+        sa.Column('fare_per_minute', sa.Float(), nullable=True),
+        sa.Column('traffic_coefficient', sa.Float(), nullable=True),
+        sa.Column('admin_commission_percentage', sa.Float(), nullable=True),
+        sa.Column('vehicle_types_json', sa.Text(), nullable=True),
+        sa.Column('time_coefficients_json', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'service_requests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('guest_name', sa.String(length=100), nullable=True),
+        sa.Column('guest_phone', sa.String(length=20), nullable=True),
+        sa.Column('current_location', sa.String(length=255), nullable=False),
+        sa.Column('current_location_zone', sa.String(length=50), nullable=True),
+        sa.Column('destination', sa.String(length=255), nullable=False),
+        sa.Column('vehicle_type', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=30), nullable=False),
+        sa.Column('assigned_provider_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['assigned_provider_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('service_requests')
+    op.drop_table('pricing_config')
+    op.drop_table('users')
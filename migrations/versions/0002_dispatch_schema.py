@@ -0,0 +1,136 @@
+"""Dispatch schema: provider match tables, notifications, positions, quotes
+
+Revision ID: 0002_dispatch_schema
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:05:00
+
+Columns and tables added by the matching, pricing and dispatch work, with
+the indexes those features were written against.
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_dispatch_schema'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('last_latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('last_longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('last_location_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('service_requests') as batch_op:
+        batch_op.add_column(sa.Column('pickup_latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('pickup_longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('price', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('route_distance_meters', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('route_duration_seconds', sa.Float(), nullable=True))
+        batch_op.create_index('ix_service_requests_status_created_at', ['status', 'created_at'])
+        batch_op.create_index('ix_service_requests_user_updated_at', ['user_id', 'updated_at', 'id'])
+        batch_op.create_index('ix_service_requests_created_at_id', ['created_at', 'id'])
+
+    with op.batch_alter_table('pricing_config') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    provider_service_zones = op.create_table(
+        'provider_service_zones',
+        sa.Column('provider_id', sa.Integer(), nullable=False),
+        sa.Column('zone', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['provider_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('provider_id', 'zone')
+    )
+    op.create_index('ix_provider_service_zones_zone', 'provider_service_zones', ['zone', 'provider_id'])
+
+    provider_vehicle_types = op.create_table(
+        'provider_vehicle_types',
+        sa.Column('provider_id', sa.Integer(), nullable=False),
+        sa.Column('vehicle_type', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['provider_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('provider_id', 'vehicle_type')
+    )
+    op.create_index('ix_provider_vehicle_types_vehicle_type', 'provider_vehicle_types', ['vehicle_type', 'provider_id'])
+
+    # Existing providers only have the JSON lists: copy them into the new tables,
+    # otherwise find_matching_providers finds nobody until each profile is saved again
+    _backfill_provider_match_tables(provider_service_zones, provider_vehicle_types)
+
+    op.create_table(
+        'notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_request_id', sa.Integer(), nullable=False),
+        sa.Column('provider_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('viewed_at', sa.DateTime(), nullable=True),
+        sa.Column('responded_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['provider_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['service_request_id'], ['service_requests.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def _json_list(raw):
+    try:
+        values = json.loads(raw) if raw else []
+    except ValueError:
+        return []
+    return sorted({str(value) for value in values}) if isinstance(values, list) else []
+
+
+def _backfill_provider_match_tables(provider_service_zones, provider_vehicle_types):
+    users = sa.table(
+        'users',
+        sa.column('id', sa.Integer),
+        sa.column('user_type', sa.String),
+        sa.column('service_zones_json', sa.Text),
+        sa.column('accepted_vehicle_types_json', sa.Text),
+    )
+    rows = op.get_bind().execute(
+        sa.select(users.c.id, users.c.service_zones_json, users.c.accepted_vehicle_types_json)
+        .where(users.c.user_type == 'provider')
+    )
+    zones, vehicle_types = [], []
+    for provider_id, zones_json, vehicle_types_json in rows:
+        zones.extend({'provider_id': provider_id, 'zone': zone} for zone in _json_list(zones_json))
+        vehicle_types.extend(
+            {'provider_id': provider_id, 'vehicle_type': vehicle_type}
+            for vehicle_type in _json_list(vehicle_types_json)
+        )
+    if zones:
+        op.bulk_insert(provider_service_zones, zones)
+    if vehicle_types:
+        op.bulk_insert(provider_vehicle_types, vehicle_types)
+
+
+def downgrade():
+    op.drop_table('notifications')
+    op.drop_index('ix_provider_vehicle_types_vehicle_type', table_name='provider_vehicle_types')
+    op.drop_table('provider_vehicle_types')
+    op.drop_index('ix_provider_service_zones_zone', table_name='provider_service_zones')
+    op.drop_table('provider_service_zones')
+
+    with op.batch_alter_table('pricing_config') as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('service_requests') as batch_op:
+        batch_op.drop_index('ix_service_requests_created_at_id')
+        batch_op.drop_index('ix_service_requests_user_updated_at')
+        batch_op.drop_index('ix_service_requests_status_created_at')
+        batch_op.drop_column('route_duration_seconds')
+        batch_op.drop_column('route_distance_meters')
+        batch_op.drop_column('price')
+        batch_op.drop_column('pickup_longitude')
+        batch_op.drop_column('pickup_latitude')
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('last_location_at')
+        batch_op.drop_column('last_longitude')
+        batch_op.drop_column('last_latitude')
@@ -0,0 +1,47 @@
+"""Composite and partial indexes for the hot query paths
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_dispatch_schema
+Create Date: 2026-10-18 09:10:00
+
+On PostgreSQL the indexes are built CONCURRENTLY (outside the migration
+transaction) so dispatch and assignment keep writing while they build.
+`flask check-query-plans` verifies the queries actually use them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_path_indexes'
+down_revision = '0002_dispatch_schema'
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("status = 'Pending Assignment'")
+
+INDEXES = [
+    # (name, table, columns, partial WHERE)
+    ('ix_service_requests_user_created_at', 'service_requests', ['user_id', 'created_at', 'id'], None),
+    ('ix_service_requests_pending_created_at', 'service_requests', ['created_at'], PENDING),
+    ('ix_notifications_request_provider_status', 'notifications', ['service_request_id', 'provider_id', 'status'], None),
+    ('ix_notifications_provider_status', 'notifications', ['provider_id', 'status'], None),
+    ('ix_users_user_type_available', 'users', ['user_type', 'is_available'], None),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+                sqlite_where=where,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
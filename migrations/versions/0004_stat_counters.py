@@ -0,0 +1,32 @@
+"""Dashboard counters table
+
+Revision ID: 0004_stat_counters
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-18 09:20:00
+
+Run `flask rebuild-stats` once after upgrading to backfill the counters from
+the existing rows; from then on they are maintained on write.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_stat_counters'
+down_revision = '0003_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stat_counters',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('stat_counters')
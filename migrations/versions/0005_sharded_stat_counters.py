@@ -0,0 +1,49 @@
+"""Shard the dashboard counters
+
+Revision ID: 0005_sharded_stat_counters
+Revises: 0004_stat_counters
+Create Date: 2026-10-18 10:00:00
+
+Adds `shard` to the stat_counters primary key. Existing rows become shard 0;
+writers spread over STAT_COUNTER_SHARDS rows per counter from now on.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_sharded_stat_counters'
+down_revision = '0004_stat_counters'
+branch_labels = None
+depends_on = None
+
+
+def _create(name, sharded):
+    columns = [
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+    ]
+    if sharded:
+        columns.append(sa.Column('shard', sa.Integer(), nullable=False, server_default='0'))
+    columns.append(sa.Column('value', sa.BigInteger(), nullable=False))
+    op.create_table(name, *columns, sa.PrimaryKeyConstraint(*([c.name for c in columns[:-1]])))
+
+
+def upgrade():
+    _create('stat_counters_new', sharded=True)
+    op.execute(
+        "INSERT INTO stat_counters_new (name, key, shard, value) "
+        "SELECT name, key, 0, value FROM stat_counters"
+    )
+    op.drop_table('stat_counters')
+    op.rename_table('stat_counters_new', 'stat_counters')
+
+
+def downgrade():
+    _create('stat_counters_old', sharded=False)
+    op.execute(
+        "INSERT INTO stat_counters_old (name, key, value) "
+        "SELECT name, key, SUM(value) FROM stat_counters GROUP BY name, key"
+    )
+    op.drop_table('stat_counters')
+    op.rename_table('stat_counters_old', 'stat_counters')
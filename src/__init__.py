@@ -21,6 +21,10 @@ def create_app(config_class: type = Config) -> Flask:
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    # hash de contraseñas (perfil y pool); un perfil desconocido detiene el arranque
+    from src.utils.passwords import init_password_hashing
+    init_password_hashing(app)
+
     # ajustes de Flask-Login
     login_manager.login_view = "auth.login"
     login_manager.login_message = "Please log in to access this page."
@@ -34,6 +38,7 @@ def create_app(config_class: type = Config) -> Flask:
         api_bp,  
         service_assignment_bp,
         client_notifications_bp,
+        events_bp,
     )
     app.register_blueprint(main_bp)
     app.register_blueprint(user_bp)
@@ -41,6 +46,7 @@ def create_app(config_class: type = Config) -> Flask:
     app.register_blueprint(api_bp)
     app.register_blueprint(service_assignment_bp)
     app.register_blueprint(client_notifications_bp)
+    app.register_blueprint(events_bp)
 
         # ---- DEBUG: imprimir rutas una vez en los logs ----
     for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
@@ -53,9 +59,48 @@ def create_app(config_class: type = Config) -> Flask:
     # user_loader
     from src.models import User
 
+    # identidades cacheadas: sin consulta a la BD en cada petición autenticada
+    from src.utils.identity_cache import load_identity, install_identity_invalidation
+    install_identity_invalidation(app, db.session, User)
+
     @login_manager.user_loader
     def load_user(user_id: str | int):
-        return User.query.get(int(user_id))
+        return load_identity(app, user_id, db, User)
+
+    # expiración de solicitudes dentro del proceso; arranca con la primera
+    # petición para no lanzarlo en comandos CLI como `flask db upgrade`
+    if app.config.get("EXPIRY_SCHEDULER_ENABLED"):
+        @app.before_request
+        def start_expiry_scheduler():
+            from src.utils.expiry_scheduler import start_expiry_scheduler as start
+            from src.models import ServiceRequest, Notification
+            start(app, db, ServiceRequest, Notification)
+
+    # sesión de lectura (réplica) por contexto de aplicación
+    from src.utils.db_pool import close_read_session
+    app.teardown_appcontext(close_read_session)
+
+    # contadores del dashboard, mantenidos en la misma transacción que las filas
+    from src.models import StatCounter
+    from src.utils.stats import install_stat_counters, rebuild_stats_command
+    install_stat_counters(db.session, StatCounter)
+
+    # comandos CLI: `flask check-query-plans` (índices de las consultas críticas),
+    # `flask rebuild-stats` (recalcular los contadores del dashboard),
+    # `flask password-profiles` (coste de cada perfil de hash de contraseñas)
+    # `flask rebuild-provider-index` (tablas de zonas / vehículos desde el JSON)
+    from src.utils.query_plans import check_query_plans_command
+    from src.utils.passwords import password_profiles_command
+    from src.utils.service_assignment import rebuild_provider_index_command
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(password_profiles_command)
+    app.cli.add_command(rebuild_provider_index_command)
+
+    # benchmarks y pruebas de carga (tools/), sólo en desarrollo
+    if app.config.get("DEV_COMMANDS_ENABLED"):
+        from tools import register_commands
+        register_commands(app)
 
     # carga de modelos para Alembic
     with app.app_context():
@@ -66,13 +111,6 @@ def create_app(config_class: type = Config) -> Flask:
     def health():
         return "pong", 200
 
-    # Imprimir todas las rutas disponibles
-    @app.before_first_request
-    def log_routes():
-        routes = []
-        for rule in app.url_map.iter_rules():
-            routes.append(f"{rule.endpoint}: {rule.rule}")
-        app.logger.info(f"Available routes: {sorted(routes)}")
-
-
+    # Las rutas ya se registran en el log arriba, al crear la app (before_first_request
+    # no existe en Flask 3)
     return app
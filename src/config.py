@@ -1,6 +1,9 @@
 import os
+import tempfile
 from datetime import timedelta
 
+from src.utils.db_pool import build_engine_options, normalize_database_url
+
 class Config:
     # Básico
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_key')
@@ -8,16 +11,79 @@ class Config:
     # Configuración del entorno
     ENV = os.environ.get('FLASK_ENV', 'production')
     DEBUG = ENV == 'development'
+    # Comandos de desarrollo (benchmarks, pruebas de carga) del paquete tools/
+    DEV_COMMANDS_ENABLED = os.environ.get('DEV_COMMANDS_ENABLED', str(ENV == 'development')).lower() == 'true'
 
     # Base de datos
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    _raw_db_url = os.environ.get('DATABASE_URL')
-
-    if _raw_db_url and _raw_db_url.startswith('postgres://'):
-        _raw_db_url = _raw_db_url.replace('postgres://', 'postgresql://', 1)
+    _raw_db_url = normalize_database_url(os.environ.get('DATABASE_URL'))
 
     SQLALCHEMY_DATABASE_URI = _raw_db_url or 'sqlite:///app.db'
 
+    # Pool de conexiones (tamaño según WEB_CONCURRENCY / GUNICORN_THREADS, ver src/utils/db_pool.py)
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Réplica de lectura opcional para los listados (bind "replica")
+    _replica_db_url = normalize_database_url(os.environ.get('DATABASE_REPLICA_URL'))
+    SQLALCHEMY_BINDS = {
+        'replica': {'url': _replica_db_url, **build_engine_options(_replica_db_url)}
+    } if _replica_db_url else {}
+
+    # Caché de identidades de Flask-Login (user_loader sin consulta a la BD)
+    IDENTITY_CACHE_BACKEND = os.environ.get('IDENTITY_CACHE_BACKEND', 'memory')  # memory | sqlite
+    IDENTITY_CACHE_TTL_SECONDS = int(os.environ.get('IDENTITY_CACHE_TTL_SECONDS', 30))
+    IDENTITY_CACHE_MAX_ENTRIES = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', 10000))
+    IDENTITY_CACHE_PATH = os.environ.get('IDENTITY_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'townow_identity_cache.sqlite3'))
+
+    # Hash de contraseñas: perfil de coste (fast, interactive, default, strong, pbkdf2; ver
+    # src/utils/passwords.py) y pool de procesos opcional para no bloquear los hilos
+    PASSWORD_HASH_PROFILE = os.environ.get('PASSWORD_HASH_PROFILE', 'default')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+    # Rehash-on-login en segundo plano: trabajos pendientes como máximo (los demás se descartan)
+    PASSWORD_REHASH_MAX_PENDING = int(os.environ.get('PASSWORD_REHASH_MAX_PENDING', 32))
+
+    # Asignación de proveedores (búsqueda por cercanía)
+    PROVIDER_SEARCH_RADIUS_KM = float(os.environ.get('PROVIDER_SEARCH_RADIUS_KM', 10))
+    PROVIDER_SEARCH_MAX_RESULTS = int(os.environ.get('PROVIDER_SEARCH_MAX_RESULTS', 10))
+    PROVIDER_INDEX_REFRESH_SECONDS = int(os.environ.get('PROVIDER_INDEX_REFRESH_SECONDS', 30))
+
+    # Envío de alertas a proveedores en segundo plano
+    ALERT_DISPATCH_WORKERS = int(os.environ.get('ALERT_DISPATCH_WORKERS', 4))
+    ALERT_DISPATCH_QUEUE_SIZE = int(os.environ.get('ALERT_DISPATCH_QUEUE_SIZE', 1000))
+    ALERT_DISPATCH_MAX_RETRIES = int(os.environ.get('ALERT_DISPATCH_MAX_RETRIES', 3))
+
+    # Envío de alertas por oleadas (radio creciente, luego toda la zona)
+    DISPATCH_WAVES_ENABLED = os.environ.get('DISPATCH_WAVES_ENABLED', 'true').lower() == 'true'
+    DISPATCH_WAVE_SIZE = int(os.environ.get('DISPATCH_WAVE_SIZE', 5))
+    DISPATCH_WAVE_RADII_KM = os.environ.get('DISPATCH_WAVE_RADII_KM', '3,6,10')
+    DISPATCH_WAVE_TIMEOUT_SECONDS = int(os.environ.get('DISPATCH_WAVE_TIMEOUT_SECONDS', 45))
+
+    # Expiración de solicitudes sin proveedor (planificador dentro del proceso)
+    SERVICE_REQUEST_EXPIRY_MINUTES = int(os.environ.get('SERVICE_REQUEST_EXPIRY_MINUTES', 5))
+    EXPIRY_SCHEDULER_ENABLED = os.environ.get('EXPIRY_SCHEDULER_ENABLED', 'true').lower() == 'true'
+    EXPIRY_SCHEDULER_SYNC_SECONDS = int(os.environ.get('EXPIRY_SCHEDULER_SYNC_SECONDS', 30))
+    EXPIRY_SCHEDULER_FULL_SYNC_EVERY = int(os.environ.get('EXPIRY_SCHEDULER_FULL_SYNC_EVERY', 10))
+
+    # Server-Sent Events (/events/stream): con gthread cada stream retiene un hilo del worker,
+    # así que por defecto sólo la mitad de GUNICORN_THREADS; con gevent son greenlets baratos
+    SSE_MAX_STREAMS_PER_WORKER = int(os.environ.get(
+        'SSE_MAX_STREAMS_PER_WORKER',
+        500 if os.environ.get('GUNICORN_WORKER_CLASS') == 'gevent' else max(1, int(os.environ.get('GUNICORN_THREADS', 4)) // 2)
+    ))
+
+    # Cotización en lote (/api/pricing/calculate_batch)
+    PRICING_BATCH_MAX_POINTS = int(os.environ.get('PRICING_BATCH_MAX_POINTS', 25))
+
+    # Página de notificaciones del cliente (paginación por cursor)
+    CLIENT_NOTIFICATIONS_PAGE_SIZE = int(os.environ.get('CLIENT_NOTIFICATIONS_PAGE_SIZE', 20))
+
+    # Listados de la API (paginación por cursor, NDJSON en streaming)
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+    API_PAGE_SIZE_MAX = int(os.environ.get('API_PAGE_SIZE_MAX', 1000))
+    API_STREAM_CHUNK_SIZE = int(os.environ.get('API_STREAM_CHUNK_SIZE', 1000))
+    API_STREAM_MAX_ROWS = int(os.environ.get('API_STREAM_MAX_ROWS', 100000))  # tope de filas por respuesta NDJSON
+
     # Archivos subidos
     PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
     UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'src', 'static', 'uploads')
@@ -1,9 +1,16 @@
 from .user import User
 from .service_request import ServiceRequest
 from .pricing_config import PricingConfig
+from .notification import Notification
+from .provider_match import ProviderServiceZone, ProviderVehicleType
+from .stat_counter import StatCounter
 
 __all__ = [
     "User",
     "ServiceRequest",
     "PricingConfig",
+    "Notification",
+    "ProviderServiceZone",
+    "ProviderVehicleType",
+    "StatCounter",
 ]
@@ -1,49 +1,44 @@
 from src import db
-from flask_sqlalchemy import SQLAlchemy
 import datetime
-import json
-
 
 
 def init_notification_model(db_instance):
     """
-    Initialize the Notification model with the SQLAlchemy instance.
-    This function should be called from main.py after the db is created.
+    Kept for backwards compatibility with code that initialised the model by hand.
+    Notification is now a regular model bound to the shared db instance.
     """
-    global db
-    db = db_instance
-    
-    # Return the Notification class to be used in the application
     return Notification
 
-class Notification:
+
+class Notification(db.Model):
     """
     Model for storing notifications sent to providers about service requests.
     Used for tracking which providers have been notified about a service request
     and their response status.
-    
-    Note: This is a class definition that will be converted to a SQLAlchemy model
-    when init_notification_model is called.
     """
     __tablename__ = 'notifications'
-    
-    # These attributes will become SQLAlchemy columns when the model is initialized
-    id = None  # db.Column(db.Integer, primary_key=True)
-    service_request_id = None  # db.Column(db.Integer, db.ForeignKey('service_requests.id'), nullable=False)
-    provider_id = None  # db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    status = None  # db.Column(db.String(20), nullable=False, default='sent')
-    created_at = None  # db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    updated_at = None  # db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
-    viewed_at = None  # db.Column(db.DateTime, nullable=True)
-    responded_at = None  # db.Column(db.DateTime, nullable=True)
-    
-    # Relationships will be defined when the model is initialized
-    service_request = None  # db.relationship('ServiceRequest', backref=db.backref('notifications', lazy='dynamic'))
-    provider = None  # db.relationship('User', backref=db.backref('notifications_received', lazy='dynamic'))
-    
+    __table_args__ = (
+        # Accept / expiry / wave dispatch: service_request_id = ? [AND provider_id = ?] AND status = 'sent'
+        db.Index('ix_notifications_request_provider_status', 'service_request_id', 'provider_id', 'status'),
+        # Provider dashboard: provider_id = ? AND status = ?
+        db.Index('ix_notifications_provider_status', 'provider_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_request_id = db.Column(db.Integer, db.ForeignKey('service_requests.id'), nullable=False)
+    provider_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='sent')  # sent, accepted, rejected, expired
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    viewed_at = db.Column(db.DateTime, nullable=True)
+    responded_at = db.Column(db.DateTime, nullable=True)
+
+    service_request = db.relationship('ServiceRequest', backref=db.backref('notifications', lazy='dynamic'))
+    provider = db.relationship('User', backref=db.backref('notifications_received', lazy='dynamic'))
+
     def __repr__(self):
         return f'<Notification {self.id} for ServiceRequest {self.service_request_id} to Provider {self.provider_id}>'
-    
+
     def to_dict(self):
         """Convert notification to dictionary for API responses"""
         return {
@@ -56,6 +51,3 @@ class Notification:
             'viewed_at': self.viewed_at.isoformat() if self.viewed_at else None,
             'responded_at': self.responded_at.isoformat() if self.responded_at else None
         }
-
-# When the db instance is set, this will be the actual SQLAlchemy model
-Notification = type('Notification', (object,), dict(Notification.__dict__))
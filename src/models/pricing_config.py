@@ -14,5 +14,8 @@ class PricingConfig(db.Model):
     vehicle_types_json         = db.Column(db.Text, default="{}")
     time_coefficients_json     = db.Column(db.Text, default="{}")
 
+    # Se incrementa en cada cambio; los workers recompilan su PricingSnapshot al verlo cambiar
+    version                    = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
     def __repr__(self) -> str:  # útil para depurar
         return f"<PricingConfig id={self.id}>"
@@ -4,12 +4,75 @@ Dynamic Pricing Logic for TowNow using Mapbox Matrix API
 Reads configuration from a database object.
 """
 from src import db 
+from flask import current_app
 import datetime
 import requests
 import os
 import json # Ensure json is imported
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+
+from src.utils.http_client import http_client
+from src.utils.spatial_index import EARTH_RADIUS_KM, haversine_km
+from src.utils.ttl_cache import build_cache
 
 MAPBOX_ACCESS_TOKEN = os.environ.get("MAPBOX_ACCESS_TOKEN", "pk.eyJ1Ijoiam9hcXVpbmFsZSIsImEiOiJjbWFtbXh0OXkwbHdzMmtzZGpudXFreTdkIn0.o8lo9--pdwMvJrnz_rKuKg")
+# Base URL of the Mapbox API (overridable to point at a local stub, see `flask quote-load-test`)
+MAPBOX_API_URL = os.environ.get("MAPBOX_API_URL", "https://api.mapbox.com").rstrip("/")
+
+# Route cache: origin/destination are snapped to ROUTE_CACHE_PRECISION decimals
+# (3 decimals ~ 110 m) so repeated and nearby quotes reuse one Mapbox answer.
+# ROUTE_CACHE_BACKEND=sqlite shares entries between gunicorn workers on the host.
+ROUTE_CACHE_BACKEND = os.environ.get("ROUTE_CACHE_BACKEND", "memory")
+ROUTE_CACHE_PRECISION = int(os.environ.get("ROUTE_CACHE_PRECISION", 3))
+ROUTE_CACHE_TTL_SECONDS = int(os.environ.get("ROUTE_CACHE_TTL_SECONDS", 900))
+ROUTE_CACHE_MAX_ENTRIES = int(os.environ.get("ROUTE_CACHE_MAX_ENTRIES", 10000))
+ROUTE_CACHE_PATH = os.environ.get("ROUTE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "townow_cache.sqlite3"))
+
+# Matrix API coordinate limit per request (10 for driving-traffic, 25 for the other profiles)
+MAPBOX_MATRIX_MAX_COORDINATES = int(os.environ.get("MAPBOX_MATRIX_MAX_COORDINATES", 10))
+
+# Routing mode: "mapbox" (default, offline estimate as fallback) or "offline" (never call Mapbox).
+# ROUTING_LATENCY_BUDGET_SECONDS is the Mapbox timeout for a single quote; past it the estimate is used.
+ROUTING_MODE = os.environ.get("ROUTING_MODE", "mapbox")
+ROUTING_LATENCY_BUDGET_SECONDS = float(os.environ.get("ROUTING_LATENCY_BUDGET_SECONDS", 2.5))
+
+# Offline estimator: road distance ~ great-circle distance x circuity factor,
+# duration from an average speed (km/h) per time period of time_coefficients_json.
+ROAD_CIRCUITY_FACTOR = float(os.environ.get("ROAD_CIRCUITY_FACTOR", 1.35))
+AVERAGE_SPEED_KMH_BY_PERIOD = json.loads(os.environ.get(
+    "AVERAGE_SPEED_KMH_BY_PERIOD",
+    '{"peak_hours": 22.0, "night_hours": 45.0, "off_peak": 32.0}'
+))
+
+# Workers re-check PricingConfig.version at most this often before reusing their compiled snapshot
+PRICING_SNAPSHOT_CHECK_SECONDS = float(os.environ.get("PRICING_SNAPSHOT_CHECK_SECONDS", 5))
+
+# Matrix calls go through the shared pooled client (keep-alive, retries, circuit breaker)
+http_client.register("mapbox", MAPBOX_API_URL, read_timeout=10)
+
+# Provisional quotes prefetch their route in the background. At most
+# ROUTE_PREFETCH_MAX_PENDING prefetches are queued or running per process, one
+# per route cache key; the rest are dropped (the precise quote fetches it then).
+ROUTE_PREFETCH_MAX_PENDING = int(os.environ.get("ROUTE_PREFETCH_MAX_PENDING", 64))
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="route-prefetch")
+_prefetch_pending = set()  # route cache keys queued or being fetched
+_prefetch_lock = threading.Lock()
+
+route_cache = build_cache(
+    ROUTE_CACHE_BACKEND,
+    max_entries=ROUTE_CACHE_MAX_ENTRIES,
+    ttl_seconds=ROUTE_CACHE_TTL_SECONDS,
+    path=ROUTE_CACHE_PATH,
+    table="route_cache",
+)
 
 def get_time_coefficient(time_coefficients_config, current_dt=None):
     """
@@ -43,7 +106,148 @@ def get_time_coefficient(time_coefficients_config, current_dt=None):
                 
     return time_coefficients_config.get("off_peak", {}).get("coef", 1.0), "off_peak"
 
+@dataclass(frozen=True)
+class PricingSnapshot:
+    """
+    Immutable, pre-parsed copy of a PricingConfig row.
+    The time coefficient is resolved once per hour of the day, so pricing a
+    quote is two lookups instead of parsing JSON and walking every range.
+    """
+    config_id: object
+    version: object
+    fixed_base_fare: float
+    fare_per_km: float
+    fare_per_minute: float
+    traffic_coefficient: float
+    admin_commission_percentage: float
+    vehicle_coefficients: MappingProxyType
+    hour_coefficients: tuple   # 24 entries, index = hour of day
+    hour_period_names: tuple   # 24 entries, index = hour of day
+
+    def vehicle_coefficient(self, vehicle_type_key):
+        # Fallback to other, then 1.0
+        return self.vehicle_coefficients.get(vehicle_type_key, self.vehicle_coefficients.get("other", 1.0))
+
+    def time_coefficient(self, current_dt=None):
+        if current_dt is None:
+            current_dt = datetime.datetime.now()
+        return self.hour_coefficients[current_dt.hour], self.hour_period_names[current_dt.hour]
+
+def compile_pricing_config(pricing_config_db_object):
+    """
+    Builds a PricingSnapshot from a PricingConfig row (or any object with the same attributes).
+    Raises ValueError when the JSON columns cannot be parsed or have the wrong shape.
+    """
+    try:
+        vehicle_types_cfg = json.loads(pricing_config_db_object.vehicle_types_json or "{}")
+        time_coefficients_cfg = json.loads(pricing_config_db_object.time_coefficients_json or "{}")
+
+        hours = [
+            get_time_coefficient(time_coefficients_cfg, datetime.datetime(2000, 1, 1, hour))
+            for hour in range(24)
+        ]
+        vehicle_coefficients = MappingProxyType(dict(vehicle_types_cfg))
+    except (TypeError, KeyError, AttributeError) as e:
+        raise ValueError(f"malformed pricing configuration ({e})") from e
+    return PricingSnapshot(
+        config_id=getattr(pricing_config_db_object, "id", None),
+        version=getattr(pricing_config_db_object, "version", None),
+        fixed_base_fare=pricing_config_db_object.fixed_base_fare,
+        fare_per_km=pricing_config_db_object.fare_per_km,
+        fare_per_minute=pricing_config_db_object.fare_per_minute,
+        traffic_coefficient=pricing_config_db_object.traffic_coefficient,
+        admin_commission_percentage=getattr(pricing_config_db_object, "admin_commission_percentage", None),
+        vehicle_coefficients=vehicle_coefficients,
+        hour_coefficients=tuple(coef for coef, _ in hours),
+        hour_period_names=tuple(name for _, name in hours),
+    )
+
+def as_pricing_snapshot(pricing_config):
+    """Accepts a PricingSnapshot or a PricingConfig row; compiles the latter."""
+    if isinstance(pricing_config, PricingSnapshot):
+        return pricing_config
+    return compile_pricing_config(pricing_config)
+
+_snapshot_lock = threading.Lock()
+_snapshot_state = {"snapshot": None, "checked_at": 0.0}
+
+def get_pricing_snapshot(PricingConfig):
+    """
+    Returns the compiled snapshot of the active PricingConfig, shared by all
+    requests of this worker. The (id, version) pair is re-checked at most every
+    PRICING_SNAPSHOT_CHECK_SECONDS so edits made through another worker are picked up.
+    Returns None when no configuration exists. A configuration that does not
+    compile is logged and the previous snapshot is kept; without one the row
+    itself is returned, so the pricing functions answer with their error breakdown.
+    """
+    now = time.monotonic()
+    snapshot = _snapshot_state["snapshot"]
+    if snapshot is not None and now - _snapshot_state["checked_at"] < PRICING_SNAPSHOT_CHECK_SECONDS:
+        return snapshot
+
+    with _snapshot_lock:
+        current = db.session.query(PricingConfig.id, PricingConfig.version).order_by(PricingConfig.id).first()
+        if current is None:
+            _snapshot_state["snapshot"] = None
+            return None
+        snapshot = _snapshot_state["snapshot"]
+        if snapshot is None or (snapshot.config_id, snapshot.version) != tuple(current):
+            pricing_config = db.session.get(PricingConfig, current[0])
+            try:
+                compiled = compile_pricing_config(pricing_config)
+            except ValueError as e:
+                current_app.logger.error(f"PricingConfig {current[0]} (version {current[1]}) is invalid: {e}")
+                if snapshot is None:
+                    return pricing_config
+            else:
+                snapshot = _snapshot_state["snapshot"] = compiled
+        _snapshot_state["checked_at"] = time.monotonic()
+        return snapshot
+
+def invalidate_pricing_snapshot():
+    """Drops this worker's snapshot; call after committing a PricingConfig change."""
+    with _snapshot_lock:
+        _snapshot_state["snapshot"] = None
+        _snapshot_state["checked_at"] = 0.0
+
+def route_cache_key(origin_coords, destination_coords, precision=None):
+    """
+    Cache key for a route, with both points snapped to `precision` decimals.
+    origin_coords / destination_coords: tuple (longitude, latitude)
+    """
+    if precision is None:
+        precision = ROUTE_CACHE_PRECISION
+    return "{:.{p}f},{:.{p}f};{:.{p}f},{:.{p}f}".format(
+        float(origin_coords[0]), float(origin_coords[1]),
+        float(destination_coords[0]), float(destination_coords[1]),
+        p=precision,
+    )
+
+def get_route_cache_stats():
+    """Hit/miss counters of the route cache, for the metrics endpoint."""
+    stats = route_cache.stats()
+    stats["precision"] = ROUTE_CACHE_PRECISION
+    stats["ttl_seconds"] = ROUTE_CACHE_TTL_SECONDS
+    return stats
+
 def get_route_details_from_mapbox(origin_coords, destination_coords):
+    """
+    Fetches route distance and duration, from the route cache when possible,
+    otherwise from the Mapbox Matrix API. Only successful answers are cached.
+    origin_coords: tuple (longitude, latitude)
+    destination_coords: tuple (longitude, latitude)
+    """
+    key = route_cache_key(origin_coords, destination_coords)
+    cached = route_cache.get(key)
+    if cached is not None:
+        return cached[0], cached[1], None
+
+    distance_m, duration_s, error = _fetch_route_details_from_mapbox(origin_coords, destination_coords)
+    if error is None:
+        route_cache.set(key, [distance_m, duration_s])
+    return distance_m, duration_s, error
+
+def _fetch_route_details_from_mapbox(origin_coords, destination_coords):
     """
     Fetches route distance and duration from Mapbox Matrix API.
     origin_coords: tuple (longitude, latitude)
@@ -55,10 +259,10 @@ def get_route_details_from_mapbox(origin_coords, destination_coords):
     coords_str = f"{origin_coords[0]},{origin_coords[1]};{destination_coords[0]},{destination_coords[1]}"
     profile = "mapbox/driving-traffic"
     annotations = "distance,duration"
-    url = f"https://api.mapbox.com/directions-matrix/v1/{profile}/{coords_str}?annotations={annotations}&access_token={MAPBOX_ACCESS_TOKEN}"
+    url = f"{MAPBOX_API_URL}/directions-matrix/v1/{profile}/{coords_str}?annotations={annotations}&access_token={MAPBOX_ACCESS_TOKEN}"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = http_client.get("mapbox", url, deadline=ROUTING_LATENCY_BUDGET_SECONDS)
         response.raise_for_status()
         data = response.json()
         
@@ -76,47 +280,204 @@ def get_route_details_from_mapbox(origin_coords, destination_coords):
     except (KeyError, IndexError) as e:
         return None, None, f"Error parsing Mapbox response: {str(e)}"
 
-def calculate_dynamic_price(origin_coords, destination_coords, vehicle_type_key, pricing_config_db_object, current_dt=None):
+def _fetch_route_matrix_chunk(origins, destinations):
+    """
+    One Matrix API call for len(origins) x len(destinations) routes.
+    Returns (distances, durations, error) as row-major lists of lists.
+    """
+    if not MAPBOX_ACCESS_TOKEN:
+        return None, None, "Mapbox Access Token not configured"
+
+    coords = list(origins) + list(destinations)
+    coords_str = ";".join(f"{c[0]},{c[1]}" for c in coords)
+    sources = ";".join(str(i) for i in range(len(origins)))
+    targets = ";".join(str(len(origins) + j) for j in range(len(destinations)))
+    profile = "mapbox/driving-traffic"
+    url = (
+        f"{MAPBOX_API_URL}/directions-matrix/v1/{profile}/{coords_str}"
+        f"?annotations=distance,duration&sources={sources}&destinations={targets}"
+        f"&access_token={MAPBOX_ACCESS_TOKEN}"
+    )
+
+    try:
+        response = http_client.get("mapbox", url)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("code") != "Ok":
+            return None, None, data.get("message", "Mapbox API error")
+        return data["distances"], data["durations"], None
+    except requests.exceptions.RequestException as e:
+        return None, None, f"Mapbox request failed: {str(e)}"
+    except (KeyError, IndexError) as e:
+        return None, None, f"Error parsing Mapbox response: {str(e)}"
+
+def get_route_matrix_from_mapbox(origins, destinations):
+    """
+    Fetches distance and duration for every origin x destination pair.
+    Pairs already in the route cache are not requested again; the remaining
+    ones are coalesced into as few Matrix calls as the coordinate limit allows
+    (a single call while len(origins) + len(destinations) <= MAPBOX_MATRIX_MAX_COORDINATES).
+    origins / destinations: lists of (longitude, latitude)
+    Returns (distances_m, durations_s, error); cells are None when no route was found.
+    """
+    n, m = len(origins), len(destinations)
+    distances = [[None] * m for _ in range(n)]
+    durations = [[None] * m for _ in range(n)]
+
+    missing_origins, missing_destinations = set(), set()
+    for i, origin in enumerate(origins):
+        for j, destination in enumerate(destinations):
+            cached = route_cache.get(route_cache_key(origin, destination))
+            if cached is not None:
+                distances[i][j], durations[i][j] = cached
+            else:
+                missing_origins.add(i)
+                missing_destinations.add(j)
+
+    if not missing_origins:
+        return distances, durations, None
+
+    origin_idx = sorted(missing_origins)
+    destination_idx = sorted(missing_destinations)
+    limit = max(MAPBOX_MATRIX_MAX_COORDINATES, 2)
+    if len(origin_idx) + len(destination_idx) <= limit:
+        d_size, o_size = len(destination_idx), len(origin_idx)
+    else:
+        d_size = min(len(destination_idx), max(1, limit - min(len(origin_idx), limit // 2)))
+        o_size = limit - d_size
+
+    for oi in range(0, len(origin_idx), o_size):
+        o_chunk = origin_idx[oi:oi + o_size]
+        for di in range(0, len(destination_idx), d_size):
+            d_chunk = destination_idx[di:di + d_size]
+            chunk_distances, chunk_durations, error = _fetch_route_matrix_chunk(
+                [origins[i] for i in o_chunk], [destinations[j] for j in d_chunk]
+            )
+            if error:
+                return distances, durations, error
+            for a, i in enumerate(o_chunk):
+                for b, j in enumerate(d_chunk):
+                    distance_m, duration_s = chunk_distances[a][b], chunk_durations[a][b]
+                    distances[i][j], durations[i][j] = distance_m, duration_s
+                    if distance_m is not None and duration_s is not None:
+                        route_cache.set(route_cache_key(origins[i], destinations[j]), [distance_m, duration_s])
+
+    return distances, durations, None
+
+def estimate_route_details_offline(origin_coords, destination_coords, time_period_name="off_peak"):
+    """
+    Local route estimate, no network: great-circle distance times ROAD_CIRCUITY_FACTOR,
+    duration from the average speed configured for the time period.
+    origin_coords / destination_coords: tuple (longitude, latitude)
+    Returns (distance_meters, duration_seconds).
+    """
+    straight_km = haversine_km(
+        float(origin_coords[1]), float(origin_coords[0]),
+        float(destination_coords[1]), float(destination_coords[0]),
+    )
+    road_km = straight_km * ROAD_CIRCUITY_FACTOR
+    speed_kmh = AVERAGE_SPEED_KMH_BY_PERIOD.get(time_period_name, AVERAGE_SPEED_KMH_BY_PERIOD.get("off_peak", 30.0))
+    return road_km * 1000.0, road_km / speed_kmh * 3600.0
+
+def estimate_route_matrix_offline(origins, destinations, time_period_name="off_peak"):
+    """
+    estimate_route_details_offline for every origin x destination pair at once.
+    origins / destinations: sequences of (longitude, latitude)
+    Returns (distances_meters, durations_seconds) as len(origins) x len(destinations) arrays.
+    """
+    origins = np.radians(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=np.float64).reshape(-1, 2))
+    lon1, lat1 = origins[:, 0:1], origins[:, 1:2]   # column vectors: broadcast over destinations
+    lon2, lat2 = destinations[:, 0], destinations[:, 1]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    road_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a)) * ROAD_CIRCUITY_FACTOR
+    speed_kmh = AVERAGE_SPEED_KMH_BY_PERIOD.get(time_period_name, AVERAGE_SPEED_KMH_BY_PERIOD.get("off_peak", 30.0))
+    return road_km * 1000.0, road_km / speed_kmh * 3600.0
+
+def _nullable_lists(values):
+    """2-D float array -> nested lists, NaN (no route) as None."""
+    return np.where(np.isnan(values), None, values).tolist()
+
+def _prefetch_route(key, origin_coords, destination_coords):
+    """Warm the route cache in the background so the precise quote is a cache hit."""
+    try:
+        get_route_details_from_mapbox(origin_coords, destination_coords)
+    except Exception:
+        pass
+    finally:
+        with _prefetch_lock:
+            _prefetch_pending.discard(key)
+
+def schedule_route_prefetch(origin_coords, destination_coords):
+    """
+    Queues a background route fetch unless the route is cached, already queued,
+    or ROUTE_PREFETCH_MAX_PENDING prefetches are pending.
+    Returns True when a prefetch was queued.
+    """
+    key = route_cache_key(origin_coords, destination_coords)
+    if route_cache.get(key) is not None:
+        return False
+    with _prefetch_lock:
+        if key in _prefetch_pending or len(_prefetch_pending) >= ROUTE_PREFETCH_MAX_PENDING:
+            return False
+        _prefetch_pending.add(key)
+    _prefetch_executor.submit(_prefetch_route, key, origin_coords, destination_coords)
+    return True
+
+def calculate_dynamic_price(origin_coords, destination_coords, vehicle_type_key, pricing_config_db_object, current_dt=None, provisional=False):
     """
     Calculates the dynamic price using Mapbox Matrix API and DB-stored configuration.
-    pricing_config_db_object: The PricingConfig model instance from the database.
+    pricing_config_db_object: A PricingSnapshot (see get_pricing_snapshot) or a PricingConfig row.
+    provisional: Return the offline estimate right away and fetch the Mapbox route
+                 in the background, so the follow-up precise quote hits the cache.
+    When Mapbox fails or exceeds the latency budget, the offline estimate is used
+    instead (breakdown["route_source"] tells which one priced the quote).
     """
     if not pricing_config_db_object:
         return {"price": 999.98, "breakdown": {}, "error": "Pricing configuration not loaded"}
 
-    # Parse JSON fields from the database object
+    # Compiled once per config version (see get_pricing_snapshot); rows are compiled on the fly
     try:
-        vehicle_types_cfg = json.loads(pricing_config_db_object.vehicle_types_json)
-        time_coefficients_cfg = json.loads(pricing_config_db_object.time_coefficients_json)
-    except json.JSONDecodeError as e:
+        snapshot = as_pricing_snapshot(pricing_config_db_object)
+    except ValueError as e:
         return {"price": 999.97, "breakdown": {}, "error": f"Invalid JSON in pricing configuration: {str(e)}"}
 
-    distance_m, duration_s, mapbox_error = get_route_details_from_mapbox(origin_coords, destination_coords)
+    coef_time, time_period_name = snapshot.time_coefficient(current_dt)
+
+    mapbox_error = None
+    if provisional or ROUTING_MODE == "offline":
+        distance_m, duration_s = estimate_route_details_offline(origin_coords, destination_coords, time_period_name)
+        route_source = "estimate"
+        if provisional and ROUTING_MODE != "offline":
+            schedule_route_prefetch(origin_coords, destination_coords)
+    else:
+        distance_m, duration_s, mapbox_error = get_route_details_from_mapbox(origin_coords, destination_coords)
+        route_source = "mapbox"
+        if mapbox_error or distance_m is None or duration_s is None:
+            distance_m, duration_s = estimate_route_details_offline(origin_coords, destination_coords, time_period_name)
+            route_source = "estimate_fallback"
 
     breakdown = {
         "origin_coordinates": origin_coords,
         "destination_coordinates": destination_coords,
         "vehicle_type_key": vehicle_type_key,
         "mapbox_api_error": mapbox_error,
+        "route_source": route_source,
+        "provisional": route_source != "mapbox",
         "distance_meters": distance_m,
         "duration_seconds": duration_s,
     }
 
-    if mapbox_error or distance_m is None or duration_s is None:
-        breakdown["calculation_status"] = "Error or no route, Mapbox API issue"
-        return {"price": 999.99, "breakdown": breakdown, "error": mapbox_error or "No route/distance data from Mapbox"}
-
     distance_km = distance_m / 1000.0
     duration_minutes = duration_s / 60.0
 
-    coef_vehicle = vehicle_types_cfg.get(vehicle_type_key, vehicle_types_cfg.get("other", 1.0)) # Fallback to other, then 1.0
-    coef_time, time_period_name = get_time_coefficient(time_coefficients_cfg, current_dt)
-    coef_traffic = pricing_config_db_object.traffic_coefficient
+    coef_vehicle = snapshot.vehicle_coefficient(vehicle_type_key)
+    coef_traffic = snapshot.traffic_coefficient
 
     price_calculated = (
-        pricing_config_db_object.fixed_base_fare +
-        (distance_km * pricing_config_db_object.fare_per_km) +
-        (duration_minutes * pricing_config_db_object.fare_per_minute)
+        snapshot.fixed_base_fare +
+        (distance_km * snapshot.fare_per_km) +
+        (duration_minutes * snapshot.fare_per_minute)
     )
     
     final_price = price_calculated * coef_vehicle * coef_time * coef_traffic
@@ -125,9 +486,9 @@ def calculate_dynamic_price(origin_coords, destination_coords, vehicle_type_key,
         "calculation_status": "Success",
         "distance_km": round(distance_km, 2),
         "duration_minutes": round(duration_minutes, 2),
-        "fixed_base_fare": pricing_config_db_object.fixed_base_fare,
-        "fare_per_km": pricing_config_db_object.fare_per_km,
-        "fare_per_minute": pricing_config_db_object.fare_per_minute,
+        "fixed_base_fare": snapshot.fixed_base_fare,
+        "fare_per_km": snapshot.fare_per_km,
+        "fare_per_minute": snapshot.fare_per_minute,
         "price_before_coefficients": round(price_calculated, 2),
         "coef_vehicle": coef_vehicle,
         "time_period_name": time_period_name,
@@ -139,6 +500,84 @@ def calculate_dynamic_price(origin_coords, destination_coords, vehicle_type_key,
 
     return {"price": round(final_price, 2), "breakdown": breakdown, "error": None}
 
+def quote_service_request(service_request, origin_coords, destination_coords, pricing_config_db_object):
+    """
+    Prices a service request and stores the quote on it: price, route_distance_meters
+    and route_duration_seconds (the inputs bulk repricing works from). Not committed.
+    origin_coords / destination_coords: tuple (longitude, latitude)
+    Returns the calculate_dynamic_price result; on error nothing is stored.
+    """
+    result = calculate_dynamic_price(
+        origin_coords, destination_coords, service_request.vehicle_type, pricing_config_db_object
+    )
+    if result["error"] is None:
+        service_request.price = result["price"]
+        service_request.route_distance_meters = result["breakdown"]["distance_meters"]
+        service_request.route_duration_seconds = result["breakdown"]["duration_seconds"]
+    return result
+
+def calculate_dynamic_price_batch(origins, destinations, vehicle_type_key, pricing_config_db_object, current_dt=None):
+    """
+    Prices every origin x destination pair with one Matrix lookup.
+    The coefficients are resolved once and the fare formula runs as NumPy array
+    math over the whole table; cells without a route are NaN until serialized.
+    Returns {"prices": [[...]], "distances_km": [[...]], "durations_minutes": [[...]], "breakdown": {...}, "error": ...};
+    cells without a route are None.
+    """
+    if not pricing_config_db_object:
+        return {"prices": None, "breakdown": {}, "error": "Pricing configuration not loaded"}
+
+    try:
+        snapshot = as_pricing_snapshot(pricing_config_db_object)
+    except ValueError as e:
+        return {"prices": None, "breakdown": {}, "error": f"Invalid JSON in pricing configuration: {str(e)}"}
+
+    coef_time, time_period_name = snapshot.time_coefficient(current_dt)
+
+    mapbox_error = None
+    if ROUTING_MODE == "offline":
+        route_source = "estimate"
+    else:
+        distances_m, durations_s, mapbox_error = get_route_matrix_from_mapbox(origins, destinations)
+        route_source = "estimate_fallback" if mapbox_error else "mapbox"
+    if route_source != "mapbox":
+        distances_m, durations_s = estimate_route_matrix_offline(origins, destinations, time_period_name)
+    else:
+        # None (no route) -> NaN, which propagates through the formula
+        shape = (len(origins), len(destinations))
+        distances_m = np.array(distances_m, dtype=np.float64).reshape(shape)
+        durations_s = np.array(durations_s, dtype=np.float64).reshape(shape)
+
+    coef_vehicle = snapshot.vehicle_coefficient(vehicle_type_key)
+    coef_traffic = snapshot.traffic_coefficient
+    multiplier = coef_vehicle * coef_time * coef_traffic
+    base = snapshot.fixed_base_fare
+    per_km = snapshot.fare_per_km / 1000.0      # per meter
+    per_minute = snapshot.fare_per_minute / 60.0  # per second
+
+    prices = np.round((base + distances_m * per_km + durations_s * per_minute) * multiplier, 2)
+
+    return {
+        "prices": _nullable_lists(prices),
+        "distances_km": _nullable_lists(np.round(distances_m / 1000.0, 2)),
+        "durations_minutes": _nullable_lists(np.round(durations_s / 60.0, 2)),
+        "breakdown": {
+            "origins": origins,
+            "destinations": destinations,
+            "vehicle_type_key": vehicle_type_key,
+            "mapbox_api_error": mapbox_error,
+            "route_source": route_source,
+            "fixed_base_fare": base,
+            "fare_per_km": snapshot.fare_per_km,
+            "fare_per_minute": snapshot.fare_per_minute,
+            "coef_vehicle": coef_vehicle,
+            "time_period_name": time_period_name,
+            "coef_time": coef_time,
+            "coef_traffic": coef_traffic,
+        },
+        "error": None,
+    }
+
 # Example Usage (for testing - requires a mock or real DB object)
 if __name__ == "__main__":
     print("This script is intended to be used as a module.")
@@ -0,0 +1,35 @@
+from src import db
+
+
+class ProviderServiceZone(db.Model):
+    """
+    Normalized (provider, zone) pairs mirroring User.service_zones_json.
+    Kept in sync by User.set_service_zones so matching can use an indexed join.
+    """
+    __tablename__ = 'provider_service_zones'
+    __table_args__ = (
+        db.Index('ix_provider_service_zones_zone', 'zone', 'provider_id'),
+    )
+
+    provider_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    zone = db.Column(db.String(50), primary_key=True)
+
+    def __repr__(self):
+        return f"<ProviderServiceZone provider_id={self.provider_id} zone={self.zone}>"
+
+
+class ProviderVehicleType(db.Model):
+    """
+    Normalized (provider, vehicle type) pairs mirroring User.accepted_vehicle_types_json.
+    Kept in sync by User.set_accepted_vehicle_types.
+    """
+    __tablename__ = 'provider_vehicle_types'
+    __table_args__ = (
+        db.Index('ix_provider_vehicle_types_vehicle_type', 'vehicle_type', 'provider_id'),
+    )
+
+    provider_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    vehicle_type = db.Column(db.String(50), primary_key=True)
+
+    def __repr__(self):
+        return f"<ProviderVehicleType provider_id={self.provider_id} vehicle_type={self.vehicle_type}>"
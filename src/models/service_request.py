@@ -2,16 +2,39 @@ from src import db
 
 class ServiceRequest(db.Model):
     __tablename__ = 'service_requests'
+    __table_args__ = (
+        # Expiry sweep: status = 'Pending Assignment' AND created_at < cutoff
+        db.Index('ix_service_requests_status_created_at', 'status', 'created_at'),
+        # Client notifications page: user_id = ? ORDER BY updated_at DESC, id DESC (keyset)
+        db.Index('ix_service_requests_user_updated_at', 'user_id', 'updated_at', 'id'),
+        # /api/service_requests: ORDER BY created_at DESC, id DESC (keyset)
+        db.Index('ix_service_requests_created_at_id', 'created_at', 'id'),
+        # /api/service_requests for customers: user_id = ? ORDER BY created_at DESC, id DESC
+        db.Index('ix_service_requests_user_created_at', 'user_id', 'created_at', 'id'),
+        # Expiry scheduler sync: only the (few) pending requests (filtered on updated_at)
+        db.Index(
+            'ix_service_requests_pending_created_at', 'created_at',
+            postgresql_where=db.text("status = 'Pending Assignment'"),
+            sqlite_where=db.text("status = 'Pending Assignment'")
+        ),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     guest_name = db.Column(db.String(100), nullable=True)
     guest_phone = db.Column(db.String(20), nullable=True)
     current_location = db.Column(db.String(255), nullable=False)
-    current_location_zone = db.Column(db.String(50), nullable=True)
+    # active_history: the stats counters need the previous value of these on change
+    current_location_zone = db.column_property(db.Column(db.String(50), nullable=True), active_history=True)
+    pickup_latitude = db.Column(db.Float, nullable=True)
+    pickup_longitude = db.Column(db.Float, nullable=True)
     destination = db.Column(db.String(255), nullable=False)
     vehicle_type = db.Column(db.String(50), nullable=True)
-    status = db.Column(db.String(30), nullable=False, default="pending") # e.g. pending, assigned, completed, cancelled
+    price = db.Column(db.Float, nullable=True)  # Quoted total price
+    route_distance_meters = db.Column(db.Float, nullable=True)  # Stored with the quote, used for bulk repricing
+    route_duration_seconds = db.Column(db.Float, nullable=True)
+    status = db.column_property(db.Column(db.String(30), nullable=False, default="pending"), active_history=True) # e.g. pending, assigned, completed, cancelled
     assigned_provider_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    provider_id = db.synonym('assigned_provider_id')  # name used by the assignment routes and templates
     created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
     # Puedes agregar otros campos según el crecimiento de la app
@@ -24,8 +47,11 @@ class ServiceRequest(db.Model):
             'guest_phone': self.guest_phone,
             'current_location': self.current_location,
             'current_location_zone': self.current_location_zone,
+            'pickup_latitude': self.pickup_latitude,
+            'pickup_longitude': self.pickup_longitude,
             'destination': self.destination,
             'vehicle_type': self.vehicle_type,
+            'price': self.price,
             'status': self.status,
             'assigned_provider_id': self.assigned_provider_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
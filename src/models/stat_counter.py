@@ -0,0 +1,19 @@
+from src import db
+
+
+class StatCounter(db.Model):
+    """
+    Rolling counters for the admin dashboard, e.g. ('requests_by_status', 'Assigned') -> 42.
+    Maintained in the same transaction as the rows they count (see src/utils/stats.py),
+    so the dashboard reads a handful of rows instead of running COUNT(*) over the tables.
+    A counter is the sum of its shard rows (writers spread over shards to avoid lock waits).
+    """
+    __tablename__ = 'stat_counters'
+
+    name = db.Column(db.String(50), primary_key=True)   # requests_by_status, requests_by_zone, ...
+    key = db.Column(db.String(100), primary_key=True)   # status, zone, hour bucket, ...
+    shard = db.Column(db.Integer, primary_key=True, default=0, server_default='0')
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StatCounter {self.name}[{self.key}]#{self.shard}={self.value}>"
@@ -1,51 +1,87 @@
 from src import db 
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 import json
 
+from src.utils.passwords import hash_password, needs_rehash, verify_password
+from src.utils.serialization import decode_json_list
+from .provider_match import ProviderServiceZone, ProviderVehicleType
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Provider matching / spatial index load: user_type = 'provider' AND is_available
+        db.Index('ix_users_user_type_available', 'user_type', 'is_available'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     fullname = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
-    user_type = db.Column(db.String(20), nullable=False, default='customer')  # 'customer', 'provider', 'admin'
+    # active_history on user_type / is_available: the stats counters need the previous value on change
+    user_type = db.column_property(db.Column(db.String(20), nullable=False, default='customer'), active_history=True)  # 'customer', 'provider', 'admin'
     is_admin = db.Column(db.Boolean, default=False)
 
     # Provider-specific fields (nullable if user is not a provider)
     service_zones_json = db.Column(db.Text, nullable=True)  # JSON string for list of zones, e.g., ["D1", "D2", "Lucan"]
     accepted_vehicle_types_json = db.Column(db.Text, nullable=True)  # JSON string for list of vehicle types, e.g., ["sedan", "suv"]
-    is_available = db.Column(db.Boolean, nullable=True, default=True)  # Provider availability status
+    is_available = db.column_property(db.Column(db.Boolean, nullable=True, default=True), active_history=True)  # Provider availability status
+    last_latitude = db.Column(db.Float, nullable=True)  # Last position ping from the provider app
+    last_longitude = db.Column(db.Float, nullable=True)
+    last_location_at = db.Column(db.DateTime, nullable=True)
+
+    # Normalized copies of the JSON lists above, used by find_matching_providers
+    service_zone_links = db.relationship('ProviderServiceZone', cascade='all, delete-orphan', passive_deletes=True)
+    vehicle_type_links = db.relationship('ProviderVehicleType', cascade='all, delete-orphan', passive_deletes=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the hash was made with other parameters than the current profile."""
+        return needs_rehash(self.password_hash)
     
+    def _decoded_list(self, column):
+        # Decoded lists are cached on the instance, keyed by the raw JSON text,
+        # so repeated calls (to_dict, spatial index, matching) parse it once
+        raw = getattr(self, column)
+        cache = self.__dict__.setdefault('_decoded_json_cache', {})
+        cached = cache.get(column)
+        if cached is None or cached[0] is not raw:
+            cached = (raw, decode_json_list(raw))
+            cache[column] = cached
+        return list(cached[1])
+
     def get_service_zones(self):
-        if self.service_zones_json:
-            try:
-                return json.loads(self.service_zones_json)
-            except json.JSONDecodeError:
-                return []
-        return []
+        return self._decoded_list('service_zones_json')
 
     def set_service_zones(self, zones_list):
         self.service_zones_json = json.dumps(zones_list)
+        self.__dict__.get('_decoded_json_cache', {}).pop('service_zones_json', None)
+        wanted = set(zones_list or [])
+        # Diff instead of replacing the collection so unchanged rows are not deleted and re-inserted
+        for link in list(self.service_zone_links):
+            if link.zone not in wanted:
+                self.service_zone_links.remove(link)
+        existing = {link.zone for link in self.service_zone_links}
+        for zone in wanted - existing:
+            self.service_zone_links.append(ProviderServiceZone(zone=zone))
 
     def get_accepted_vehicle_types(self):
-        if self.accepted_vehicle_types_json:
-            try:
-                return json.loads(self.accepted_vehicle_types_json)
-            except json.JSONDecodeError:
-                return []
-        return []
+        return self._decoded_list('accepted_vehicle_types_json')
 
     def set_accepted_vehicle_types(self, vehicle_types_list):
         self.accepted_vehicle_types_json = json.dumps(vehicle_types_list)
+        self.__dict__.get('_decoded_json_cache', {}).pop('accepted_vehicle_types_json', None)
+        wanted = set(vehicle_types_list or [])
+        for link in list(self.vehicle_type_links):
+            if link.vehicle_type not in wanted:
+                self.vehicle_type_links.remove(link)
+        existing = {link.vehicle_type for link in self.vehicle_type_links}
+        for vehicle_type in wanted - existing:
+            self.vehicle_type_links.append(ProviderVehicleType(vehicle_type=vehicle_type))
 
     def __repr__(self):
         return f'<User {self.fullname} ({self.email})>'
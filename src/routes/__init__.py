@@ -4,6 +4,7 @@ from .admin import admin_bp
 from .api import api_bp  
 from .service_assignment import service_assignment_bp
 from .client_notifications import client_notifications_bp
+from .events import events_bp
 
 __all__ = [
     "main_bp",
@@ -12,5 +13,6 @@ __all__ = [
     "api_bp",
     "service_assignment_bp",
     "client_notifications_bp",
+    "events_bp",
 ]
 
@@ -1,11 +1,15 @@
 from functools import wraps
 from flask import (
     Blueprint, render_template,
-    request, redirect, url_for, flash,
+    request, redirect, url_for, flash, jsonify,
 )
 from flask_login import login_required, current_user
 from src import db                                   # la única instancia
-from src.models import User, ServiceRequest, PricingConfig
+from src.models import User, ServiceRequest, PricingConfig, StatCounter
+from src.models.pricing_logic import invalidate_pricing_snapshot
+from src.utils.db_pool import get_read_session
+from src.utils.stats import read_counters, recent_hours
+from sqlalchemy import select
 
 
 admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin')
@@ -25,9 +29,30 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    user_count = User.query.count()
-    request_count = ServiceRequest.query.count()
-    return render_template('admin/dashboard.html', user_count=user_count, request_count=request_count)
+    # Counters maintained on write (src/utils/stats.py): no COUNT(*) over the tables
+    counters = read_counters(db, StatCounter)
+    return render_template(
+        'admin/dashboard.html',
+        user_count=sum(counters['users_by_type'].values()),
+        request_count=sum(counters['requests_by_status'].values()),
+        available_providers=counters['providers_available'].get('available', 0),
+        requests_by_status=sorted(counters['requests_by_status'].items()),
+        requests_by_zone=sorted(counters['requests_by_zone'].items(), key=lambda item: -item[1])[:10],
+        requests_by_hour=recent_hours(counters),
+    )
+
+@admin_bp.route('/stats')
+@login_required
+@admin_required
+def stats():
+    """Live counters for the dashboard (polled by the page)."""
+    counters = read_counters(db, StatCounter, ['users_by_type', 'providers_available', 'requests_by_status'])
+    return jsonify({
+        'user_count': sum(counters['users_by_type'].values()),
+        'request_count': sum(counters['requests_by_status'].values()),
+        'available_providers': counters['providers_available'].get('available', 0),
+        'requests_by_status': counters['requests_by_status'],
+    })
 
 @admin_bp.route('/manage_users')
 @login_required
@@ -40,7 +65,10 @@ def manage_users():
 @login_required
 @admin_required
 def manage_requests():
-    requests = ServiceRequest.query.order_by(ServiceRequest.created_at.desc()).all()
+    # Listado de sólo lectura: réplica si está configurada
+    requests = get_read_session(db).execute(
+        select(ServiceRequest).order_by(ServiceRequest.created_at.desc())
+    ).scalars().all()
     return render_template('admin/manage_requests.html', requests=requests)
 
 @admin_bp.route('/manage_pricing', methods=['GET', 'POST'])
@@ -54,7 +82,9 @@ def manage_pricing():
         config.fare_per_minute = float(request.form.get('fare_per_minute', config.fare_per_minute))
         config.traffic_coefficient = float(request.form.get('traffic_coefficient', config.traffic_coefficient))
         config.admin_commission_percentage = float(request.form.get('admin_commission_percentage', config.admin_commission_percentage))
+        config.version = (config.version or 0) + 1
         db.session.commit()
+        invalidate_pricing_snapshot()
         flash("Pricing configuration updated successfully.", "success")
         return redirect(url_for('admin_bp.manage_pricing'))
     return render_template('admin/manage_pricing.html', config=config)
@@ -1,13 +1,34 @@
 # src/routes/api.py
+import math
 from datetime import datetime
-from flask import Blueprint, jsonify, request, abort
+from flask import Blueprint, jsonify, request, abort, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from src import db
-from src.models import User, ServiceRequest
-from src.models.pricing_logic import calculate_dynamic_price
+from src.models import User, ServiceRequest, PricingConfig
+from src.models.pricing_logic import (
+    calculate_dynamic_price, calculate_dynamic_price_batch, get_pricing_snapshot, quote_service_request
+)
+from src.utils.serialization import (
+    SERVICE_REQUEST_FIELDS, USER_FIELDS, PROVIDER_FIELDS, dumps, json_response, rows_to_dicts, user_rows_to_dicts
+)
 
 api_bp = Blueprint("api_bp", __name__, url_prefix="/api")
 
+
+def _coordinate_pair(value):
+    """
+    [longitude, latitude] from a request body -> (lon, lat) floats.
+    Raises ValueError unless it is a pair of finite numbers within range.
+    """
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError("expected [longitude, latitude]")
+    if any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in value):
+        raise ValueError("coordinates must be numbers")
+    lon, lat = float(value[0]), float(value[1])
+    if not (math.isfinite(lon) and math.isfinite(lat) and -180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError("coordinates out of range")
+    return lon, lat
+
 # ---------- Health ----------
 @api_bp.route("/health")
 def health_check():
@@ -19,8 +40,11 @@ def health_check():
 def api_users():
     if not current_user.is_admin:
         abort(403)
-    users = User.query.all()
-    return jsonify([u.to_dict() for u in users])
+    from sqlalchemy import select
+    rows = db.session.execute(
+        select(*(getattr(User, c) for c in USER_FIELDS + PROVIDER_FIELDS)).order_by(User.id)
+    ).all()
+    return json_response(user_rows_to_dicts(rows))
 
 @api_bp.route("/users/<int:user_id>", methods=["GET"])
 @login_required
@@ -52,6 +76,24 @@ def api_user_delete(user_id):
     db.session.commit()
     return jsonify({"deleted": True})
 
+# ---------- Provider position ----------
+@api_bp.route("/providers/me/position", methods=["POST"])
+@login_required
+def api_provider_position():
+    if current_user.user_type != "provider":
+        abort(403)
+    data = request.json or {}
+    try:
+        lat = float(data["lat"])
+        lon = float(data["lon"])
+    except (KeyError, TypeError, ValueError):
+        abort(400)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        abort(400)
+    from src.utils.service_assignment import record_provider_position
+    record_provider_position(current_user.as_user(), lat, lon, db)
+    return jsonify({"ok": True})
+
 # ---------- Service Requests ----------
 @api_bp.route("/service_requests", methods=["POST"])
 def api_create_service_request():
@@ -64,16 +106,38 @@ def api_create_service_request():
         guest_name = data.get("guest_name")
         guest_phone = data.get("guest_phone")
 
+    pickup_latitude, pickup_longitude = data.get("pickup_latitude"), data.get("pickup_longitude")
+    if pickup_latitude is not None or pickup_longitude is not None:
+        try:
+            # Numeric strings are accepted, as they were before the coordinates were validated
+            pickup_longitude, pickup_latitude = _coordinate_pair([float(pickup_longitude), float(pickup_latitude)])
+        except (TypeError, ValueError):
+            abort(400)
+
+    zone = data.get("current_location_zone")
+    if not zone and pickup_latitude is not None:
+        from src.utils.geocode import zone_for_coordinates
+        zone = zone_for_coordinates(pickup_latitude, pickup_longitude)
+
     req = ServiceRequest(
         user_id=user_id,
         guest_name=guest_name,
         guest_phone=guest_phone,
         current_location=data["current_location"],
-        current_location_zone=data.get("current_location_zone"),
+        current_location_zone=zone,
+        pickup_latitude=pickup_latitude,
+        pickup_longitude=pickup_longitude,
         destination=data["destination"],
         vehicle_type=data.get("vehicle_type"),
         status="pending",
     )
+    # Con destination_coordinates ([lon, lat]) y el punto de recogida se guarda la cotización
+    if data.get("destination_coordinates") is not None and pickup_latitude is not None:
+        try:
+            destination = _coordinate_pair(data["destination_coordinates"])
+        except ValueError:
+            abort(400)
+        quote_service_request(req, (pickup_longitude, pickup_latitude), destination, get_pricing_snapshot(PricingConfig))
     db.session.add(req)
     db.session.commit()
     return jsonify(req.to_dict()), 201
@@ -81,13 +145,69 @@ def api_create_service_request():
 @api_bp.route("/service_requests", methods=["GET"])
 @login_required
 def api_get_service_requests():
-    if current_user.is_admin:
-        requests = ServiceRequest.query.order_by(ServiceRequest.created_at.desc()).all()
-    else:
-        requests = ServiceRequest.query.filter_by(user_id=current_user.id).order_by(
-            ServiceRequest.created_at.desc()
-        ).all()
-    return jsonify([r.to_dict() for r in requests])
+    """
+    Lists service requests, newest first, keyset-paginated on (created_at, id).
+    Query: status (comma-separated), zone, vehicle_type, created_from / created_to
+    (ISO dates), fields (comma-separated subset of SERVICE_REQUEST_FIELDS),
+    limit, cursor (next_cursor of the previous page) and format=ndjson to
+    stream the matching rows, one JSON object per line, from a server-side cursor
+    (at most API_STREAM_MAX_ROWS rows, whatever limit asks for).
+    Returns {"items": [...], "next_cursor": ...} otherwise. Reads go to the
+    read replica when one is configured.
+    """
+    from sqlalchemy import select
+    from src.utils.db_pool import get_read_session
+    from src.utils.pagination import decode_cursor, fetch_page, keyset_before
+
+    args = request.args
+    fields = [f for f in args.get("fields", "").split(",") if f] or list(SERVICE_REQUEST_FIELDS)
+    if any(f not in SERVICE_REQUEST_FIELDS for f in fields):
+        abort(400)
+    try:
+        created_from = datetime.fromisoformat(args["created_from"]) if args.get("created_from") else None
+        created_to = datetime.fromisoformat(args["created_to"]) if args.get("created_to") else None
+    except ValueError:
+        abort(400)
+    cursor = decode_cursor(args.get("cursor"))
+    if args.get("cursor") and cursor is None:
+        abort(400)
+
+    # id and created_at are always read (they make up the cursor), after the requested fields
+    columns = fields + [c for c in ("id", "created_at") if c not in fields]
+    query = select(*(getattr(ServiceRequest, c) for c in columns))
+    if not current_user.is_admin:
+        query = query.where(ServiceRequest.user_id == current_user.id)
+    if args.get("status"):
+        query = query.where(ServiceRequest.status.in_(args["status"].split(",")))
+    if args.get("zone"):
+        query = query.where(ServiceRequest.current_location_zone == args["zone"])
+    if args.get("vehicle_type"):
+        query = query.where(ServiceRequest.vehicle_type == args["vehicle_type"])
+    if created_from:
+        query = query.where(ServiceRequest.created_at >= created_from)
+    if created_to:
+        query = query.where(ServiceRequest.created_at < created_to)
+    query = keyset_before(query, ServiceRequest.created_at, ServiceRequest.id, cursor)
+
+    if args.get("format") == "ndjson":
+        max_rows = current_app.config.get("API_STREAM_MAX_ROWS", 100000)
+        query = query.limit(max(min(args.get("limit", max_rows, type=int), max_rows), 1))
+        def generate():
+            # yield_per streams from a server-side cursor: memory stays flat
+            rows = get_read_session(db).execute(query.execution_options(yield_per=current_app.config.get("API_STREAM_CHUNK_SIZE", 1000)))
+            for partition in rows.partitions():
+                yield b"".join(dumps(item) + b"\n" for item in rows_to_dicts(partition, fields))
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    limit = min(
+        args.get("limit", current_app.config.get("API_PAGE_SIZE", 100), type=int),
+        current_app.config.get("API_PAGE_SIZE_MAX", 1000)
+    )
+    rows, next_cursor = fetch_page(get_read_session(db), query, max(limit, 1), "created_at")
+    return json_response({
+        "items": rows_to_dicts(rows, fields),
+        "next_cursor": next_cursor,
+    })
 
 @api_bp.route("/service_requests/<int:request_id>", methods=["GET"])
 @login_required
@@ -107,6 +227,15 @@ def api_update_service_request(request_id):
     for key in ["status", "assigned_provider_id", "current_location", "destination", "vehicle_type"]:
         if key in data:
             setattr(req, key, data[key])
+    # Nuevo destino o vehículo: se vuelve a cotizar si llegan las coordenadas del destino
+    if data.get("destination_coordinates") is not None and req.pickup_latitude is not None \
+            and req.pickup_longitude is not None:
+        try:
+            origin = _coordinate_pair([req.pickup_longitude, req.pickup_latitude])
+            destination = _coordinate_pair(data["destination_coordinates"])
+        except ValueError:
+            abort(400)
+        quote_service_request(req, origin, destination, get_pricing_snapshot(PricingConfig))
     db.session.commit()
     return jsonify(req.to_dict())
 
@@ -120,14 +249,120 @@ def api_delete_service_request(request_id):
     db.session.commit()
     return jsonify({"deleted": True})
 
+# ---------- Metrics ----------
+@api_bp.route("/metrics", methods=["GET"])
+@login_required
+def api_metrics():
+    if not current_user.is_admin:
+        abort(403)
+    from src.models.pricing_logic import get_route_cache_stats
+    from src.utils.geocode import get_geocode_cache_stats
+    from src.utils.alert_dispatch import get_alert_dispatcher
+    from src.utils.expiry_scheduler import get_expiry_scheduler
+    from src.utils.dispatch_metrics import dispatch_metrics
+    from src.utils.wave_dispatch import get_wave_dispatch_stats
+    from src.utils.identity_cache import get_identity_cache
+    from src.utils.db_pool import get_pool_stats
+    from src.utils.http_client import get_http_client_stats
+    expiry_scheduler = get_expiry_scheduler()
+    return jsonify({
+        "route_cache": get_route_cache_stats(),
+        "geocode_cache": get_geocode_cache_stats(),
+        "alert_dispatch": get_alert_dispatcher(current_app._get_current_object()).stats(),
+        "expiry_scheduler": expiry_scheduler.stats() if expiry_scheduler else None,
+        "dispatch": dict(dispatch_metrics.stats(), **get_wave_dispatch_stats()),
+        "identity_cache": get_identity_cache(current_app._get_current_object()).stats(),
+        "db_pool": {bind or "default": get_pool_stats(engine) for bind, engine in db.engines.items()},
+        "http_client": get_http_client_stats(),
+    })
+
 # ---------- Pricing ----------
 @api_bp.route("/pricing/calculate", methods=["POST"])
 def api_pricing_calculate():
-    data = request.json
+    data = request.json or {}
+    if "vehicle_type" not in data:
+        abort(400)
+    try:
+        origin = _coordinate_pair(data.get("current_location"))
+        destination = _coordinate_pair(data.get("destination"))
+    except ValueError:
+        abort(400)
     result = calculate_dynamic_price(
-        origin_coords=data["current_location"],
-        destination_coords=data["destination"],
+        origin_coords=origin,
+        destination_coords=destination,
         vehicle_type_key=data["vehicle_type"],
-        pricing_cfg_obj=None,  # deberás pasar una instancia de PricingConfig si la tienes
+        pricing_config_db_object=get_pricing_snapshot(PricingConfig),
+        provisional=bool(data.get("provisional")),
     )
     return jsonify(result)
+
+@api_bp.route("/pricing/calculate_batch", methods=["POST"])
+@login_required
+def api_pricing_calculate_batch():
+    data = request.json or {}
+    origins = data.get("origins") or []
+    destinations = data.get("destinations") or []
+    if not isinstance(origins, list) or not isinstance(destinations, list):
+        abort(400)
+    if not origins or not destinations or "vehicle_type" not in data:
+        abort(400)
+    max_points = current_app.config.get("PRICING_BATCH_MAX_POINTS", 25)
+    if len(origins) > max_points or len(destinations) > max_points:
+        abort(400)
+    try:
+        origins = [_coordinate_pair(c) for c in origins]
+        destinations = [_coordinate_pair(c) for c in destinations]
+    except ValueError:
+        abort(400)
+    result = calculate_dynamic_price_batch(
+        origins=origins,
+        destinations=destinations,
+        vehicle_type_key=data["vehicle_type"],
+        pricing_config_db_object=get_pricing_snapshot(PricingConfig),
+    )
+    return jsonify(result)
+
+@api_bp.route("/pricing/reprice", methods=["POST"])
+@login_required
+def api_pricing_reprice():
+    """
+    Reprices stored service requests under a candidate configuration.
+    Body: any PricingConfig field to override (fixed_base_fare, fare_per_km, ...,
+    vehicle_types_json, time_coefficients_json), optional created_from / created_to
+    (ISO dates) and format ("summary" or "csv" to stream id,price rows).
+    """
+    if not current_user.is_admin:
+        abort(403)
+    from types import SimpleNamespace
+    from src.models.pricing_logic import compile_pricing_config
+    from src.utils.bulk_repricing import iter_repriced_service_requests, summarize_repricing
+
+    data = request.json or {}
+    active = PricingConfig.query.first()
+    if not active:
+        abort(404)
+    fields = ["fixed_base_fare", "fare_per_km", "fare_per_minute", "traffic_coefficient",
+              "admin_commission_percentage", "vehicle_types_json", "time_coefficients_json"]
+    numeric_fields = fields[:5]
+    candidate = SimpleNamespace(**{f: data.get(f, getattr(active, f)) for f in fields})
+    try:
+        for f in numeric_fields:
+            value = getattr(candidate, f)
+            if value is not None and (isinstance(value, bool) or not math.isfinite(float(value))):
+                raise ValueError(f"{f} must be a number")
+        created_from = datetime.fromisoformat(data["created_from"]) if data.get("created_from") else None
+        created_to = datetime.fromisoformat(data["created_to"]) if data.get("created_to") else None
+        snapshot = compile_pricing_config(candidate)
+        for coef in snapshot.vehicle_coefficients.values():
+            float(coef)
+    except (TypeError, ValueError):
+        abort(400)
+
+    chunks = iter_repriced_service_requests(db, ServiceRequest, snapshot, created_from, created_to)
+    if data.get("format") == "csv":
+        def generate():
+            yield "id,price\n"
+            for chunk in chunks:
+                yield "".join(f"{i},{p:.2f}\n" for i, p in zip(chunk["ids"].tolist(), chunk["prices"].tolist()))
+        return Response(stream_with_context(generate()), mimetype="text/csv")
+    return jsonify(summarize_repricing(chunks))
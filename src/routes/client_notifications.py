@@ -1,11 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from src import db
+from src.models import ServiceRequest, User
 import datetime
-import json
 
-# This blueprint will be registered in main.py
-client_notifications_bp = Blueprint('client_notifications', __name__)
+# Registered in create_app; the templates build URLs as client_notifications_bp.*
+client_notifications_bp = Blueprint('client_notifications_bp', __name__)
+
+NOTIFICATIONS_NEW_SECONDS = 86400  # 24 hours
 
 @client_notifications_bp.route('/client/notifications')
 @login_required
@@ -13,47 +15,64 @@ def client_notifications():
     """
     Display notifications for the client.
     Shows service request status updates and other important notifications.
+    
+    One query per page: the provider name comes from an outer join and is_new
+    is computed in SQL. Pages are keyset-paginated on (updated_at, id) through
+    ?before=<cursor>, so render time does not grow with the customer's history.
     """
     if current_user.user_type != 'customer':
         flash('Unauthorized access.', 'danger')
-        return redirect(url_for('main.home'))
+        return redirect(url_for('main_bp.home'))
+    
+    from sqlalchemy import select
+    from sqlalchemy.orm import aliased
+    from src.utils.pagination import decode_cursor, fetch_page, keyset_before
     
-    # Import models from main.py (will be set when blueprint is registered)
-    ServiceRequest = current_app.config['ServiceRequest']
-    User = current_app.config['User']
+    page_size = current_app.config.get('CLIENT_NOTIFICATIONS_PAGE_SIZE', 20)
+    new_since = datetime.datetime.utcnow() - datetime.timedelta(seconds=NOTIFICATIONS_NEW_SECONDS)
+    Provider = aliased(User)
     
-    # Get all service requests for this client
-    service_requests = ServiceRequest.query.filter_by(user_id=current_user.id).order_by(
-        ServiceRequest.updated_at.desc()
-    ).all()
+    query = select(
+        ServiceRequest.id,
+        ServiceRequest.status,
+        ServiceRequest.current_location,
+        ServiceRequest.destination,
+        ServiceRequest.vehicle_type,
+        ServiceRequest.price,
+        ServiceRequest.created_at,
+        ServiceRequest.updated_at,
+        Provider.fullname.label('provider_name'),
+        (ServiceRequest.updated_at >= new_since).label('is_new')
+    ).outerjoin(
+        Provider, Provider.id == ServiceRequest.assigned_provider_id
+    ).where(
+        ServiceRequest.user_id == current_user.id
+    )
+    
+    cursor = decode_cursor(request.args.get('before'))
+    query = keyset_before(query, ServiceRequest.updated_at, ServiceRequest.id, cursor)
+    rows, next_cursor = fetch_page(db.session, query, page_size, 'updated_at')
     
     # Prepare notifications data
-    notifications = []
-    for request in service_requests:
-        # Get provider info if assigned
-        provider_name = "Not assigned"
-        if request.provider_id:
-            provider = User.query.get(request.provider_id)
-            if provider:
-                provider_name = provider.fullname
-        
-        # Create notification object
-        notification = {
-            'id': request.id,
+    notifications = [
+        {
+            'id': row.id,
             'type': 'service_update',
-            'status': request.status,
-            'current_location': request.current_location,
-            'destination': request.destination,
-            'vehicle_type': request.vehicle_type,
-            'price': request.price,
-            'provider_name': provider_name,
-            'created_at': request.created_at,
-            'updated_at': request.updated_at,
-            'is_new': (datetime.datetime.utcnow() - request.updated_at).total_seconds() < 86400  # 24 hours
+            'status': row.status,
+            'current_location': row.current_location,
+            'destination': row.destination,
+            'vehicle_type': row.vehicle_type,
+            'price': row.price,
+            'provider_name': row.provider_name or "Not assigned",
+            'created_at': row.created_at,
+            'updated_at': row.updated_at,
+            'is_new': bool(row.is_new)
         }
-        notifications.append(notification)
+        for row in rows
+    ]
     
-    return render_template('client/notifications.html', notifications=notifications)
+    return render_template('client/notifications.html', notifications=notifications,
+                           next_cursor=next_cursor, is_first_page=cursor is None)
 
 @client_notifications_bp.route('/client/service_details/<int:service_request_id>')
 @login_required
@@ -63,37 +82,30 @@ def client_service_details(service_request_id):
     """
     if current_user.user_type != 'customer':
         flash('Unauthorized access.', 'danger')
-        return redirect(url_for('main.home'))
+        return redirect(url_for('main_bp.home'))
     
-    # Import models from main.py (will be set when blueprint is registered)
-    ServiceRequest = current_app.config['ServiceRequest']
-    User = current_app.config['User']
+    from sqlalchemy import select
+    from sqlalchemy.orm import aliased
     
-    # Get the service request
-    service_request = ServiceRequest.query.get(service_request_id)
-    if not service_request:
+    # Get the service request and its provider (if assigned) in one query
+    Provider = aliased(User)
+    row = db.session.execute(
+        select(ServiceRequest, Provider).outerjoin(
+            Provider, Provider.id == ServiceRequest.assigned_provider_id
+        ).where(ServiceRequest.id == service_request_id)
+    ).first()
+    if not row:
         flash('Service request not found.', 'danger')
         return redirect(url_for('client_notifications_bp.client_notifications'))
+    service_request, provider = row
     
     # Check if the service request belongs to the current user
     if service_request.user_id != current_user.id:
         flash('Unauthorized access to this service request.', 'danger')
         return redirect(url_for('client_notifications_bp.client_notifications'))
     
-    # Get provider info if assigned
-    provider = None
-    if service_request.provider_id:
-        provider = User.query.get(service_request.provider_id)
-    
-    # Parse price breakdown if available
-    price_breakdown = None
-    if service_request.price_breakdown_json:
-        try:
-            price_breakdown = json.loads(service_request.price_breakdown_json)
-        except json.JSONDecodeError:
-            price_breakdown = None
-    
+    # ServiceRequest stores only the quoted total, not its breakdown
     return render_template('client/service_details.html', 
                           service_request=service_request, 
                           provider=provider,
-                          price_breakdown=price_breakdown)
+                          price_breakdown=None)
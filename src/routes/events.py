@@ -0,0 +1,72 @@
+# src/routes/events.py
+import json
+import threading
+
+from flask import Blueprint, Response, current_app, stream_with_context
+from flask_login import login_required, current_user
+
+from src import db
+from src.utils.event_bus import event_bus, user_channel
+
+events_bp = Blueprint("events_bp", __name__)
+
+KEEPALIVE_SECONDS = 15
+
+# Streams abiertos en este proceso (cada uno retiene un hilo con gthread)
+_stream_slots = None
+_stream_slots_lock = threading.Lock()
+
+
+def _get_stream_slots():
+    """Per-process semaphore sized by SSE_MAX_STREAMS_PER_WORKER."""
+    global _stream_slots
+    if _stream_slots is None:
+        with _stream_slots_lock:
+            if _stream_slots is None:
+                _stream_slots = threading.BoundedSemaphore(current_app.config.get("SSE_MAX_STREAMS_PER_WORKER", 2))
+    return _stream_slots
+
+
+# ---------- Server-Sent Events ----------
+
+@events_bp.route("/events/stream")
+@login_required
+def stream():
+    """
+    Stream de eventos (SSE) del usuario: nuevas alertas para proveedores
+    y cambios de estado de sus solicitudes para clientes.
+    At most SSE_MAX_STREAMS_PER_WORKER streams per worker (503 beyond that:
+    the browser stops retrying and the page works without live updates).
+    """
+    slots = _get_stream_slots()
+    if not slots.acquire(blocking=False):
+        return Response("Too many open event streams", status=503, headers={"Retry-After": "30"})
+    subscription = event_bus.subscribe([user_channel(current_user.id)])
+    # The stream never touches the database: give the connection back to the pool now
+    # instead of when the (long-lived) request context ends
+    db.session.remove()
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    def close():
+        # Also runs when the client leaves before the generator started
+        event_bus.unsubscribe(subscription)
+        slots.release()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(close)
+    return response
@@ -50,6 +50,11 @@ def signin():
         password = request.form.get("password")
         user = User.query.filter_by(email=email).first()
         if user and user.check_password(password):
+            if user.password_needs_rehash():
+                # hash hecho con otro perfil: se recalcula en segundo plano
+                from flask import current_app
+                from src.utils.passwords import schedule_rehash
+                schedule_rehash(current_app._get_current_object(), db, User, user.id, user.password_hash, password)
             login_user(user)
             flash("Signed in successfully.", "success")
             return redirect(url_for("main_bp.home"))
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from src import db
+from src.models import User, ServiceRequest, PricingConfig, Notification
 import datetime
 import json
 import os
@@ -9,6 +10,9 @@ import sys
 # This blueprint will be registered in main.py
 service_assignment_bp = Blueprint('service_assignment', __name__)
 
+# No hay todavía una vista de panel del proveedor registrada: se vuelve a la portada
+PROVIDER_HOME_ENDPOINT = 'main_bp.home'
+
 @service_assignment_bp.route('/process_service_request/<int:service_request_id>', methods=['POST'])
 @login_required
 def process_service_request(service_request_id):
@@ -18,17 +22,10 @@ def process_service_request(service_request_id):
     """
     if not current_user.is_admin:
         flash('Unauthorized access.', 'danger')
-        return redirect(url_for('main.home'))
-    
-    # Import models from main.py (will be set when blueprint is registered)
-    db = current_app.config['db']
-    User = current_app.config['User']
-    ServiceRequest = current_app.config['ServiceRequest']
-    PricingConfig = current_app.config['PricingConfig']
-    Notification = current_app.config['Notification']
+        return redirect(url_for('main_bp.home'))
     
     # Get the service request
-    service_request = ServiceRequest.query.get(service_request_id)
+    service_request = db.session.get(ServiceRequest, service_request_id)
     if not service_request:
         flash(f'Service request {service_request_id} not found.', 'danger')
         return redirect(url_for('admin_bp.dashboard'))
@@ -45,20 +42,30 @@ def process_service_request(service_request_id):
         return redirect(url_for('admin_bp.dashboard'))
     
     # Import utility functions here to avoid circular imports
-    from utils.service_assignment import find_matching_providers, send_service_alerts
-    
-    # Find matching providers
-    matching_providers = find_matching_providers(service_request, db, User)
+    from src.utils.service_assignment import find_nearest_providers, send_service_alerts
+    from src.utils.wave_dispatch import dispatch_in_waves
+    
+    if current_app.config.get('DISPATCH_WAVES_ENABLED'):
+        # Nearest providers first, widening the radius (then the zone) on each wave timeout
+        notifications_sent = dispatch_in_waves(
+            service_request, db, User, ServiceRequest, Notification, PricingConfig, pricing_config
+        )
+    else:
+        # Find matching providers (nearest first; zone match when the request has no coordinates)
+        matching_providers = find_nearest_providers(service_request, db, User)
+        # Send alerts to matching providers
+        notifications_sent = send_service_alerts(service_request, matching_providers, db, Notification, pricing_config)
     
-    if not matching_providers:
+    if not notifications_sent:
         # No matching providers found
         service_request.status = 'No Provider Available'
         db.session.commit()
         flash(f'No matching providers found for service request {service_request_id}.', 'warning')
         return redirect(url_for('admin_bp.dashboard'))
     
-    # Send alerts to matching providers
-    notifications_sent = send_service_alerts(service_request, matching_providers, db, Notification, pricing_config)
+    # Expire exactly at the deadline if nobody accepts (in-process scheduler)
+    from src.utils.expiry_scheduler import register_pending_request
+    register_pending_request(service_request)
     
     flash(f'Service request {service_request_id} processed. {notifications_sent} providers notified.', 'success')
     return redirect(url_for('admin_bp.dashboard'))
@@ -72,42 +79,37 @@ def accept_service(notification_id):
     """
     if current_user.user_type != 'provider':
         flash('Only service providers can accept service requests.', 'danger')
-        return redirect(url_for('main.home'))
-    
-    # Import models from main.py (will be set when blueprint is registered)
-    db = current_app.config['db']
-    ServiceRequest = current_app.config['ServiceRequest']
-    Notification = current_app.config['Notification']
+        return redirect(url_for('main_bp.home'))
     
     # Get the notification
     notification = Notification.query.get(notification_id)
     if not notification:
         flash('Notification not found.', 'danger')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Check if the notification belongs to the current provider
     if notification.provider_id != current_user.id:
         flash('Unauthorized access to this notification.', 'danger')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Check if the notification is still in 'sent' status
     if notification.status != 'sent':
         flash(f'This service request has already been {notification.status}.', 'warning')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Get the service request
     service_request = ServiceRequest.query.get(notification.service_request_id)
     if not service_request:
         flash('Service request not found.', 'danger')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Check if the service request is still in 'Pending Assignment' status
     if service_request.status != 'Pending Assignment':
         flash(f'This service request is already {service_request.status}.', 'warning')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Import utility function here to avoid circular imports
-    from utils.service_assignment import update_service_status
+    from src.utils.service_assignment import update_service_status
     
     # Use the update_service_status utility to assign the service to this provider
     updated_request = update_service_status(
@@ -124,7 +126,7 @@ def accept_service(notification_id):
     else:
         flash('Failed to accept service request. It may have been assigned to another provider.', 'danger')
     
-    return redirect(url_for('main.service_provider_home'))
+    return redirect(url_for(PROVIDER_HOME_ENDPOINT))
 
 @service_assignment_bp.route('/update_service_status/<int:service_request_id>', methods=['POST'])
 @login_required
@@ -135,38 +137,33 @@ def update_service_request_status(service_request_id):
     """
     if current_user.user_type != 'provider':
         flash('Only service providers can update service status.', 'danger')
-        return redirect(url_for('main.home'))
-    
-    # Import models from main.py (will be set when blueprint is registered)
-    db = current_app.config['db']
-    ServiceRequest = current_app.config['ServiceRequest']
-    Notification = current_app.config['Notification']
+        return redirect(url_for('main_bp.home'))
     
     # Get the service request
     service_request = ServiceRequest.query.get(service_request_id)
     if not service_request:
         flash('Service request not found.', 'danger')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Check if the service request is assigned to the current provider
     if service_request.provider_id != current_user.id:
         flash('You are not assigned to this service request.', 'danger')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Get the new status from the form
     new_status = request.form.get('status')
     if not new_status:
         flash('No status provided.', 'danger')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Valid status transitions
     valid_statuses = ['En Route', 'Arrived', 'In Progress', 'Completed', 'Cancelled']
     if new_status not in valid_statuses:
         flash(f'Invalid status: {new_status}', 'danger')
-        return redirect(url_for('main.service_provider_home'))
+        return redirect(url_for(PROVIDER_HOME_ENDPOINT))
     
     # Import utility function here to avoid circular imports
-    from utils.service_assignment import update_service_status
+    from src.utils.service_assignment import update_service_status
     
     # Use the update_service_status utility to update the status
     updated_request = update_service_status(
@@ -183,41 +180,45 @@ def update_service_request_status(service_request_id):
     else:
         flash('Failed to update service request status.', 'danger')
     
-    return redirect(url_for('main.service_provider_home'))
+    return redirect(url_for(PROVIDER_HOME_ENDPOINT))
 
 @service_assignment_bp.route('/check_expired_requests', methods=['GET'])
 def check_expired_requests():
     """
     Check for service requests that have been in 'Pending Assignment' status
     for longer than the specified time and mark them as 'No Provider Available'.
-    This endpoint can be called by a cron job.
+    This endpoint can be called by a cron job; with EXPIRY_SCHEDULER_ENABLED the
+    in-process scheduler already expires requests at their deadline and this
+    sweep is only a safety net.
     """
     # Check for API key or other authentication if needed
     api_key = request.args.get('api_key')
     if not api_key or api_key != os.environ.get('SERVICE_ASSIGNMENT_API_KEY', 'default_key_for_development'):
         return jsonify({'error': 'Unauthorized access'}), 401
     
-    # Import models from main.py (will be set when blueprint is registered)
-    db = current_app.config['db']
-    ServiceRequest = current_app.config['ServiceRequest']
-    Notification = current_app.config['Notification']
-    
     # Get expiry minutes from query parameter or use default
     expiry_minutes = request.args.get('expiry_minutes', 5, type=int)
     
     # Import utility function here to avoid circular imports
-    from utils.service_assignment import check_expired_service_requests
+    from src.utils.service_assignment import check_expired_service_requests
+    
+    batch_size = request.args.get('batch_size', 500, type=int)
+    max_batches = request.args.get('max_batches', None, type=int)
     
     # Use the check_expired_service_requests utility
-    expired_request_ids = check_expired_service_requests(
+    summary = check_expired_service_requests(
         db=db,
         ServiceRequest=ServiceRequest,
         Notification=Notification,
-        expiry_minutes=expiry_minutes
+        expiry_minutes=expiry_minutes,
+        batch_size=batch_size,
+        max_batches=max_batches
     )
     
     return jsonify({
         'success': True,
-        'expired_requests': expired_request_ids,
-        'count': len(expired_request_ids)
+        'expired_requests': summary['expired_request_ids'],
+        'count': summary['expired_count'],
+        'notifications_expired': summary['notifications_expired'],
+        'batches': summary['batches']
     })
@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, request, render_template
 from src import db                       # ← la única instancia
 from src.models import User              # ← modelo desde el paquete
-from src.utils.geocode import reverse_geocode_osm
+from src.utils.geocode import reverse_geocode, zone_for_coordinates
+from src.utils.serialization import USER_FIELDS, PROVIDER_FIELDS, json_response, user_rows_to_dicts
+from sqlalchemy import select
 
 user_bp = Blueprint("user_bp", __name__)   # usa el mismo nombre que registras
 
@@ -9,8 +11,11 @@ user_bp = Blueprint("user_bp", __name__)   # usa el mismo nombre que registras
 
 @user_bp.route("/users", methods=["GET"])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    # Sólo las columnas necesarias, como tuplas, y el codificador JSON rápido
+    rows = db.session.execute(
+        select(*(getattr(User, c) for c in USER_FIELDS + PROVIDER_FIELDS)).order_by(User.id)
+    ).all()
+    return json_response(user_rows_to_dicts(rows))
 
 @user_bp.route("/users", methods=["POST"])
 def create_user():
@@ -56,16 +61,20 @@ def submit_service_request():
                         current_location_raw.replace("Lat:", "")
                                             .replace("Lon:", "")
                                             .split(","))
-            current_location = reverse_geocode_osm(lat, lon)
+            current_location = reverse_geocode(lat, lon)
+            current_location_zone = zone_for_coordinates(lat, lon)
         except Exception as e:
             print("Error geocoding:", e)
             current_location = "Unknown"
+            current_location_zone = None
     else:
         current_location = current_location_raw or "Unknown"
+        current_location_zone = None
 
     return render_template(
         "confirmation.html",
         direccion=current_location,
+        zona=current_location_zone,
         destino=destination,
         vehiculo=vehicle_type,
     )
@@ -0,0 +1,150 @@
+"""
+Background delivery of provider alerts.
+
+send_service_alerts writes the Notification rows and hands one fan-out job to
+the dispatcher, so the HTTP request returns without waiting for delivery. A
+small pool of worker threads expands each job into one delivery per provider
+and channel, retrying failures with exponential backoff. The queue is bounded:
+when it is full, submit() returns False instead of blocking the request
+(the Notification rows are already stored, so providers still see the job on
+their dashboard).
+"""
+import queue
+import random
+import threading
+import time
+
+_FANOUT = "fanout"
+_DELIVER = "deliver"
+
+
+def log_channel(app, alert):
+    """Default channel: log the alert (stand-in until email/push delivery exists)."""
+    app.logger.info(
+        f"Alert sent to provider {alert['provider_id']} ({alert['provider_name']}) "
+        f"for service request {alert['service_request_id']}. "
+        f"Total price: €{alert['price']:.2f}, Provider profit: €{alert['provider_profit']:.2f}"
+    )
+
+
+class AlertDispatcher:
+    """
+    Bounded queue plus worker threads delivering alerts through registered channels.
+
+    Args:
+        workers: Number of delivery threads
+        queue_size: Maximum queued items before submit() starts rejecting jobs
+        max_retries: Delivery attempts per alert and channel after the first one
+        backoff_seconds: Base delay of the exponential backoff between attempts
+    """
+
+    def __init__(self, workers=4, queue_size=1000, max_retries=3, backoff_seconds=0.5):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._channels = {"log": log_channel}
+        self._threads = []
+        self._app = None
+        self._lock = threading.Lock()
+        self.counters = {"jobs": 0, "rejected": 0, "delivered": 0, "retried": 0, "failed": 0}
+
+    def register_channel(self, name, deliver):
+        """deliver(app, alert) sends one alert and raises on failure."""
+        self._channels[name] = deliver
+
+    def start(self, app):
+        """Starts the worker threads once per process."""
+        with self._lock:
+            if self._threads:
+                return
+            self._app = app
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"alert-dispatch-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job):
+        """
+        Queues a fan-out job: {"alerts": [alert, ...]}. Never blocks.
+
+        Returns:
+            True if queued, False if the queue is full
+        """
+        try:
+            self._queue.put_nowait((_FANOUT, job, None, 0))
+        except queue.Full:
+            self._count("rejected")
+            return False
+        self._count("jobs")
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["queued"] = self._queue.qsize()
+        stats["workers"] = len(self._threads)
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _run(self):
+        while True:
+            kind, payload, channel, attempt = self._queue.get()
+            try:
+                with self._app.app_context():
+                    if kind == _FANOUT:
+                        for alert in payload["alerts"]:
+                            for name in self._channels:
+                                # Wait briefly for room; if the queue stays full deliver inline
+                                # so fan-outs can never deadlock the pool
+                                try:
+                                    self._queue.put((_DELIVER, alert, name, 0), timeout=1)
+                                except queue.Full:
+                                    self._deliver(alert, name, 0)
+                    else:
+                        self._deliver(payload, channel, attempt)
+            except Exception:
+                self._app.logger.exception("Alert dispatch worker error")
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, alert, channel, attempt):
+        try:
+            self._channels[channel](self._app, alert)
+        except Exception as e:
+            if attempt >= self.max_retries:
+                self._count("failed")
+                self._app.logger.error(
+                    f"Alert for notification {alert.get('notification_id')} via {channel} failed after {attempt + 1} attempts: {e}"
+                )
+                return
+            self._count("retried")
+            time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+            self._deliver(alert, channel, attempt + 1)
+            return
+        self._count("delivered")
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_alert_dispatcher(app):
+    """Process-wide dispatcher, created and started on first use from the app config."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                dispatcher = AlertDispatcher(
+                    workers=app.config.get("ALERT_DISPATCH_WORKERS", 4),
+                    queue_size=app.config.get("ALERT_DISPATCH_QUEUE_SIZE", 1000),
+                    max_retries=app.config.get("ALERT_DISPATCH_MAX_RETRIES", 3),
+                )
+                from src.utils.event_bus import sse_channel
+                dispatcher.register_channel("sse", sse_channel)
+                dispatcher.start(app)
+                _dispatcher = dispatcher
+    return _dispatcher
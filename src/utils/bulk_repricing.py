@@ -0,0 +1,119 @@
+"""
+Bulk repricing of historical service requests.
+
+Answers "what would these jobs have cost under this PricingConfig?" from the
+distance/duration stored on each ServiceRequest, without calling Mapbox.
+The fare formula is evaluated with NumPy over whole chunks: the time
+coefficient is a lookup in the snapshot's 24-entry hour table and the vehicle
+coefficient a categorical mapping over the distinct vehicle types of the chunk.
+"""
+import numpy as np
+from sqlalchemy import select
+
+from src.models.pricing_logic import as_pricing_snapshot
+
+
+def reprice_arrays(pricing_config, distances_m, durations_s, hours, vehicle_types):
+    """
+    Vectorized fare formula.
+
+    Args:
+        pricing_config: PricingSnapshot or PricingConfig row (the candidate configuration)
+        distances_m: Array-like of route distances in meters
+        durations_s: Array-like of route durations in seconds
+        hours: Array-like of hours of day (0-23) used for the time coefficient
+        vehicle_types: Sequence of vehicle type keys (None allowed)
+
+    Returns:
+        NumPy array of prices rounded to cents
+    """
+    snapshot = as_pricing_snapshot(pricing_config)
+
+    distances_m = np.asarray(distances_m, dtype=np.float64)
+    durations_s = np.asarray(durations_s, dtype=np.float64)
+    hours = np.asarray(hours, dtype=np.intp)
+
+    hour_table = np.asarray(snapshot.hour_coefficients, dtype=np.float64)
+    coef_time = hour_table[hours]
+
+    keys = np.asarray([v or "" for v in vehicle_types], dtype=str)
+    if keys.size:
+        distinct, codes = np.unique(keys, return_inverse=True)
+        vehicle_table = np.asarray([snapshot.vehicle_coefficient(k) for k in distinct], dtype=np.float64)
+        coef_vehicle = vehicle_table[codes]
+    else:
+        coef_vehicle = np.ones(0, dtype=np.float64)
+
+    price = (
+        snapshot.fixed_base_fare
+        + distances_m * (snapshot.fare_per_km / 1000.0)
+        + durations_s * (snapshot.fare_per_minute / 60.0)
+    )
+    return np.round(price * coef_vehicle * coef_time * snapshot.traffic_coefficient, 2)
+
+
+def iter_repriced_service_requests(db, ServiceRequest, pricing_config, created_from=None, created_to=None, chunk_size=50000):
+    """
+    Streams repriced fares for stored service requests, chunk by chunk.
+    Rows come off a server-side cursor, so memory is bounded by chunk_size.
+    Requests without stored distance/duration are skipped.
+
+    Args:
+        db: SQLAlchemy database instance
+        ServiceRequest: ServiceRequest model class
+        pricing_config: PricingSnapshot or PricingConfig row to price with
+        created_from: Optional lower bound (inclusive) on created_at
+        created_to: Optional upper bound (exclusive) on created_at
+        chunk_size: Rows per chunk
+
+    Yields:
+        Dicts with "ids" and "prices" NumPy arrays of equal length
+    """
+    snapshot = as_pricing_snapshot(pricing_config)
+
+    stmt = select(
+        ServiceRequest.id,
+        ServiceRequest.created_at,
+        ServiceRequest.vehicle_type,
+        ServiceRequest.route_distance_meters,
+        ServiceRequest.route_duration_seconds,
+    ).where(
+        ServiceRequest.route_distance_meters.isnot(None),
+        ServiceRequest.route_duration_seconds.isnot(None),
+    )
+    if created_from is not None:
+        stmt = stmt.where(ServiceRequest.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(ServiceRequest.created_at < created_to)
+    stmt = stmt.order_by(ServiceRequest.id).execution_options(yield_per=chunk_size)
+
+    result = db.session.execute(stmt)
+    for rows in result.partitions():
+        ids, created, vehicle_types, distances, durations = zip(*rows)
+        prices = reprice_arrays(
+            snapshot,
+            distances,
+            durations,
+            [dt.hour for dt in created],
+            vehicle_types,
+        )
+        yield {"ids": np.asarray(ids, dtype=np.int64), "prices": prices}
+
+
+def summarize_repricing(chunks):
+    """
+    Consumes the chunks of iter_repriced_service_requests and returns totals.
+
+    Returns:
+        Dict with count, total and average price
+    """
+    count = 0
+    total = 0.0
+    for chunk in chunks:
+        count += int(chunk["prices"].size)
+        total += float(chunk["prices"].sum())
+    return {
+        "count": count,
+        "total": round(total, 2),
+        "average": round(total / count, 2) if count else None,
+    }
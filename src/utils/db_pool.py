@@ -0,0 +1,174 @@
+"""
+Engine options for the connection pool, sized from the gunicorn layout.
+
+Every gunicorn worker is a process with its own pool. A worker needs one
+connection per request thread plus a few for background threads (alert
+dispatch, schedulers), and all workers together must stay under the
+server's connection limit, so:
+
+    pool_size    = DB_POOL_SIZE or GUNICORN_THREADS + DB_POOL_BACKGROUND_CONNECTIONS
+    max_overflow = what is left of DB_MAX_CONNECTIONS / WEB_CONCURRENCY
+
+The expiry scheduler's leader lock (src/utils/expiry_scheduler.py) holds one
+more connection on the leader worker, opened outside this pool; keep it in
+mind in the headroom DB_MAX_CONNECTIONS leaves below the server limit.
+
+Connections are pre-pinged (stale connections after a Render Postgres
+restart or idle timeout are replaced instead of failing a request), recycled
+after DB_POOL_RECYCLE_SECONDS, and on PostgreSQL get a statement timeout.
+
+The pool class records how long checkouts wait for a free connection; see
+get_pool_stats(). An optional read replica (DATABASE_REPLICA_URL) is exposed
+as the "replica" bind and used through get_read_session().
+"""
+import os
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+# Límites superiores (segundos) de los buckets del histograma de espera
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def normalize_database_url(url):
+    """Render/Heroku give postgres:// URLs; SQLAlchemy wants postgresql://."""
+    if url and url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+
+class PoolWaitMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record(self, wait, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if wait <= bound:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def stats(self):
+        with self._lock:
+            labels = [f"le_{bound}" for bound in WAIT_BUCKETS] + ["gt_5.0"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(1000 * self.total_wait / self.checkouts, 3) if self.checkouts else None,
+                "max_wait_ms": round(1000 * self.max_wait, 3),
+                "wait_histogram": dict(zip(labels, self.buckets)),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that measures the time each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_metrics = PoolWaitMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_metrics = self.wait_metrics  # keep the numbers across engine.dispose()
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.wait_metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_metrics.record(time.perf_counter() - start)
+        return connection
+
+
+def build_engine_options(database_url, env=os.environ):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for database_url, from the DB_* and gunicorn env vars.
+
+    Returns:
+        Dict of create_engine() keyword arguments (empty for SQLite)
+    """
+    if not database_url or database_url.startswith('sqlite'):
+        return {}
+
+    workers = max(1, int(env.get('WEB_CONCURRENCY', 2)))
+    threads = max(1, int(env.get('GUNICORN_THREADS', 4)))
+    background = int(env.get('DB_POOL_BACKGROUND_CONNECTIONS', 2))
+    max_connections = int(env.get('DB_MAX_CONNECTIONS', 90))  # leave room for psql, migrations...
+
+    per_worker = max(2, max_connections // workers)
+    pool_size = min(int(env.get('DB_POOL_SIZE', threads + background)), per_worker)
+    max_overflow = min(int(env.get('DB_MAX_OVERFLOW', max(2, pool_size // 2))), per_worker - pool_size)
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max(0, max_overflow),
+        'pool_timeout': float(env.get('DB_POOL_TIMEOUT_SECONDS', 10)),
+        'pool_recycle': int(env.get('DB_POOL_RECYCLE_SECONDS', 1800)),
+        'pool_pre_ping': env.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+
+    if database_url.startswith('postgresql'):
+        statement_timeout_ms = int(env.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+        idle_in_transaction_ms = int(env.get('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 60000))
+        options['connect_args'] = {
+            'connect_timeout': int(env.get('DB_CONNECT_TIMEOUT_SECONDS', 5)),
+            'application_name': env.get('DB_APPLICATION_NAME', 'tow-now'),
+            'options': f"-c statement_timeout={statement_timeout_ms} "
+                       f"-c idle_in_transaction_session_timeout={idle_in_transaction_ms}",
+        }
+    return options
+
+
+def get_pool_stats(engine):
+    """Pool occupancy and checkout wait metrics of an engine."""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.wait_metrics.stats())
+    return stats
+
+
+def get_read_session(db):
+    """
+    Session for read-only queries: bound to the "replica" engine when
+    DATABASE_REPLICA_URL is set (one per app context), otherwise db.session.
+    Rows read here may lag the primary by the replication delay.
+    """
+    from flask import g
+    from sqlalchemy.orm import Session
+
+    if 'replica' not in db.engines:
+        return db.session
+    session = g.get('_read_session')
+    if session is None:
+        session = g._read_session = Session(db.engines['replica'])
+    return session
+
+
+def close_read_session(exception=None):
+    """teardown_appcontext hook for get_read_session()."""
+    from flask import g
+
+    session = g.pop('_read_session', None)
+    if session is not None:
+        session.close()
@@ -0,0 +1,103 @@
+"""
+Dispatch metrics: time-to-accept and notifications-per-assignment.
+
+Recorded by assign_service_request each time a provider wins a request, kept
+per process in a rolling window (like the other /api/metrics counters) and
+logged as one line per assignment so they can be aggregated across workers.
+"""
+import collections
+import threading
+
+WINDOW_SIZE = 1000
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class DispatchMetrics:
+    """
+    Args:
+        window_size: Number of recent assignments kept for the percentiles
+    """
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self._lock = threading.Lock()
+        self._time_to_accept = collections.deque(maxlen=window_size)
+        self._notifications = collections.deque(maxlen=window_size)
+        self._waves = collections.deque(maxlen=window_size)
+        self.counters = {"assignments": 0, "waves_sent": 0}
+
+    def record_assignment(self, time_to_accept_seconds, notifications_sent, waves=None):
+        with self._lock:
+            self.counters["assignments"] += 1
+            if time_to_accept_seconds is not None:
+                self._time_to_accept.append(time_to_accept_seconds)
+            self._notifications.append(notifications_sent)
+            if waves is not None:
+                self._waves.append(waves)
+
+    def record_wave(self):
+        with self._lock:
+            self.counters["waves_sent"] += 1
+
+    def stats(self):
+        with self._lock:
+            time_to_accept = sorted(self._time_to_accept)
+            notifications = sorted(self._notifications)
+            waves = list(self._waves)
+            stats = dict(self.counters)
+        stats["time_to_accept_seconds"] = {
+            "p50": _percentile(time_to_accept, 0.5),
+            "p90": _percentile(time_to_accept, 0.9),
+            "max": time_to_accept[-1] if time_to_accept else None,
+        }
+        stats["notifications_per_assignment"] = {
+            "mean": round(sum(notifications) / len(notifications), 2) if notifications else None,
+            "p90": _percentile(notifications, 0.9),
+        }
+        stats["waves_per_assignment"] = round(sum(waves) / len(waves), 2) if waves else None
+        return stats
+
+
+dispatch_metrics = DispatchMetrics()
+
+
+def record_assignment_metrics(service_request_id, db, Notification, assigned_at):
+    """
+    Measures the dispatch that just ended in an assignment: seconds from the
+    first alert to the acceptance, how many providers were notified, and in
+    how many waves (distinct notification batches).
+
+    Args:
+        service_request_id: ID of the assigned service request
+        db: SQLAlchemy database instance
+        Notification: Notification model class
+        assigned_at: Datetime of the acceptance (naive UTC)
+
+    Returns:
+        Dict with time_to_accept_seconds, notifications_sent and waves
+    """
+    from sqlalchemy import func, select
+
+    notifications_sent, first_sent_at, waves = db.session.execute(
+        select(
+            func.count(Notification.id),
+            func.min(Notification.created_at),
+            func.count(func.distinct(Notification.created_at))
+        ).where(Notification.service_request_id == service_request_id)
+    ).one()
+
+    time_to_accept = None
+    if first_sent_at is not None:
+        time_to_accept = round((assigned_at - first_sent_at).total_seconds(), 3)
+
+    dispatch_metrics.record_assignment(time_to_accept, notifications_sent, waves)
+    return {
+        'time_to_accept_seconds': time_to_accept,
+        'notifications_sent': notifications_sent,
+        'waves': waves,
+    }
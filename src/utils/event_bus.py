@@ -0,0 +1,179 @@
+"""
+In-process publish/subscribe for live updates (Server-Sent Events).
+
+Subscribers get a bounded queue per connection. With EVENT_BROKER=memory events
+only reach subscribers of the publishing process; with EVENT_BROKER=sqlite they
+are appended to a local SQLite file that a relay thread in every gunicorn
+worker tails, so a status change handled by one worker reaches streams held by
+the others (a stand-in for a real broker such as Redis pub/sub).
+"""
+import json
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+
+EVENT_BROKER = os.environ.get("EVENT_BROKER", "memory")
+EVENT_BROKER_PATH = os.environ.get("EVENT_BROKER_PATH", os.path.join(tempfile.gettempdir(), "townow_events.sqlite3"))
+EVENT_BROKER_POLL_SECONDS = float(os.environ.get("EVENT_BROKER_POLL_SECONDS", 0.2))
+EVENT_BROKER_RETENTION_SECONDS = int(os.environ.get("EVENT_BROKER_RETENTION_SECONDS", 300))
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, channels):
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """Next event dict, or None after timeout seconds without events."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SQLiteBroker:
+    """Append-only event log in a local SQLite file, shared by all processes on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL,"
+            " payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, channel, event):
+        self._conn().execute(
+            "INSERT INTO events (channel, payload, created_at) VALUES (?, ?, ?)",
+            (channel, json.dumps(event), time.time()),
+        )
+
+    def last_id(self):
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def read_after(self, last_id, limit=500):
+        return self._conn().execute(
+            "SELECT id, channel, payload FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+        ).fetchall()
+
+    def prune(self, max_age_seconds):
+        self._conn().execute("DELETE FROM events WHERE created_at < ?", (time.time() - max_age_seconds,))
+
+
+class EventBus:
+    """
+    Args:
+        broker: Optional SQLiteBroker; when set, publish() goes through it and a
+                relay thread delivers to this process's subscribers
+    """
+
+    def __init__(self, broker=None):
+        self.broker = broker
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._relay = None
+        self._relay_pid = None
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            self._subscribers.add(subscription)
+        self._ensure_relay()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, channel, event):
+        if self.broker is not None:
+            try:
+                self.broker.append(channel, event)
+                return
+            except sqlite3.Error:
+                pass  # broker unavailable: still reach local subscribers
+        self._deliver_local(channel, event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _deliver_local(self, channel, event):
+        with self._lock:
+            targets = [s for s in self._subscribers if channel in s.channels]
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # Slow client: drop rather than block the publisher
+                subscription.dropped += 1
+
+    def _ensure_relay(self):
+        if self.broker is None:
+            return
+        with self._lock:
+            if self._relay is not None and self._relay_pid == os.getpid():
+                return
+            self._relay = threading.Thread(target=self._run_relay, name="event-relay", daemon=True)
+            self._relay_pid = os.getpid()
+            self._relay.start()
+
+    def _run_relay(self):
+        last_id = self.broker.last_id()
+        last_prune = time.monotonic()
+        while True:
+            try:
+                for event_id, channel, payload in self.broker.read_after(last_id):
+                    last_id = event_id
+                    self._deliver_local(channel, json.loads(payload))
+                if time.monotonic() - last_prune > 60:
+                    self.broker.prune(EVENT_BROKER_RETENTION_SECONDS)
+                    last_prune = time.monotonic()
+            except sqlite3.Error:
+                pass
+            time.sleep(EVENT_BROKER_POLL_SECONDS)
+
+
+event_bus = EventBus(SQLiteBroker(EVENT_BROKER_PATH) if EVENT_BROKER == "sqlite" else None)
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def publish_to_user(user_id, event):
+    """Publishes event (a JSON-serializable dict with a "type" key) to one user's streams."""
+    if user_id is None:
+        return
+    event.setdefault("timestamp", time.time())
+    event_bus.publish(user_channel(user_id), event)
+
+
+def sse_channel(app, alert):
+    """Alert dispatcher channel: push the new job to the provider's open streams."""
+    publish_to_user(alert["provider_id"], {
+        "type": "new_service_request",
+        "notification_id": alert["notification_id"],
+        "service_request_id": alert["service_request_id"],
+        "current_location": alert["current_location"],
+        "destination": alert["destination"],
+        "vehicle_type": alert["vehicle_type"],
+        "provider_profit": alert["provider_profit"],
+        "accept_url": alert["accept_url"],
+    })
@@ -0,0 +1,243 @@
+"""
+In-process expiry of service requests.
+
+Each request that enters 'Pending Assignment' gets a job in a DelayedJobScheduler
+that fires exactly at created_at + SERVICE_REQUEST_EXPIRY_MINUTES and expires it
+with the same conditional UPDATEs as the /check_expired_requests sweep.
+
+Only one gunicorn worker runs the jobs. Workers compete for a leader lock:
+a PostgreSQL session-level advisory lock held on a dedicated connection
+opened outside the connection pool (so it never takes a pool slot from the
+request threads), or an flock on a local file for SQLite (single host).
+register() only schedules in the leader; the leader learns about requests
+moved to 'Pending Assignment' by other workers by syncing from the DB every
+EXPIRY_SCHEDULER_SYNC_SECONDS. The sync is keyed on updated_at, the time of
+the last status transition, so a request that re-enters 'Pending Assignment'
+long after it was created is picked up too; a full resync of the pending set
+runs every EXPIRY_SCHEDULER_FULL_SYNC_EVERY syncs.
+"""
+import datetime
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.pool import NullPool
+
+from src.utils.scheduler import DelayedJobScheduler, utc_to_epoch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Arbitrary 64-bit key identifying the expiry leader lock in pg_advisory_lock
+ADVISORY_LOCK_KEY = 7_418_305_112
+
+
+class LeaderLock:
+    """Non-blocking leader lock: PostgreSQL advisory lock, or a file lock for other databases."""
+
+    def __init__(self, engine, lock_path):
+        self.engine = engine
+        self.lock_path = lock_path
+        self._lock_engine = None
+        self._conn = None
+        self._file = None
+
+    def try_acquire(self):
+        if self.engine.dialect.name == "postgresql":
+            if self._lock_engine is None:
+                # Unpooled: the connection holding the lock is not counted in the app's pool_size
+                self._lock_engine = create_engine(self.engine.url, poolclass=NullPool)
+            conn = self._lock_engine.connect()
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar()
+            conn.commit()
+            if acquired:
+                self._conn = conn  # the lock lives as long as this connection
+            else:
+                conn.close()
+            return bool(acquired)
+
+        if fcntl is None:
+            return True  # no way to coordinate: assume a single process
+        handle = open(self.lock_path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        return True
+
+    def still_held(self):
+        """False when the connection holding the advisory lock has died."""
+        if self._conn is None:
+            return self._file is not None or fcntl is None
+        try:
+            self._conn.execute(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception:
+            self.release()
+            return False
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ExpiryScheduler:
+    """
+    Args:
+        app: Flask application (jobs run inside its app context)
+        db: SQLAlchemy database instance
+        ServiceRequest: ServiceRequest model class
+        Notification: Notification model class
+        expiry_minutes: Minutes a request may stay in 'Pending Assignment'
+        sync_seconds: How often the leader (or a candidate) checks in
+        full_sync_every: Every this many syncs, reload the whole pending set
+        lock_path: Lock file used when the database is not PostgreSQL
+    """
+
+    def __init__(self, app, db, ServiceRequest, Notification, expiry_minutes=5,
+                 sync_seconds=30, full_sync_every=10, lock_path=None):
+        self.app = app
+        self.db = db
+        self.ServiceRequest = ServiceRequest
+        self.Notification = Notification
+        self.expiry_minutes = expiry_minutes
+        self.sync_seconds = sync_seconds
+        self.full_sync_every = full_sync_every
+        self.lock_path = lock_path or os.path.join(tempfile.gettempdir(), "townow_expiry.lock")
+        self.is_leader = False
+        self.jobs = DelayedJobScheduler(name="expiry-jobs", on_error=self._on_error)
+        self._lock = None
+        self._thread = None
+        self._syncs = 0
+        self._watermark = None  # newest updated_at seen by the last sync
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.jobs.start()
+        self._thread = threading.Thread(target=self._run, name="expiry-leader", daemon=True)
+        self._thread.start()
+
+    def register(self, service_request_id, created_at):
+        """Schedules expiry for a request that just entered 'Pending Assignment'."""
+        if not self.is_leader or created_at is None:
+            return  # the leader's next sync picks it up
+        self._schedule(service_request_id, created_at)
+
+    def stats(self):
+        return {"leader": self.is_leader, "scheduled": len(self.jobs), "syncs": self._syncs}
+
+    def _schedule(self, service_request_id, created_at):
+        deadline = utc_to_epoch(created_at) + self.expiry_minutes * 60
+        self.jobs.schedule(
+            service_request_id, deadline,
+            lambda: self._expire(service_request_id)
+        )
+
+    def _expire(self, service_request_id):
+        from src.utils.service_assignment import expire_service_requests
+
+        with self.app.app_context():
+            try:
+                expired_ids, _ = expire_service_requests(
+                    self.db, self.ServiceRequest, self.Notification, [service_request_id]
+                )
+                if expired_ids:
+                    self.app.logger.info(
+                        f"Service request {service_request_id} expired after {self.expiry_minutes} minutes. "
+                        f"Status updated to 'No Provider Available'."
+                    )
+            finally:
+                self.db.session.remove()
+
+    def _on_error(self, key, error):
+        self.app.logger.error(f"Expiry job for service request {key} failed: {error}")
+
+    def _sync(self):
+        """Schedules every pending request not yet known (recently moved to pending, or all on a full sync)."""
+        ServiceRequest = self.ServiceRequest
+        stmt = select(ServiceRequest.id, ServiceRequest.created_at, ServiceRequest.updated_at).where(
+            ServiceRequest.status == 'Pending Assignment'
+        )
+        full = self._watermark is None or self._syncs % self.full_sync_every == 0
+        if not full:
+            # Small overlap so rows committed slightly out of order are not missed
+            stmt = stmt.where(ServiceRequest.updated_at >= self._watermark - datetime.timedelta(minutes=1))
+        rows = self.db.session.execute(stmt).all()
+        for service_request_id, created_at, updated_at in rows:
+            self._schedule(service_request_id, created_at)
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+        self._syncs += 1
+
+    def _run(self):
+        engine = None
+        while True:
+            try:
+                with self.app.app_context():
+                    if engine is None:
+                        engine = self.db.engine
+                        self._lock = LeaderLock(engine, self.lock_path)
+                    if self.is_leader and not self._lock.still_held():
+                        self.app.logger.warning("Expiry scheduler lost leadership")
+                        self.is_leader = False
+                        self.jobs.clear()
+                        self._watermark = None
+                    if not self.is_leader and self._lock.try_acquire():
+                        self.app.logger.info(f"Expiry scheduler is leader in pid {os.getpid()}")
+                        self.is_leader = True
+                    if self.is_leader:
+                        try:
+                            self._sync()
+                        finally:
+                            self.db.session.remove()
+            except Exception as e:
+                self.app.logger.error(f"Expiry scheduler error: {e}")
+            time.sleep(self.sync_seconds)
+
+
+_expiry_scheduler = None
+_expiry_scheduler_lock = threading.Lock()
+
+
+def get_expiry_scheduler():
+    """The process's expiry scheduler, or None when it is disabled."""
+    return _expiry_scheduler
+
+
+def start_expiry_scheduler(app, db, ServiceRequest, Notification):
+    """Creates and starts the process-wide expiry scheduler from the app config."""
+    global _expiry_scheduler
+    if _expiry_scheduler is None:
+        with _expiry_scheduler_lock:
+            if _expiry_scheduler is None:
+                scheduler = ExpiryScheduler(
+                    app, db, ServiceRequest, Notification,
+                    expiry_minutes=app.config.get("SERVICE_REQUEST_EXPIRY_MINUTES", 5),
+                    sync_seconds=app.config.get("EXPIRY_SCHEDULER_SYNC_SECONDS", 30),
+                    full_sync_every=app.config.get("EXPIRY_SCHEDULER_FULL_SYNC_EVERY", 10),
+                )
+                scheduler.start()
+                _expiry_scheduler = scheduler
+    return _expiry_scheduler
+
+
+def register_pending_request(service_request):
+    """Hook for code that moves a request to 'Pending Assignment'."""
+    scheduler = get_expiry_scheduler()
+    if scheduler is not None:
+        scheduler.register(service_request.id, service_request.created_at)
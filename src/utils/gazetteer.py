@@ -0,0 +1,223 @@
+"""
+Offline reverse geocoding from a local gazetteer.
+
+The gazetteer is a CSV with columns lat, lon, display_name, zone (for example
+an OSM extract of Dublin-area addresses). It is compiled once into a binary
+index next to the CSV, made only of fixed-size arrays and string blobs:
+
+    header      magic, cell_size_deg, place count, cell count
+    coords      lat, lon doubles per place, sorted by grid cell
+    cell keys   sorted int64 (row << 32 | col) of the non-empty cells
+    cell spans  start, end place index per cell
+    names       (count + 1) byte offsets into the names blob, then the blob
+    zones       (count + 1) byte offsets into the zones blob, then the blob
+
+The whole file is memory-mapped and read in place (cells by binary search,
+strings decoded on lookup), so nothing is parsed at startup and every worker
+shares the same page cache pages instead of holding its own copy.
+"""
+import bisect
+import csv
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from src.utils.spatial_index import KM_PER_DEGREE_LAT, haversine_km
+
+_MAGIC = b"TNGZ0002"
+_HEADER = struct.Struct("<dQQ")  # cell_size_deg, count, cell count
+_HEADER_SIZE = len(_MAGIC) + _HEADER.size
+
+
+def _cell(lat, lon, cell_size_deg):
+    return math.floor(lat / cell_size_deg), math.floor(lon / cell_size_deg)
+
+
+def _cell_key(row, col):
+    """Sortable int64 key of a grid cell."""
+    return (row << 32) | (col & 0xFFFFFFFF)
+
+
+def _string_table(values):
+    """(count + 1) packed uint64 offsets and the UTF-8 blob of `values` (None stored as empty)."""
+    encoded = [(value or "").encode("utf-8") for value in values]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return struct.pack("<%dQ" % len(offsets), *offsets), b"".join(encoded)
+
+
+def compile_gazetteer(csv_path, index_path, cell_size_deg=0.005):
+    """
+    Builds the binary index for csv_path. Rows with unparsable coordinates are skipped.
+
+    Returns:
+        Number of places written
+    """
+    places = []
+    with open(csv_path, newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            try:
+                lat, lon = float(row["lat"]), float(row["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            cell = _cell(lat, lon, cell_size_deg)
+            places.append((_cell_key(*cell), lat, lon, row.get("display_name") or "", row.get("zone") or None))
+    places.sort(key=lambda place: place[0])
+
+    cell_keys, cell_spans = [], []
+    for position, place in enumerate(places):
+        if cell_keys and cell_keys[-1] == place[0]:
+            cell_spans[-1] = position + 1
+        else:
+            cell_keys.append(place[0])
+            cell_spans.extend((position, position + 1))
+
+    name_offsets, name_blob = _string_table(place[3] for place in places)
+    zone_offsets, zone_blob = _string_table(place[4] for place in places)
+    sections = [
+        struct.pack("<%dd" % (2 * len(places)), *(v for place in places for v in (place[1], place[2]))),
+        struct.pack("<%dq" % len(cell_keys), *cell_keys),
+        struct.pack("<%dQ" % len(cell_spans), *cell_spans),
+        name_offsets, zone_offsets, name_blob, zone_blob,
+    ]
+
+    # Each process writes its own temporary file: workers starting together may all
+    # compile the index, and the last os.replace wins with a complete file
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(index_path) + ".", suffix=".tmp", dir=os.path.dirname(index_path) or "."
+    )
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(_MAGIC)
+            handle.write(_HEADER.pack(cell_size_deg, len(places), len(cell_keys)))
+            for section in sections:
+                handle.write(section)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(places)
+
+
+def _read_magic(index_path):
+    with open(index_path, "rb") as handle:
+        return handle.read(len(_MAGIC))
+
+
+class OfflineGazetteer:
+    """
+    Read-only nearest-place lookups over a compiled gazetteer index.
+
+    Args:
+        csv_path: Gazetteer CSV; its index (csv_path + ".idx") is rebuilt when missing or older
+        max_distance_km: Places further than this from the query point are ignored
+    """
+
+    def __init__(self, csv_path, max_distance_km=1.0):
+        self.csv_path = csv_path
+        self.index_path = csv_path + ".idx"
+        self.max_distance_km = max_distance_km
+
+        if (not os.path.exists(self.index_path)
+                or os.path.getmtime(self.index_path) < os.path.getmtime(csv_path)
+                or _read_magic(self.index_path) != _MAGIC):  # older index layout
+            compile_gazetteer(csv_path, self.index_path)
+
+        with open(self.index_path, "rb") as handle:
+            self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{self.index_path} is not a gazetteer index")
+        self.cell_size_deg, self.count, cells = _HEADER.unpack_from(self._mm, len(_MAGIC))
+        view = memoryview(self._mm)
+        offset = _HEADER_SIZE
+
+        def section(size, fmt=None):
+            nonlocal offset
+            part = view[offset:offset + size]
+            offset += size
+            return part.cast(fmt) if fmt else part
+
+        self._coords = section(16 * self.count, "d")
+        self._cell_keys = section(8 * cells, "q")
+        self._cell_spans = section(16 * cells, "Q")
+        self._name_offsets = section(8 * (self.count + 1), "Q")
+        self._zone_offsets = section(8 * (self.count + 1), "Q")
+        self._name_blob = section(self._name_offsets[self.count])
+        self._zone_blob = section(self._zone_offsets[self.count])
+
+    def __len__(self):
+        return self.count
+
+    def _cell_span(self, row, col):
+        """(start, end) place indexes of a grid cell, or None when it is empty."""
+        key = _cell_key(row, col)
+        position = bisect.bisect_left(self._cell_keys, key)
+        if position == len(self._cell_keys) or self._cell_keys[position] != key:
+            return None
+        return self._cell_spans[2 * position], self._cell_spans[2 * position + 1]
+
+    @staticmethod
+    def _string(offsets, blob, i):
+        return bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def nearest(self, lat, lon):
+        """
+        Index of the nearest place within max_distance_km, or None.
+        Cells are visited in rings around the query cell until no unvisited ring can be closer.
+        """
+        coords = self._coords
+        cell_lat_km = self.cell_size_deg * KM_PER_DEGREE_LAT
+        min_cell_km = min(cell_lat_km, cell_lat_km * max(math.cos(math.radians(lat)), 0.01))
+        max_ring = int(math.ceil(self.max_distance_km / min_cell_km)) + 1
+        center_row, center_col = _cell(lat, lon, self.cell_size_deg)
+
+        best, best_distance = None, self.max_distance_km
+        for ring in range(max_ring + 1):
+            for row in range(center_row - ring, center_row + ring + 1):
+                if abs(row - center_row) == ring:
+                    cols = range(center_col - ring, center_col + ring + 1)
+                else:
+                    cols = (center_col - ring, center_col + ring)
+                for col in cols:
+                    span = self._cell_span(row, col)
+                    if span is None:
+                        continue
+                    for i in range(span[0], span[1]):
+                        distance = haversine_km(lat, lon, coords[2 * i], coords[2 * i + 1])
+                        if distance <= best_distance:
+                            best, best_distance = i, distance
+            if best is not None and best_distance <= ring * min_cell_km:
+                break
+        return best
+
+    def reverse(self, lat, lon):
+        """Display name of the nearest place, or None."""
+        i = self.nearest(lat, lon)
+        return self._string(self._name_offsets, self._name_blob, i) if i is not None else None
+
+    def zone(self, lat, lon):
+        """Zone (e.g. "D1", "Lucan") of the nearest place, or None."""
+        i = self.nearest(lat, lon)
+        if i is None:
+            return None
+        return self._string(self._zone_offsets, self._zone_blob, i) or None
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer(csv_path, max_distance_km=1.0):
+    """Process-wide gazetteer, loaded on first use. Returns None when csv_path is not set or missing."""
+    global _gazetteer
+    if _gazetteer is None:
+        if not csv_path or not os.path.exists(csv_path):
+            return None
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = OfflineGazetteer(csv_path, max_distance_km)
+    return _gazetteer
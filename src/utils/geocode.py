@@ -1,7 +1,159 @@
+"""
+Reverse geocoding against Nominatim, or offline from a local gazetteer
+(GEOCODER_BACKEND=offline, see src/utils/gazetteer.py).
+
+Lookups are cached by coordinates rounded to GEOCODE_CACHE_PRECISION decimals
+(in-process LRU+TTL, or a SQLite file shared by every worker on the host),
+concurrent lookups for the same cell share one HTTP call, calls go through the
+shared pooled client (src/utils/http_client.py, no retries), and are spaced by NOMINATIM_MIN_INTERVAL_SECONDS
+across all processes to respect Nominatim's 1 request/second usage policy.
+"""
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+
 import requests
 
-def reverse_geocode_osm(lat, lon):
-    url = "https://nominatim.openstreetmap.org/reverse"
+from src.utils.gazetteer import get_gazetteer
+from src.utils.http_client import http_client
+from src.utils.ttl_cache import build_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: the limiter falls back to per-process spacing
+    fcntl = None
+
+# "nominatim" (HTTP) or "offline" (local gazetteer CSV at GAZETTEER_PATH)
+GEOCODER_BACKEND = os.environ.get("GEOCODER_BACKEND", "nominatim")
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH")
+GAZETTEER_MAX_DISTANCE_KM = float(os.environ.get("GAZETTEER_MAX_DISTANCE_KM", 1.0))
+
+NOMINATIM_REVERSE_URL = os.environ.get("NOMINATIM_REVERSE_URL", "https://nominatim.openstreetmap.org/reverse")
+NOMINATIM_USER_AGENT = os.environ.get("NOMINATIM_USER_AGENT", "TowNowApp/1.0")
+NOMINATIM_MIN_INTERVAL_SECONDS = float(os.environ.get("NOMINATIM_MIN_INTERVAL_SECONDS", 1.0))
+# Longest a request waits for its rate-limit slot before giving up with "Unknown location"
+NOMINATIM_MAX_QUEUE_SECONDS = float(os.environ.get("NOMINATIM_MAX_QUEUE_SECONDS", 3.0))
+GEOCODE_TIMEOUT_SECONDS = float(os.environ.get("GEOCODE_TIMEOUT_SECONDS", 5.0))
+
+# 4 decimals ~ 11 m, enough for a street address
+GEOCODE_CACHE_BACKEND = os.environ.get("GEOCODE_CACHE_BACKEND", "memory")
+GEOCODE_CACHE_PRECISION = int(os.environ.get("GEOCODE_CACHE_PRECISION", 4))
+GEOCODE_CACHE_TTL_SECONDS = int(os.environ.get("GEOCODE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.environ.get("GEOCODE_CACHE_MAX_ENTRIES", 50000))
+GEOCODE_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "townow_cache.sqlite3"))
+GEOCODE_RATE_LIMIT_PATH = os.environ.get(
+    "GEOCODE_RATE_LIMIT_PATH", os.path.join(tempfile.gettempdir(), "townow_nominatim.lock")
+)
+
+UNKNOWN_LOCATION = "Unknown location"
+
+geocode_cache = build_cache(
+    GEOCODE_CACHE_BACKEND,
+    max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=GEOCODE_CACHE_TTL_SECONDS,
+    path=GEOCODE_CACHE_PATH,
+    table="geocode_cache",
+)
+
+
+class HostRateLimiter:
+    """
+    Spaces calls at least min_interval seconds apart across every process on
+    the host. The time of the last call is kept in a small file guarded by an
+    exclusive flock; without fcntl it only spaces calls within this process.
+    """
+
+    def __init__(self, path, min_interval):
+        self.path = path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_local = 0.0
+
+    def _reserve_slot(self, max_wait):
+        """
+        Reserves the next free slot if it starts within max_wait seconds.
+        Returns its start time (epoch seconds), or None without reserving anything.
+        """
+        now = time.time()
+        if fcntl is None:
+            slot = max(now, self._last_local + self.min_interval)
+            if slot - now > max_wait:
+                return None
+            self._last_local = slot
+            return slot
+        with open(self.path, "a+") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                handle.seek(0)
+                try:
+                    last = float(handle.read().strip() or 0)
+                except ValueError:
+                    last = 0.0
+                slot = max(now, last + self.min_interval)
+                # A rejected caller leaves the file alone, so rejections never push the next slot further away
+                if slot - now > max_wait:
+                    return None
+                handle.seek(0)
+                handle.truncate()
+                handle.write(repr(slot))
+                handle.flush()
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        return slot
+
+    def acquire(self, max_wait):
+        """Waits for a slot. Returns False, without waiting or reserving, when the slot is further than max_wait away."""
+        with self._lock:
+            slot = self._reserve_slot(max_wait)
+        if slot is None:
+            return False
+        delay = slot - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+
+class _InflightLookup:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+_rate_limiter = HostRateLimiter(GEOCODE_RATE_LIMIT_PATH, NOMINATIM_MIN_INTERVAL_SECONDS)
+# Sin reintentos: cada llamada ya pasa por el limitador de 1 petición/segundo
+http_client.register(
+    "nominatim",
+    "{0.scheme}://{0.netloc}".format(urllib.parse.urlsplit(NOMINATIM_REVERSE_URL)),
+    read_timeout=GEOCODE_TIMEOUT_SECONDS,
+    retries=0,
+    max_connections=4,
+    headers={"User-Agent": NOMINATIM_USER_AGENT},
+)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def geocode_cache_key(lat, lon, precision=None):
+    if precision is None:
+        precision = GEOCODE_CACHE_PRECISION
+    return "{:.{p}f},{:.{p}f}".format(float(lat), float(lon), p=precision)
+
+
+def get_geocode_cache_stats():
+    """Hit/miss counters of the geocode cache, for the metrics endpoint."""
+    stats = geocode_cache.stats()
+    stats["precision"] = GEOCODE_CACHE_PRECISION
+    stats["inflight"] = len(_inflight)
+    return stats
+
+
+def _fetch_reverse_geocode_osm(lat, lon):
+    """One Nominatim call. Returns the display name, or None when the lookup failed."""
+    if not _rate_limiter.acquire(NOMINATIM_MAX_QUEUE_SECONDS):
+        return None
+
     params = {
         "format": "json",
         "lat": lat,
@@ -9,13 +161,61 @@ def reverse_geocode_osm(lat, lon):
         "zoom": 18,
         "addressdetails": 1
     }
-    headers = {
-        "User-Agent": "TowNowApp/1.0"
-    }
+    try:
+        response = http_client.get("nominatim", NOMINATIM_REVERSE_URL, params=params)
+    except requests.exceptions.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    try:
+        return response.json().get("display_name", UNKNOWN_LOCATION)
+    except ValueError:
+        return None
+
+
+def reverse_geocode_osm(lat, lon):
+    key = geocode_cache_key(lat, lon)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Coalesce concurrent lookups of the same cell onto one call
+    with _inflight_lock:
+        lookup = _inflight.get(key)
+        leader = lookup is None
+        if leader:
+            lookup = _inflight[key] = _InflightLookup()
+
+    if not leader:
+        lookup.done.wait(NOMINATIM_MAX_QUEUE_SECONDS + GEOCODE_TIMEOUT_SECONDS)
+        return lookup.result or UNKNOWN_LOCATION
+
+    try:
+        result = _fetch_reverse_geocode_osm(lat, lon)
+        if result is not None:
+            geocode_cache.set(key, result)
+        lookup.result = result
+    finally:
+        lookup.done.set()
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+    return result or UNKNOWN_LOCATION
+
+
+def reverse_geocode(lat, lon):
+    """Address for the coordinates, from the configured backend."""
+    if GEOCODER_BACKEND == "offline":
+        gazetteer = get_gazetteer(GAZETTEER_PATH, GAZETTEER_MAX_DISTANCE_KM)
+        name = gazetteer.reverse(lat, lon) if gazetteer else None
+        return name or UNKNOWN_LOCATION
+    return reverse_geocode_osm(lat, lon)
+
 
-    response = requests.get(url, params=params, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        return data.get("display_name", "Unknown location")
-    else:
-        return "Unknown location"
+def zone_for_coordinates(lat, lon):
+    """
+    Service zone (as used by current_location_zone) of the nearest gazetteer place,
+    or None when no gazetteer is configured or nothing is close enough.
+    """
+    gazetteer = get_gazetteer(GAZETTEER_PATH, GAZETTEER_MAX_DISTANCE_KM)
+    return gazetteer.zone(lat, lon) if gazetteer else None
@@ -0,0 +1,320 @@
+"""
+Shared outbound HTTP client for the external integrations (Mapbox, Nominatim).
+
+Each integration registers an upstream (name, base URL, timeouts, retries,
+connection limit) and calls http_client.get(name, url, ...):
+
+- one pooled requests.Session per process (recreated after a fork), so
+  consecutive calls to a host reuse the TCP/TLS connection;
+- a connection pool per upstream, at most HTTP_MAX_CONNECTIONS_PER_HOST
+  connections; callers beyond that wait for a free one for at most the
+  connect timeout (cut to what is left of the deadline), then fail with
+  PoolTimeoutError, so a saturated pool cannot outlast the deadline;
+- (connect, read) timeouts, and an optional per-call deadline that bounds all
+  the attempts together;
+- retries of connection errors, timeouts, 429 and 5xx with full-jitter
+  exponential backoff;
+- a circuit breaker per upstream: after HTTP_BREAKER_FAILURES consecutive
+  failed calls, calls fail fast with CircuitOpenError (a RequestException,
+  so existing handlers keep working) for HTTP_BREAKER_RESET_SECONDS, then a
+  single probe call decides whether it closes again (a probe that has not
+  reported back after another HTTP_BREAKER_RESET_SECONDS is considered lost
+  and the next call probes instead);
+- latency histograms and counters per upstream, for the metrics endpoint.
+
+`flask http-client-benchmark` measures the connection reuse against a local
+TLS stub (tools/load_test.py).
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", 3.05))
+HTTP_READ_TIMEOUT_SECONDS = float(os.environ.get("HTTP_READ_TIMEOUT_SECONDS", 10))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", 10))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 2))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.environ.get("HTTP_RETRY_BACKOFF_SECONDS", 0.2))
+HTTP_BREAKER_FAILURES = int(os.environ.get("HTTP_BREAKER_FAILURES", 5))
+HTTP_BREAKER_RESET_SECONDS = float(os.environ.get("HTTP_BREAKER_RESET_SECONDS", 30))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Límites superiores (ms) de los buckets del histograma de latencia
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+
+class PoolTimeoutError(requests.exceptions.Timeout):
+    """Raised when no pooled connection to the upstream became free in time."""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """True if a call may go out; in half-open state only one probe at a time."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self.probe_started_at = now
+                return True
+            # The probe never reported (its thread died, or a caller skipped the outcome): probe again
+            if self.state == self.HALF_OPEN and now - self.probe_started_at >= self.reset_seconds:
+                self.probe_started_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures,
+                    "rejected": self.rejected, "times_opened": self.times_opened}
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+            for i, bound in enumerate(self.buckets_ms):
+                if ms <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+
+    def percentile(self, fraction):
+        """Upper bound (ms) of the bucket holding the given fraction of the samples."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        running = 0
+        for bound, count in zip(self.buckets_ms + (self.max_ms,), self.counts):
+            running += count
+            if running >= fraction * total:
+                return bound
+        return self.max_ms
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.counts)
+            labels = [f"le_{bound}" for bound in self.buckets_ms] + [f"gt_{self.buckets_ms[-1]}"]
+            return {
+                "count": total,
+                "avg_ms": round(self.total_ms / total, 1) if total else None,
+                "max_ms": round(self.max_ms, 1),
+                "p50_ms": self.percentile(0.5),
+                "p95_ms": self.percentile(0.95),
+                "histogram": dict(zip(labels, self.counts)),
+            }
+
+
+class Upstream:
+    """Settings, breaker and metrics of one external service."""
+
+    def __init__(self, name, base_url, connect_timeout, read_timeout, retries, max_connections, headers):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.max_connections = max_connections
+        self.headers = dict(headers or {})
+        self.breaker = CircuitBreaker(HTTP_BREAKER_FAILURES, HTTP_BREAKER_RESET_SECONDS)
+        self.latency = LatencyHistogram()
+        # Connection checkout: urllib3's blocking pool waits without a timeout, so
+        # the pool never blocks and this semaphore (one slot per connection) does
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "pool_timeouts": 0}
+
+    def count(self, **increments):
+        with self._lock:
+            for key, amount in increments.items():
+                self.counters[key] += amount
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, breaker=self.breaker.stats(), latency=self.latency.stats())
+
+
+class HttpClient:
+    def __init__(self):
+        self._upstreams = {}
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+    def register(self, name, base_url, connect_timeout=None, read_timeout=None, retries=None,
+                 max_connections=None, headers=None):
+        """
+        Declares an upstream. Registering the same name again replaces its settings.
+
+        Args:
+            name: Upstream name used in get()/request() and in the metrics
+            base_url: Scheme and host (e.g. https://api.mapbox.com); its requests use their own pool
+            connect_timeout / read_timeout: Seconds (HTTP_CONNECT/READ_TIMEOUT_SECONDS by default)
+            retries: Extra attempts after a retryable failure (HTTP_RETRIES by default)
+            max_connections: Pooled connections to the host (HTTP_MAX_CONNECTIONS_PER_HOST by default)
+            headers: Headers added to every request
+        """
+        upstream = Upstream(
+            name, base_url,
+            HTTP_CONNECT_TIMEOUT_SECONDS if connect_timeout is None else connect_timeout,
+            HTTP_READ_TIMEOUT_SECONDS if read_timeout is None else read_timeout,
+            HTTP_RETRIES if retries is None else retries,
+            max_connections or HTTP_MAX_CONNECTIONS_PER_HOST,
+            headers,
+        )
+        with self._lock:
+            self._upstreams[name] = upstream
+            self._session = None  # remount the adapters on next use
+        return upstream
+
+    def upstream(self, name):
+        return self._upstreams[name]
+
+    def _get_session(self):
+        """The process' pooled session; a forked worker builds its own."""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                for upstream in self._upstreams.values():
+                    session.mount(upstream.base_url, HTTPAdapter(
+                        pool_connections=1, pool_maxsize=upstream.max_connections, pool_block=False
+                    ))
+                self._session, self._pid = session, os.getpid()
+            return self._session
+
+    def request(self, name, method, url, deadline=None, **kwargs):
+        """
+        Sends a request to a registered upstream.
+
+        Args:
+            name: Upstream name
+            method: HTTP method; only GET/HEAD/OPTIONS are retried
+            url: Absolute URL, normally under the upstream's base_url
+            deadline: Seconds all attempts together may take (each attempt's
+                read timeout is cut to what is left)
+            **kwargs: Passed to requests (params, json, headers, timeout, verify...)
+
+        Returns:
+            requests.Response of the last attempt (may be a 4xx/5xx)
+
+        Raises:
+            CircuitOpenError while the upstream's breaker is open, or the
+            requests exception of the last attempt
+        """
+        upstream = self._upstreams[name]
+        if not upstream.breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker open for {name}")
+
+        session = self._get_session()
+        headers = dict(upstream.headers, **kwargs.pop("headers", {}))
+        timeout = kwargs.pop("timeout", None) or upstream.timeout
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        retries = upstream.retries if method.upper() in ("GET", "HEAD", "OPTIONS") else 0
+        started = time.monotonic()
+        upstream.count(calls=1)
+
+        attempt = 0
+        while True:
+            timeout = (connect_timeout, read_timeout)
+            if deadline is not None:
+                remaining = max(deadline - (time.monotonic() - started), 0.001)
+                timeout = (min(connect_timeout, remaining), min(read_timeout, remaining))
+            if not upstream.slots.acquire(timeout=timeout[0]):
+                # Local saturation, not an upstream failure: the breaker is left alone
+                upstream.count(failures=1, pool_timeouts=1)
+                raise PoolTimeoutError(f"No free connection to {name} within {timeout[0]:.3f} s")
+            attempt_start = time.perf_counter()
+            error, response = None, None
+            try:
+                response = session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except Exception:
+                # Not retryable (invalid URL, too many redirects, bad arguments...), but the
+                # breaker still needs the outcome, or a half-open probe would never report
+                upstream.latency.record(time.perf_counter() - attempt_start)
+                upstream.count(attempts=1, failures=1)
+                upstream.breaker.record_failure()
+                raise
+            finally:
+                upstream.slots.release()  # the body is read, the connection is back in the pool
+            upstream.latency.record(time.perf_counter() - attempt_start)
+            upstream.count(attempts=1)
+
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            if not failed:
+                upstream.breaker.record_success()
+                return response
+
+            # Full jitter: random wait in [0, backoff * 2^attempt]
+            backoff = random.uniform(0, HTTP_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+            out_of_time = deadline is not None and time.monotonic() - started + backoff >= deadline
+            if attempt >= retries or out_of_time:
+                upstream.count(failures=1)
+                upstream.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            upstream.count(retries=1)
+            time.sleep(backoff)
+
+    def get(self, name, url, **kwargs):
+        return self.request(name, "GET", url, **kwargs)
+
+    def stats(self):
+        return {name: upstream.stats() for name, upstream in self._upstreams.items()}
+
+
+http_client = HttpClient()
+
+
+def get_http_client_stats():
+    """Per-upstream counters, breaker state and latency histograms, for the metrics endpoint."""
+    return http_client.stats()
@@ -0,0 +1,135 @@
+"""
+Cached identities for Flask-Login.
+
+The user_loader returns a CachedIdentity built from a small record (id, name,
+email, role flags) kept in a short-TTL LRU cache, so authenticated requests
+that only check who the user is and what they may do cost no query.
+Flask-Login already memoises the loaded identity for the rest of the request.
+Anything else (methods, provider columns, writes) transparently loads the
+full User row once per request.
+
+Entries are invalidated whenever a User row is updated or deleted through the
+ORM (after the flush and again after the commit). With the "memory" backend
+other workers may serve a stale record for up to IDENTITY_CACHE_TTL_SECONDS;
+the "sqlite" backend shares the cache, and its invalidations, between the
+workers of a host.
+"""
+import threading
+
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, select
+
+from src.utils.ttl_cache import build_cache
+
+IDENTITY_FIELDS = ("id", "fullname", "email", "user_type", "is_admin", "is_available")
+
+
+class CachedIdentity(UserMixin):
+    """
+    current_user for cached identities: IDENTITY_FIELDS come from the cache,
+    everything else from the User row, loaded on first use.
+
+    Args:
+        record: Dict with IDENTITY_FIELDS
+        db: SQLAlchemy database instance
+        User: User model class
+    """
+
+    def __init__(self, record, db, User):
+        self.__dict__.update(_record=record, _db=db, _model=User, _user=None)
+
+    def as_user(self):
+        """The full User object (one query, then memoised for this identity)."""
+        user = self.__dict__["_user"]
+        if user is None:
+            user = self.__dict__["_db"].session.get(self.__dict__["_model"], self.__dict__["_record"]["id"])
+            self.__dict__["_user"] = user
+        return user
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        # Once the row is loaded it is the source of truth (it may have been modified)
+        if self.__dict__["_user"] is None and name in self.__dict__["_record"]:
+            return self.__dict__["_record"][name]
+        return getattr(self.as_user(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.as_user(), name, value)
+
+    def __repr__(self):
+        record = self.__dict__["_record"]
+        return f"<CachedIdentity {record['fullname']} ({record['email']})>"
+
+
+_identity_cache = None
+_identity_cache_lock = threading.Lock()
+
+
+def get_identity_cache(app):
+    """Process-wide identity cache, created on first use from the app config."""
+    global _identity_cache
+    if _identity_cache is None:
+        with _identity_cache_lock:
+            if _identity_cache is None:
+                _identity_cache = build_cache(
+                    app.config.get("IDENTITY_CACHE_BACKEND", "memory"),
+                    max_entries=app.config.get("IDENTITY_CACHE_MAX_ENTRIES", 10000),
+                    ttl_seconds=app.config.get("IDENTITY_CACHE_TTL_SECONDS", 30),
+                    path=app.config.get("IDENTITY_CACHE_PATH"),
+                    table="identity_cache",
+                )
+    return _identity_cache
+
+
+def load_identity(app, user_id, db, User):
+    """
+    user_loader body: cached record -> CachedIdentity, one SELECT on a miss.
+
+    Returns:
+        CachedIdentity, or None if the user does not exist
+    """
+    cache = get_identity_cache(app)
+    key = str(int(user_id))
+    record = cache.get(key)
+    if record is None:
+        row = db.session.execute(
+            select(*(getattr(User, field) for field in IDENTITY_FIELDS)).where(User.id == int(user_id))
+        ).first()
+        if row is None:
+            return None
+        record = dict(zip(IDENTITY_FIELDS, row))
+        cache.set(key, record)
+    return CachedIdentity(record, db, User)
+
+
+def invalidate_identity(app, user_id):
+    get_identity_cache(app).delete(str(user_id))
+
+
+def install_identity_invalidation(app, session, User):
+    """
+    Drops cached identities of User rows updated or deleted in a flush, and
+    again after the commit, so a concurrent request cannot re-cache the
+    pre-commit row for a whole TTL.
+    """
+    def after_flush(flush_session, flush_context):
+        changed = {
+            inspect(obj).identity[0] for obj in list(flush_session.dirty) + list(flush_session.deleted)
+            if isinstance(obj, User) and inspect(obj).identity is not None
+        }
+        if changed:
+            flush_session.info.setdefault("identity_invalidations", set()).update(changed)
+            for user_id in changed:
+                invalidate_identity(app, user_id)
+
+    def after_commit(commit_session):
+        for user_id in commit_session.info.pop("identity_invalidations", ()):
+            invalidate_identity(app, user_id)
+
+    def after_rollback(rollback_session):
+        rollback_session.info.pop("identity_invalidations", None)
+
+    for name, listener in (("after_flush", after_flush), ("after_commit", after_commit),
+                           ("after_rollback", after_rollback)):
+        event.listen(session, name, listener)
@@ -0,0 +1,61 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Pages are ordered by (timestamp, id) descending and the cursor is the last
+row's pair, so fetching page N costs the same as page 1: the database seeks
+straight to the cursor through an index instead of skipping OFFSET rows.
+"""
+import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(timestamp, row_id):
+    """Cursor for the row after which the next page starts: '<ISO timestamp>_<id>'."""
+    return f"{timestamp.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; None if the cursor is missing or malformed."""
+    try:
+        timestamp, row_id = cursor.rsplit('_', 1)
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_before(query, timestamp_column, id_column, cursor):
+    """
+    Restricts a (timestamp DESC, id DESC) ordered query to the rows after the cursor.
+
+    Args:
+        query: SQLAlchemy Select
+        timestamp_column: Column of the first sort key
+        id_column: Primary key column (tie-breaker)
+        cursor: Decoded cursor (timestamp, id) or None
+
+    Returns:
+        The filtered and ordered Select
+    """
+    if cursor:
+        timestamp, row_id = cursor
+        query = query.where(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id)
+        ))
+    return query.order_by(timestamp_column.desc(), id_column.desc())
+
+
+def fetch_page(session, query, page_size, timestamp_key, id_key='id'):
+    """
+    Runs a keyset query for one page, reading one extra row to detect the next page.
+
+    Returns:
+        Tuple (rows, next_cursor or None)
+    """
+    rows = session.execute(query.limit(page_size + 1)).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_key), getattr(last, id_key))
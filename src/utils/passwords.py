@@ -0,0 +1,188 @@
+"""
+Password hashing with configurable cost profiles.
+
+PASSWORD_HASH_PROFILE (src/config.py) picks the Werkzeug method used for new
+hashes; init_password_hashing() applies it at startup and rejects unknown
+profile names. Stored
+hashes keep the method they were created with, so verification works across
+profile changes; after a successful sign-in a hash made with other parameters
+is recomputed in the background and written back (rehash-on-login). At most
+PASSWORD_REHASH_MAX_PENDING rehashes wait in the queue (each holds a plaintext
+password); past that they are dropped and retried at a later sign-in.
+
+With PASSWORD_HASH_WORKERS > 0 hashing and verification run on a bounded
+process pool: at most PASSWORD_HASH_MAX_PENDING jobs are queued, further
+callers wait for a slot, so a sign-in burst cannot pile up unbounded CPU work.
+
+`flask password-profiles` measures every profile on this machine, through
+the same process pool.
+"""
+import concurrent.futures
+import os
+import threading
+import time
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Perfil -> método de Werkzeug ("scrypt:N:r:p" o "pbkdf2:sha256:iteraciones")
+PASSWORD_HASH_PROFILES = {
+    "fast": "scrypt:8192:8:1",
+    "interactive": "scrypt:16384:8:1",
+    "default": "scrypt:32768:8:1",   # Werkzeug's default
+    "strong": "scrypt:65536:8:1",
+    "pbkdf2": "pbkdf2:sha256:600000",
+}
+
+# Fijados por init_password_hashing() al crear la app; hasta entonces perfil "default", sin pool
+_method = PASSWORD_HASH_PROFILES["default"]
+_pool = None
+_rehash_slots = threading.BoundedSemaphore(32)
+
+
+def current_method():
+    """Werkzeug method string of the configured profile."""
+    return _method
+
+
+def hash_method(password_hash):
+    """'scrypt:32768:8:1$salt$hash' -> 'scrypt:32768:8:1'."""
+    return (password_hash or "").split("$", 1)[0]
+
+
+def needs_rehash(password_hash):
+    return hash_method(password_hash) != current_method()
+
+
+class _HashPool:
+    """Bounded process pool for hashing, recreated in forked workers."""
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args):
+        with self._slots:
+            return self._get_executor().submit(fn, *args).result()
+
+
+def init_password_hashing(app):
+    """
+    Applies the app's PASSWORD_HASH_PROFILE / _WORKERS / _MAX_PENDING settings.
+
+    Raises:
+        ValueError: PASSWORD_HASH_PROFILE is not one of PASSWORD_HASH_PROFILES
+    """
+    global _method, _pool, _rehash_slots
+    profile = app.config.get("PASSWORD_HASH_PROFILE", "default")
+    if profile not in PASSWORD_HASH_PROFILES:
+        raise ValueError(
+            f"Unknown PASSWORD_HASH_PROFILE {profile!r}, expected one of: {', '.join(PASSWORD_HASH_PROFILES)}"
+        )
+    workers = app.config.get("PASSWORD_HASH_WORKERS", 0)
+    _method = PASSWORD_HASH_PROFILES[profile]
+    _pool = _HashPool(workers, app.config.get("PASSWORD_HASH_MAX_PENDING", 16)) if workers > 0 else None
+    _rehash_slots = threading.BoundedSemaphore(max(1, app.config.get("PASSWORD_REHASH_MAX_PENDING", 32)))
+
+
+def _run(fn, *args):
+    if _pool is None:
+        return fn(*args)
+    return _pool.run(fn, *args)
+
+
+def hash_password(password, method=None):
+    """Hash for a new password with the configured (or given) method."""
+    return _run(generate_password_hash, password, method or current_method())
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+_rehash_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-rehash")
+
+
+def schedule_rehash(app, db, User, user_id, old_hash, password):
+    """
+    Recomputes a hash made with outdated parameters after a successful sign-in,
+    off the request path. The UPDATE only applies if the stored hash is still
+    the one that was verified, so a concurrent password change always wins.
+
+    Returns:
+        False when PASSWORD_REHASH_MAX_PENDING rehashes are already pending and
+        this one was dropped (the user is rehashed at a later sign-in)
+    """
+    slots = _rehash_slots
+    if not slots.acquire(blocking=False):
+        return False
+
+    def rehash():
+        from sqlalchemy import update
+
+        try:
+            new_hash = hash_password(password)
+            with app.app_context():
+                try:
+                    db.session.execute(
+                        update(User).where(User.id == user_id, User.password_hash == old_hash)
+                        .values(password_hash=new_hash)
+                    )
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Password rehash for user {user_id} failed: {e}")
+                finally:
+                    db.session.remove()
+        finally:
+            slots.release()
+
+    _rehash_executor.submit(rehash)
+    return True
+
+
+@click.command("password-profiles")
+@click.option("--rounds", default=20, show_default=True, help="Verifications timed per profile.")
+@click.option("--workers", type=int, default=None,
+              help="Hash pool processes (default PASSWORD_HASH_WORKERS, or the CPU count if that is 0).")
+@click.option("--concurrency", type=int, default=None, help="Threads verifying at once (default 2 x workers).")
+@with_appcontext
+def password_profiles_command(rounds, workers, concurrency):
+    """Times each hash profile through the hash pool: latency per verification and sign-ins per second."""
+    from flask import current_app
+
+    workers = workers or current_app.config.get("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1
+    concurrency = concurrency or 2 * workers
+    pool = _HashPool(workers, current_app.config.get("PASSWORD_HASH_MAX_PENDING", 16))
+    pool.run(check_password_hash, generate_password_hash("warm-up", "pbkdf2:sha256:1"), "warm-up")
+
+    click.echo(f"{workers} pool workers, {concurrency} concurrent sign-ins, {rounds} verifications per profile")
+    click.echo(f"{'profile':<12} {'method':<24} {'ms/verify':>10} {'sign-ins/s':>11}")
+    for profile, method in PASSWORD_HASH_PROFILES.items():
+        stored = generate_password_hash("benchmark-password", method)
+        latencies = []
+
+        def verify():
+            start = time.perf_counter()
+            pool.run(check_password_hash, stored, "benchmark-password")
+            latencies.append(time.perf_counter() - start)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as callers:
+            start = time.perf_counter()
+            for future in [callers.submit(verify) for _ in range(rounds)]:
+                future.result()
+            elapsed = time.perf_counter() - start
+        per_verify = sum(latencies) / len(latencies)
+        marker = " *" if method == current_method() else ""
+        click.echo(f"{profile:<12} {method:<24} {per_verify * 1000:>10.1f} {rounds / elapsed:>11.1f}{marker}")
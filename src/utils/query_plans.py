@@ -0,0 +1,203 @@
+"""
+Query-plan regression checks for the hot query paths.
+
+Each check builds the same statement as the code path it names, runs EXPLAIN
+on it and asserts that one of the expected indexes is used. By default the
+checks run on a scratch in-memory SQLite database created from the models and
+loaded with reference planner statistics, so they verify the index
+definitions. With --live they run on the configured database, which verifies
+the migrations were applied (run ANALYZE first on SQLite). On PostgreSQL
+sequential scans are disabled for the check so tiny tables do not hide a
+missing index.
+
+    flask check-query-plans [--live] [--verbose]
+"""
+import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, exists, select
+
+
+# sqlite_stat1 rows describing a production-sized database (row count, then
+# average rows per distinct prefix of the index columns). Without statistics
+# SQLite guesses join orders, so the scratch check loads these first.
+REFERENCE_SQLITE_STATS = [
+    ("users", "ix_users_user_type_available", "10000 3334 2000"),
+    ("users", "sqlite_autoindex_users_1", "10000 1"),
+    ("provider_service_zones", "ix_provider_service_zones_zone", "20000 400 1"),
+    ("provider_service_zones", "sqlite_autoindex_provider_service_zones_1", "20000 2 1"),
+    ("provider_vehicle_types", "ix_provider_vehicle_types_vehicle_type", "15000 3000 1"),
+    ("provider_vehicle_types", "sqlite_autoindex_provider_vehicle_types_1", "15000 2 1"),
+    ("service_requests", "ix_service_requests_status_created_at", "200000 25000 2"),
+    ("service_requests", "ix_service_requests_pending_created_at", "50 1"),
+    ("service_requests", "ix_service_requests_user_updated_at", "200000 20 1 1"),
+    ("service_requests", "ix_service_requests_user_created_at", "200000 20 1 1"),
+    ("service_requests", "ix_service_requests_created_at_id", "200000 1 1"),
+    ("notifications", "ix_notifications_request_provider_status", "500000 10 1 1"),
+    ("notifications", "ix_notifications_provider_status", "500000 250 60"),
+]
+
+
+def load_reference_stats(connection, stats=REFERENCE_SQLITE_STATS):
+    """Replaces the planner statistics of a SQLite database with `stats`."""
+    connection.exec_driver_sql("ANALYZE")
+    connection.exec_driver_sql("DELETE FROM sqlite_stat1")
+    for table, index, stat in stats:
+        connection.exec_driver_sql("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", (table, index, stat))
+    connection.exec_driver_sql("ANALYZE sqlite_master")  # reload the statistics
+
+
+def hot_queries(User, ServiceRequest, Notification, ProviderServiceZone, ProviderVehicleType):
+    """
+    Returns:
+        List of (name, statement, expected index names) for every hot query
+    """
+    cutoff = datetime.datetime(2026, 1, 1)
+    return [
+        (
+            "expiry sweep (check_expired_service_requests)",
+            select(ServiceRequest.id).where(
+                ServiceRequest.status == 'Pending Assignment',
+                ServiceRequest.created_at < cutoff
+            ).order_by(ServiceRequest.created_at).limit(500),
+            {"ix_service_requests_status_created_at", "ix_service_requests_pending_created_at"},
+        ),
+        (
+            "expiry scheduler sync",
+            select(ServiceRequest.id, ServiceRequest.created_at, ServiceRequest.updated_at).where(
+                ServiceRequest.status == 'Pending Assignment',
+                ServiceRequest.updated_at >= cutoff
+            ),
+            {"ix_service_requests_status_created_at", "ix_service_requests_pending_created_at"},
+        ),
+        (
+            "client notifications page",
+            select(ServiceRequest.id, ServiceRequest.status, ServiceRequest.updated_at).where(
+                ServiceRequest.user_id == 1
+            ).order_by(ServiceRequest.updated_at.desc(), ServiceRequest.id.desc()).limit(21),
+            {"ix_service_requests_user_updated_at"},
+        ),
+        (
+            "service request listing (customer)",
+            select(ServiceRequest.id, ServiceRequest.created_at, ServiceRequest.status).where(
+                ServiceRequest.user_id == 1
+            ).order_by(ServiceRequest.created_at.desc(), ServiceRequest.id.desc()).limit(101),
+            {"ix_service_requests_user_created_at"},
+        ),
+        (
+            "service request listing (admin)",
+            select(ServiceRequest.id, ServiceRequest.created_at, ServiceRequest.status).order_by(
+                ServiceRequest.created_at.desc(), ServiceRequest.id.desc()
+            ).limit(101),
+            {"ix_service_requests_created_at_id"},
+        ),
+        (
+            "accept guard (assign_service_request)",
+            select(exists().where(
+                Notification.service_request_id == 1,
+                Notification.provider_id == 1,
+                Notification.status == 'sent'
+            )),
+            {"ix_notifications_request_provider_status"},
+        ),
+        (
+            "already notified providers (wave dispatch)",
+            select(Notification.provider_id).where(Notification.service_request_id == 1),
+            {"ix_notifications_request_provider_status"},
+        ),
+        (
+            "provider pending alerts",
+            select(Notification.id).where(Notification.provider_id == 1, Notification.status == 'sent'),
+            {"ix_notifications_provider_status"},
+        ),
+        (
+            "available providers (spatial index load)",
+            select(User.id, User.last_latitude, User.last_longitude).where(
+                User.user_type == 'provider',
+                User.is_available.is_(True)
+            ),
+            {"ix_users_user_type_available"},
+        ),
+        (
+            "zone matching (find_matching_providers)",
+            select(User.id).join(
+                ProviderServiceZone, ProviderServiceZone.provider_id == User.id
+            ).join(
+                ProviderVehicleType, ProviderVehicleType.provider_id == User.id
+            ).where(
+                ProviderServiceZone.zone == 'D1',
+                ProviderVehicleType.vehicle_type == 'sedan',
+                User.user_type == 'provider',
+                User.is_available.is_(True)
+            ),
+            {"ix_provider_service_zones_zone", "ix_provider_vehicle_types_vehicle_type"},
+        ),
+    ]
+
+
+def explain(connection, statement):
+    """EXPLAIN (QUERY PLAN) output of a statement as a list of lines."""
+    dialect = connection.dialect
+    compiled = statement.compile(dialect=dialect)
+    params = compiled.params
+    if dialect.name == "sqlite":
+        # Driver-level execution: bind datetimes the way the SQLite DateTime type stores them
+        values = tuple(
+            params[key].isoformat(" ") if isinstance(params[key], datetime.datetime) else params[key]
+            for key in compiled.positiontup
+        )
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, values)
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql("EXPLAIN " + compiled.string, params)
+    return [row[0] for row in rows]
+
+
+def check_query_plans(connection, queries):
+    """
+    Returns:
+        List of (name, ok, plan lines)
+    """
+    results = []
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET enable_seqscan = off")
+    for name, statement, expected_indexes in queries:
+        plan = explain(connection, statement)
+        ok = any(index in line for line in plan for index in expected_indexes)
+        results.append((name, ok, plan))
+    return results
+
+
+@click.command("check-query-plans")
+@click.option("--live", is_flag=True, help="Check the configured database instead of a scratch SQLite one.")
+@click.option("--verbose", is_flag=True, help="Print every plan, not only the failing ones.")
+@with_appcontext
+def check_query_plans_command(live, verbose):
+    """Fails if a hot query stopped using its index."""
+    from src import db
+    from src.models import User, ServiceRequest, Notification, ProviderServiceZone, ProviderVehicleType
+
+    if live:
+        engine = db.engine
+    else:
+        engine = create_engine("sqlite://")
+        db.metadata.create_all(engine)
+
+    queries = hot_queries(User, ServiceRequest, Notification, ProviderServiceZone, ProviderVehicleType)
+    with engine.connect() as connection:
+        if not live:
+            load_reference_stats(connection)
+        results = check_query_plans(connection, queries)
+        connection.rollback()
+
+    failures = 0
+    for name, ok, plan in results:
+        click.echo(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if verbose or not ok:
+            for line in plan:
+                click.echo(f"       {line}")
+        failures += not ok
+    current_app.logger.info(f"Query plan check: {len(results) - failures}/{len(results)} using their index")
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,85 @@
+"""
+Delayed-job scheduler: runs callbacks at a given wall-clock deadline.
+
+Jobs are kept in a heap ordered by deadline and a single thread sleeps until
+the earliest one is due, so a job fires at its deadline instead of on the next
+poll. Scheduling a key that already exists replaces the previous job.
+"""
+import calendar
+import heapq
+import itertools
+import threading
+import time
+
+
+def utc_to_epoch(dt):
+    """Naive UTC datetime (as stored in the DB) -> epoch seconds."""
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+class DelayedJobScheduler:
+    """
+    Args:
+        name: Thread name, for logs
+        on_error: Optional callable(key, exception) for failing callbacks
+    """
+
+    def __init__(self, name="delayed-jobs", on_error=None):
+        self.name = name
+        self.on_error = on_error
+        self._heap = []
+        self._jobs = {}  # key -> heap entry currently valid for it
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        with self._cond:
+            return len(self._jobs)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def schedule(self, key, deadline, callback):
+        """Runs callback() at deadline (epoch seconds). Replaces any job already scheduled under key."""
+        entry = [deadline, next(self._counter), key, callback]
+        with self._cond:
+            self._jobs[key] = entry
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    def cancel(self, key):
+        with self._cond:
+            self._jobs.pop(key, None)
+
+    def clear(self):
+        with self._cond:
+            self._jobs.clear()
+            self._heap.clear()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    # Drop entries that were replaced or cancelled
+                    while self._heap and self._jobs.get(self._heap[0][2]) is not self._heap[0]:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                _, _, key, callback = heapq.heappop(self._heap)
+                del self._jobs[key]
+            try:
+                callback()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(key, e)
@@ -0,0 +1,101 @@
+"""
+Fast JSON path for API responses.
+
+Listing endpoints select only the columns they return, as plain tuples, and
+encode them in one go instead of loading ORM objects and calling to_dict()
+row by row. The encoder is orjson when installed (it handles datetimes
+natively) and the stdlib json module otherwise; JSON_ENCODER=json forces the
+fallback.
+"""
+import datetime
+import functools
+import json
+import os
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto")
+
+# Columnas expuestas por la API, en el mismo orden que los to_dict() de los modelos
+SERVICE_REQUEST_FIELDS = (
+    "id", "user_id", "guest_name", "guest_phone", "current_location", "current_location_zone",
+    "pickup_latitude", "pickup_longitude", "destination", "vehicle_type", "price", "status",
+    "assigned_provider_id", "created_at", "updated_at",
+)
+USER_FIELDS = ("id", "fullname", "email", "user_type", "is_admin")
+PROVIDER_FIELDS = ("service_zones_json", "accepted_vehicle_types_json", "is_available")
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None and JSON_ENCODER != "json":
+    def dumps(obj):
+        """Encodes obj to JSON bytes (datetimes as ISO 8601)."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    ENCODER_NAME = "orjson"
+else:
+    def dumps(obj):
+        """Encodes obj to JSON bytes (datetimes as ISO 8601)."""
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+    ENCODER_NAME = "json"
+
+
+def json_response(payload, status=200):
+    """Drop-in for jsonify() that goes through the fast encoder."""
+    return Response(dumps(payload), status=status, mimetype="application/json")
+
+
+# Elementos que puede devolver decode_json_list (inmutables, seguros de compartir)
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+@functools.lru_cache(maxsize=4096)
+def decode_json_list(text):
+    """
+    Decodes a JSON list column (service_zones_json, ...) into a tuple.
+    Cached by the raw text: most providers share a handful of distinct lists.
+    The tuple is shared by every caller, so only scalar elements (zone and
+    vehicle type names) are kept; nested objects or lists are dropped.
+    """
+    if not text:
+        return ()
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return ()
+    if not isinstance(value, list):
+        return ()
+    return tuple(v for v in value if isinstance(v, _SCALAR_TYPES))
+
+
+def rows_to_dicts(rows, fields):
+    """Column tuples (in `fields` order) -> list of dicts, ready for dumps()."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def user_rows_to_dicts(rows):
+    """
+    Rows selected as USER_FIELDS + PROVIDER_FIELDS -> the same dicts as User.to_dict().
+    """
+    items = []
+    n = len(USER_FIELDS)
+    for row in rows:
+        item = dict(zip(USER_FIELDS, row[:n]))
+        if item["user_type"] == "provider":
+            zones_json, vehicle_types_json, is_available = row[n:]
+            item["service_zones"] = list(decode_json_list(zones_json))
+            item["accepted_vehicle_types"] = list(decode_json_list(vehicle_types_json))
+            item["is_available"] = is_available
+        items.append(item)
+    return items
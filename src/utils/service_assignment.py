@@ -1,12 +1,17 @@
 import os
 import datetime
 import json
+import click
 from flask import current_app
+from flask.cli import with_appcontext
 
 def find_matching_providers(service_request, db, User):
     """
     Find providers that match the service request's zone and vehicle type.
     
+    Uses the normalized provider_service_zones / provider_vehicle_types tables,
+    so matching is a single indexed join instead of a scan over every provider.
+    
     Args:
         service_request: The ServiceRequest object
         db: SQLAlchemy database instance
@@ -15,39 +20,136 @@ def find_matching_providers(service_request, db, User):
     Returns:
         List of User objects (providers) that match the criteria
     """
-    # Get all available providers
-    available_providers = User.query.filter_by(
-        user_type='provider',
-        is_available=True
+    from src.models.provider_match import ProviderServiceZone, ProviderVehicleType
+
+    if not service_request.current_location_zone or not service_request.vehicle_type:
+        return []
+
+    return User.query.join(
+        ProviderServiceZone, ProviderServiceZone.provider_id == User.id
+    ).join(
+        ProviderVehicleType, ProviderVehicleType.provider_id == User.id
+    ).filter(
+        ProviderServiceZone.zone == service_request.current_location_zone,
+        ProviderVehicleType.vehicle_type == service_request.vehicle_type,
+        User.user_type == 'provider',
+        User.is_available.is_(True)
     ).all()
+
+def find_nearest_providers(service_request, db, User, k=None, radius_km=None, fallback_to_zone=True):
+    """
+    Find the k nearest available providers accepting the request's vehicle type
+    within radius_km of the pickup point, using the in-memory spatial index.
+    Falls back to zone matching when the request has no pickup coordinates, or
+    when nobody tracked is in range (e.g. no provider has pinged a position yet).
     
-    matching_providers = []
-    
-    for provider in available_providers:
-        # Get provider's service zones and accepted vehicle types
-        provider_zones = provider.get_service_zones()
-        provider_vehicle_types = provider.get_accepted_vehicle_types()
-        
-        # Check if provider serves the origin zone
-        zone_match = False
-        if service_request.current_location_zone in provider_zones:
-            zone_match = True
+    Args:
+        service_request: The ServiceRequest object
+        db: SQLAlchemy database instance
+        User: User model class
+        k: Maximum number of providers (defaults to PROVIDER_SEARCH_MAX_RESULTS)
+        radius_km: Search radius (defaults to PROVIDER_SEARCH_RADIUS_KM)
+        fallback_to_zone: Use zone matching when the index finds nobody
+            (wave dispatch passes False: its last wave is the zone wave)
         
-        # Check if provider accepts the vehicle type
-        vehicle_match = False
-        if service_request.vehicle_type in provider_vehicle_types:
-            vehicle_match = True
+    Returns:
+        List of User objects (providers), nearest first
+    """
+    from src.utils.spatial_index import ensure_provider_index_fresh
+
+    if service_request.pickup_latitude is None or service_request.pickup_longitude is None:
+        return find_matching_providers(service_request, db, User)
+    
+    if k is None:
+        k = current_app.config.get('PROVIDER_SEARCH_MAX_RESULTS', 10)
+    if radius_km is None:
+        radius_km = current_app.config.get('PROVIDER_SEARCH_RADIUS_KM', 10.0)
+    
+    index = ensure_provider_index_fresh(User, current_app.config.get('PROVIDER_INDEX_REFRESH_SECONDS', 30))
+    nearest = index.nearest(
+        service_request.pickup_latitude,
+        service_request.pickup_longitude,
+        service_request.vehicle_type,
+        k=k,
+        radius_km=radius_km
+    )
+    if not nearest:
+        return find_matching_providers(service_request, db, User) if fallback_to_zone else []
+    
+    # Re-check availability in the DB: the index may be a few seconds stale
+    ids = [provider_id for provider_id, _ in nearest]
+    providers = User.query.filter(
+        User.id.in_(ids),
+        User.user_type == 'provider',
+        User.is_available.is_(True)
+    ).all()
+    by_id = {provider.id: provider for provider in providers}
+    if not by_id and fallback_to_zone:
+        return find_matching_providers(service_request, db, User)
+    return [by_id[provider_id] for provider_id in ids if provider_id in by_id]
+
+def record_provider_position(provider, latitude, longitude, db):
+    """
+    Store a provider's position ping and update the spatial index in place.
+    
+    Args:
+        provider: The provider's User object
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+        db: SQLAlchemy database instance
+    """
+    from src.utils.spatial_index import get_provider_index
+
+    provider.last_latitude = latitude
+    provider.last_longitude = longitude
+    provider.last_location_at = datetime.datetime.utcnow()
+    db.session.commit()
+    
+    index = get_provider_index()
+    if provider.is_available:
+        index.update(provider.id, latitude, longitude, provider.get_accepted_vehicle_types())
+    else:
+        index.remove(provider.id)
+
+def rebuild_provider_match_index(db, User):
+    """
+    Rebuild the provider zone / vehicle type tables from the JSON columns.
+    Needed once for providers created before the tables existed, or after
+    the JSON columns were edited directly.
+    
+    Args:
+        db: SQLAlchemy database instance
+        User: User model class
         
-        # If both zone and vehicle type match, add provider to the list
-        if zone_match and vehicle_match:
-            matching_providers.append(provider)
+    Returns:
+        Number of providers re-indexed
+    """
+    providers = User.query.filter_by(user_type='provider').all()
     
-    return matching_providers
+    for provider in providers:
+        provider.set_service_zones(provider.get_service_zones())
+        provider.set_accepted_vehicle_types(provider.get_accepted_vehicle_types())
+    
+    db.session.commit()
+    return len(providers)
+
+@click.command('rebuild-provider-index')
+@with_appcontext
+def rebuild_provider_index_command():
+    """Rebuilds provider_service_zones / provider_vehicle_types from the JSON columns."""
+    from src import db
+    from src.models import User
+
+    click.echo(f"{rebuild_provider_match_index(db, User)} providers re-indexed")
 
 def send_service_alerts(service_request, matching_providers, db, Notification, pricing_config):
     """
     Send alerts to matching providers about a new service request.
     
+    All notifications are written with one bulk INSERT; delivery is handed to
+    the background alert dispatcher as a single fan-out job, so the cost for
+    the caller does not grow with the number of providers.
+    
     Args:
         service_request: The ServiceRequest object
         matching_providers: List of User objects (providers) that match the criteria
@@ -58,48 +160,55 @@ def send_service_alerts(service_request, matching_providers, db, Notification, p
     Returns:
         Number of notifications sent
     """
-    notifications_sent = 0
+    from sqlalchemy import insert
+    from src.utils.alert_dispatch import get_alert_dispatcher
+
+    if not matching_providers:
+        return 0
     
     # Calculate provider profit
-    provider_profit = calculate_provider_profit(service_request.price, pricing_config.admin_commission_percentage)
-    
-    for provider in matching_providers:
-        # Create notification for each matching provider
-        notification = Notification(
-            service_request_id=service_request.id,
-            provider_id=provider.id,
-            status='sent'
-        )
-        
-        db.session.add(notification)
-        notifications_sent += 1
-        
-        # Here you would add code to send actual notifications (email, push, etc.)
-        # For now, we'll just log it
-        current_app.logger.info(
-            f"Alert sent to provider {provider.id} ({provider.fullname}) for service request {service_request.id}. "
-            f"Total price: €{service_request.price:.2f}, Provider profit: €{provider_profit:.2f}"
-        )
-        
-        # Future enhancement: Send email notification
-        # send_email_notification(
-        #     to_email=provider.email,
-        #     subject=f"New Service Request #{service_request.id}",
-        #     template="new_service_request.html",
-        #     context={
-        #         "provider_name": provider.fullname,
-        #         "service_request_id": service_request.id,
-        #         "current_location": service_request.current_location,
-        #         "destination": service_request.destination,
-        #         "vehicle_type": service_request.vehicle_type,
-        #         "price": service_request.price,
-        #         "provider_profit": provider_profit,
-        #         "accept_url": f"/accept_service/{notification.id}"
-        #     }
-        # )
+    price = service_request.price or 0.0
+    provider_profit = calculate_provider_profit(price, pricing_config.admin_commission_percentage)
     
+    # One timestamp per batch, so each dispatch wave is identifiable in the table
+    now = datetime.datetime.utcnow()
+    rows = [
+        {'service_request_id': service_request.id, 'provider_id': provider.id, 'status': 'sent',
+         'created_at': now, 'updated_at': now}
+        for provider in matching_providers
+    ]
+    result = db.session.execute(
+        insert(Notification).returning(Notification.id, sort_by_parameter_order=True),
+        rows
+    )
+    notification_ids = result.scalars().all()
     db.session.commit()
-    return notifications_sent
+    
+    alerts = [
+        {
+            'notification_id': notification_id,
+            'service_request_id': service_request.id,
+            'provider_id': provider.id,
+            'provider_name': provider.fullname,
+            'provider_email': provider.email,
+            'current_location': service_request.current_location,
+            'destination': service_request.destination,
+            'vehicle_type': service_request.vehicle_type,
+            'price': price,
+            'provider_profit': provider_profit,
+            'accept_url': f"/accept_service/{notification_id}"
+        }
+        for notification_id, provider in zip(notification_ids, matching_providers)
+    ]
+    
+    dispatcher = get_alert_dispatcher(current_app._get_current_object())
+    if not dispatcher.submit({'alerts': alerts}):
+        current_app.logger.warning(
+            f"Alert queue full: {len(alerts)} alerts for service request {service_request.id} "
+            f"not pushed; providers will see them on their dashboard"
+        )
+    
+    return len(rows)
 
 def calculate_provider_profit(total_price, admin_commission_percentage):
     """
@@ -119,73 +228,204 @@ def calculate_provider_profit(total_price, admin_commission_percentage):
     provider_share = 1 - admin_commission_percentage
     return round(total_price * provider_share, 2)
 
-def check_expired_service_requests(db, ServiceRequest, Notification, expiry_minutes=5):
+def expire_service_requests(db, ServiceRequest, Notification, request_ids):
+    """
+    Mark the given requests 'No Provider Available' if they are still pending
+    assignment, and expire their 'sent' notifications. Two set-based UPDATEs
+    in one transaction; used by the sweep and by the expiry scheduler.
+    
+    Args:
+        db: SQLAlchemy database instance
+        ServiceRequest: ServiceRequest model class
+        Notification: Notification model class
+        request_ids: List of IDs, or a scalar subquery selecting them
+        
+    Returns:
+        Tuple (IDs actually expired, number of notifications expired)
+    """
+    from sqlalchemy import update
+    from src.utils.event_bus import publish_to_user
+
+    now = datetime.datetime.utcnow()
+    # The status guard is repeated so a request accepted meanwhile is left alone
+    expired = db.session.execute(
+        update(ServiceRequest).where(
+            ServiceRequest.id.in_(request_ids),
+            ServiceRequest.status == 'Pending Assignment'
+        ).values(
+            status='No Provider Available',
+            updated_at=now
+        ).returning(
+            ServiceRequest.id, ServiceRequest.user_id
+        ).execution_options(synchronize_session=False)
+    ).all()
+    
+    if not expired:
+        db.session.commit()
+        return [], 0
+    
+    expired_ids = [row.id for row in expired]
+    from src.models import StatCounter
+    from src.utils.stats import bump_counters, status_change_deltas
+    bump_counters(db.session, StatCounter, status_change_deltas('Pending Assignment', 'No Provider Available', len(expired_ids)))
+    result = db.session.execute(
+        update(Notification).where(
+            Notification.service_request_id.in_(expired_ids),
+            Notification.status == 'sent'
+        ).values(
+            status='expired',
+            updated_at=now
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
+    # Let the clients know (SSE); email/SMS would go here as well
+    for row in expired:
+        publish_to_user(row.user_id, {
+            'type': 'status',
+            'service_request_id': row.id,
+            'status': 'No Provider Available'
+        })
+    
+    return expired_ids, result.rowcount
+
+def check_expired_service_requests(db, ServiceRequest, Notification, expiry_minutes=5, batch_size=500, max_batches=None):
     """
     Check for service requests that have been in 'Pending Assignment' status 
     for longer than the specified time and mark them as 'No Provider Available'.
     
+    Works in bounded batches, each one two set-based statements in its own
+    transaction: an UPDATE ... RETURNING on the requests (selected through the
+    (status, created_at) index) and an UPDATE expiring their 'sent' notifications.
+    
     Args:
         db: SQLAlchemy database instance
         ServiceRequest: ServiceRequest model class
         Notification: Notification model class
         expiry_minutes: Minutes after which a request is considered expired
+        batch_size: Maximum requests expired per batch
+        max_batches: Optional cap on batches per call (the rest is left for the next sweep)
         
     Returns:
-        List of expired service request IDs that were updated
+        Summary dict: expired_request_ids, expired_count, notifications_expired, batches
     """
+    from sqlalchemy import select
+
     # Calculate the cutoff time
     cutoff_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=expiry_minutes)
     
-    # Find service requests that are still pending assignment and older than the cutoff time
-    expired_requests = ServiceRequest.query.filter(
-        ServiceRequest.status == 'Pending Assignment',
-        ServiceRequest.created_at < cutoff_time
-    ).all()
-    
-    expired_request_ids = []
+    summary = {
+        'expired_request_ids': [],
+        'expired_count': 0,
+        'notifications_expired': 0,
+        'batches': 0
+    }
     
-    for request in expired_requests:
-        # Update the request status
-        request.status = 'No Provider Available'
-        expired_request_ids.append(request.id)
+    while max_batches is None or summary['batches'] < max_batches:
+        batch_ids = select(ServiceRequest.id).where(
+            ServiceRequest.status == 'Pending Assignment',
+            ServiceRequest.created_at < cutoff_time
+        ).order_by(ServiceRequest.created_at).limit(batch_size).scalar_subquery()
         
-        # Mark all notifications for this request as expired
-        notifications = Notification.query.filter_by(
-            service_request_id=request.id,
-            status='sent'
-        ).all()
+        expired_ids, notifications_expired = expire_service_requests(db, ServiceRequest, Notification, batch_ids)
+        if not expired_ids:
+            break
         
-        for notification in notifications:
-            notification.status = 'expired'
+        summary['batches'] += 1
+        summary['expired_count'] += len(expired_ids)
+        summary['notifications_expired'] += notifications_expired
+        summary['expired_request_ids'].extend(expired_ids)
         
-        # Here you would add code to notify the client
-        # For now, we'll just log it
+        if len(expired_ids) < batch_size:
+            break
+    
+    if summary['expired_count']:
         current_app.logger.info(
-            f"Service request {request.id} expired after {expiry_minutes} minutes. "
+            f"Expired {summary['expired_count']} service requests after {expiry_minutes} minutes "
+            f"({summary['notifications_expired']} notifications, {summary['batches']} batches). "
             f"Status updated to 'No Provider Available'."
         )
+    
+    return summary
+
+def assign_service_request(service_request_id, provider_id, db, ServiceRequest, Notification):
+    """
+    Atomically assign a pending service request to the first provider that accepts it.
+    
+    The status check lives in the WHERE clause of a single conditional UPDATE,
+    so two providers accepting at the same time cannot both win: the database
+    row lock makes the second UPDATE re-evaluate the guard and match no row.
+    The provider's notification is accepted and every sibling notification
+    rejected in one more UPDATE, inside the same transaction.
+    
+    Args:
+        service_request_id: ID of the service request to assign
+        provider_id: ID of the accepting provider
+        db: SQLAlchemy database instance
+        ServiceRequest: ServiceRequest model class
+        Notification: Notification model class
         
-        # Future enhancement: Send email notification to client
-        # if request.user_id:  # Registered user
-        #     user = User.query.get(request.user_id)
-        #     if user:
-        #         send_email_notification(
-        #             to_email=user.email,
-        #             subject=f"Service Request #{request.id} Update",
-        #             template="service_request_expired.html",
-        #             context={
-        #                 "user_name": user.fullname,
-        #                 "service_request_id": request.id,
-        #                 "current_location": request.current_location,
-        #                 "destination": request.destination
-        #             }
-        #         )
-        # elif request.guest_phone:  # Guest user
-        #     # Could send SMS notification here
-        #     pass
+    Returns:
+        The assigned ServiceRequest object, or None if the provider lost the race,
+        has no active notification, or the request does not exist
+    """
+    from sqlalchemy import case, exists, update
+
+    now = datetime.datetime.utcnow()
+    has_active_notification = exists().where(
+        Notification.service_request_id == service_request_id,
+        Notification.provider_id == provider_id,
+        Notification.status == 'sent'
+    )
+    result = db.session.execute(
+        update(ServiceRequest).where(
+            ServiceRequest.id == service_request_id,
+            ServiceRequest.status == 'Pending Assignment',
+            has_active_notification
+        ).values(
+            status='Assigned',
+            assigned_provider_id=provider_id,
+            updated_at=now
+        ).execution_options(synchronize_session=False)
+    )
+    
+    if result.rowcount != 1:
+        db.session.rollback()
+        current_app.logger.error(
+            f"Provider {provider_id} cannot accept request {service_request_id}: "
+            f"not pending assignment or no active notification"
+        )
+        return None
     
+    db.session.execute(
+        update(Notification).where(
+            Notification.service_request_id == service_request_id,
+            Notification.status == 'sent'
+        ).values(
+            status=case((Notification.provider_id == provider_id, 'accepted'), else_='rejected'),
+            responded_at=now,
+            updated_at=now
+        ).execution_options(synchronize_session=False)
+    )
+    from src.models import StatCounter
+    from src.utils.stats import bump_counters, status_change_deltas
+    bump_counters(db.session, StatCounter, status_change_deltas('Pending Assignment', 'Assigned', 1))
     db.session.commit()
-    return expired_request_ids
+    
+    # No more waves for this request; record time-to-accept / notifications sent
+    from src.utils.dispatch_metrics import record_assignment_metrics
+    from src.utils.wave_dispatch import cancel_waves
+    cancel_waves(service_request_id)
+    metrics = record_assignment_metrics(service_request_id, db, Notification, now)
+    current_app.logger.info(
+        f"Service request {service_request_id} assigned to provider {provider_id}: "
+        f"time_to_accept={metrics['time_to_accept_seconds']}s "
+        f"notifications_sent={metrics['notifications_sent']} waves={metrics['waves']}"
+    )
+    
+    service_request = db.session.get(ServiceRequest, service_request_id)
+    db.session.refresh(service_request)
+    return service_request
 
 def update_service_status(service_request_id, new_status, provider_id=None, db=None, ServiceRequest=None, Notification=None):
     """
@@ -218,68 +458,44 @@ def update_service_status(service_request_id, new_status, provider_id=None, db=N
         current_app.logger.error(f"Invalid status: {new_status}")
         return None
     
-    service_request = ServiceRequest.query.get(service_request_id)
-    if not service_request:
-        current_app.logger.error(f"Service request {service_request_id} not found")
-        return None
-    
     # Special handling for 'Assigned' status
     if new_status == 'Assigned' and provider_id:
         # Check if this provider has a notification for this request
         if Notification is None:
             current_app.logger.error("Notification model is required for 'Assigned' status")
             return None
-            
-        notification = Notification.query.filter_by(
-            service_request_id=service_request_id,
-            provider_id=provider_id,
-            status='sent'
-        ).first()
         
-        if not notification:
-            current_app.logger.error(
-                f"Provider {provider_id} cannot accept request {service_request_id}: "
-                f"No active notification found"
-            )
+        service_request = assign_service_request(service_request_id, provider_id, db, ServiceRequest, Notification)
+        if not service_request:
             return None
-        
-        # Check if request is still pending assignment
-        if service_request.status != 'Pending Assignment':
-            current_app.logger.error(
-                f"Service request {service_request_id} cannot be assigned: "
-                f"Current status is {service_request.status}"
-            )
+    else:
+        service_request = ServiceRequest.query.get(service_request_id)
+        if not service_request:
+            current_app.logger.error(f"Service request {service_request_id} not found")
             return None
         
-        # Assign the provider
-        service_request.provider_id = provider_id
-        
-        # Update the notification
-        notification.status = 'accepted'
-        notification.responded_at = datetime.datetime.utcnow()
+        # Update the service request status
+        service_request.status = new_status
+        service_request.updated_at = datetime.datetime.utcnow()
         
-        # Mark other notifications as 'rejected' since another provider accepted
-        other_notifications = Notification.query.filter(
-            Notification.service_request_id == service_request_id,
-            Notification.provider_id != provider_id,
-            Notification.status == 'sent'
-        ).all()
+        db.session.commit()
         
-        for other_notification in other_notifications:
-            other_notification.status = 'rejected'
-            other_notification.responded_at = datetime.datetime.utcnow()
-    
-    # Update the service request status
-    service_request.status = new_status
-    service_request.updated_at = datetime.datetime.utcnow()
-    
-    db.session.commit()
+        if new_status == 'Pending Assignment':
+            from src.utils.expiry_scheduler import register_pending_request
+            register_pending_request(service_request)
     
-    # Here you would add code to notify the client about the status change
-    # For now, we'll just log it
+    # Push the change to the client's and the provider's open streams (SSE)
     current_app.logger.info(
         f"Service request {service_request_id} status updated to '{new_status}'"
     )
+    from src.utils.event_bus import publish_to_user
+    status_event = {
+        'type': 'status',
+        'service_request_id': service_request.id,
+        'status': new_status
+    }
+    publish_to_user(service_request.user_id, dict(status_event))
+    publish_to_user(provider_id or service_request.assigned_provider_id, dict(status_event))
     
     # Future enhancement: Send email notification to client about status change
     # if service_request.user_id:  # Registered user
@@ -0,0 +1,189 @@
+"""
+In-memory spatial index of provider positions.
+
+Providers are bucketed into a regular lat/lon grid, one grid per accepted
+vehicle type, so "k nearest available providers accepting this vehicle type
+within R km" only looks at the cells around the pickup point instead of
+scanning every provider.
+"""
+import heapq
+import math
+import threading
+import time
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between two (lat, lon) points."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class ProviderSpatialIndex:
+    """
+    Grid index of provider positions, updated incrementally on position pings.
+
+    Args:
+        cell_size_deg: Size of a grid cell in degrees (0.01 is roughly 1.1 km x 0.7 km in Dublin)
+    """
+
+    def __init__(self, cell_size_deg=0.01):
+        self.cell_size_deg = cell_size_deg
+        self._lock = threading.RLock()
+        self._positions = {}  # provider_id -> (lat, lon, vehicle_types, cell)
+        self._grids = {}      # vehicle_type -> {cell: set(provider_id)}
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size_deg), math.floor(lon / self.cell_size_deg))
+
+    def _unlink(self, provider_id):
+        entry = self._positions.pop(provider_id, None)
+        if entry is None:
+            return
+        _, _, vehicle_types, cell = entry
+        for vehicle_type in vehicle_types:
+            grid = self._grids.get(vehicle_type)
+            if not grid:
+                continue
+            bucket = grid.get(cell)
+            if bucket is not None:
+                bucket.discard(provider_id)
+                if not bucket:
+                    del grid[cell]
+
+    def update(self, provider_id, lat, lon, vehicle_types):
+        """Insert or move a provider. vehicle_types is the list of types the provider accepts."""
+        cell = self._cell(lat, lon)
+        vehicle_types = frozenset(vehicle_types or ())
+        with self._lock:
+            self._unlink(provider_id)
+            self._positions[provider_id] = (lat, lon, vehicle_types, cell)
+            for vehicle_type in vehicle_types:
+                self._grids.setdefault(vehicle_type, {}).setdefault(cell, set()).add(provider_id)
+
+    def remove(self, provider_id):
+        """Drop a provider from the index (e.g. when it becomes unavailable)."""
+        with self._lock:
+            self._unlink(provider_id)
+
+    def clear(self):
+        with self._lock:
+            self._positions.clear()
+            self._grids.clear()
+
+    def nearest(self, lat, lon, vehicle_type, k=10, radius_km=10.0):
+        """
+        Find the k nearest providers accepting vehicle_type within radius_km.
+
+        Cells are visited in rings of increasing Chebyshev distance around the
+        query cell; the search stops as soon as the k-th best distance is closer
+        than anything an unvisited ring could contain.
+
+        Returns:
+            List of (provider_id, distance_km) tuples, nearest first
+        """
+        with self._lock:
+            grid = self._grids.get(vehicle_type)
+            if not grid or k <= 0:
+                return []
+
+            cell_lat_km = self.cell_size_deg * KM_PER_DEGREE_LAT
+            cell_lon_km = cell_lat_km * max(math.cos(math.radians(lat)), 0.01)
+            min_cell_km = min(cell_lat_km, cell_lon_km)
+            max_ring = int(math.ceil(radius_km / min_cell_km)) + 1
+
+            center_row, center_col = self._cell(lat, lon)
+            best = []  # max-heap of (-distance, provider_id), size <= k
+
+            for ring in range(max_ring + 1):
+                for row in range(center_row - ring, center_row + ring + 1):
+                    if abs(row - center_row) == ring:
+                        cols = range(center_col - ring, center_col + ring + 1)
+                    else:
+                        cols = (center_col - ring, center_col + ring)
+                    for col in cols:
+                        bucket = grid.get((row, col))
+                        if not bucket:
+                            continue
+                        for provider_id in bucket:
+                            p_lat, p_lon, _, _ = self._positions[provider_id]
+                            distance = haversine_km(lat, lon, p_lat, p_lon)
+                            if distance > radius_km:
+                                continue
+                            if len(best) < k:
+                                heapq.heappush(best, (-distance, provider_id))
+                            elif distance < -best[0][0]:
+                                heapq.heapreplace(best, (-distance, provider_id))
+
+                # Anything in ring+1 or beyond is at least ring * min_cell_km away
+                if len(best) == k and -best[0][0] <= ring * min_cell_km:
+                    break
+                if ring * min_cell_km > radius_km:
+                    break
+
+            return sorted(((provider_id, -neg) for neg, provider_id in best), key=lambda item: item[1])
+
+
+_provider_index = ProviderSpatialIndex()
+
+
+def get_provider_index():
+    """Return the process-wide provider spatial index."""
+    return _provider_index
+
+
+def load_provider_index(User, index=None):
+    """
+    (Re)build the index from the last known positions stored on the users table.
+    Only the columns needed for the index are selected.
+
+    Args:
+        User: User model class
+        index: Index to fill, defaults to the process-wide one
+
+    Returns:
+        The filled index
+    """
+    import json
+
+    index = index or _provider_index
+    rows = User.query.with_entities(
+        User.id, User.last_latitude, User.last_longitude, User.accepted_vehicle_types_json
+    ).filter(
+        User.user_type == 'provider',
+        User.is_available.is_(True),
+        User.last_latitude.isnot(None),
+        User.last_longitude.isnot(None)
+    ).all()
+
+    with index._lock:
+        index.clear()
+        for provider_id, lat, lon, vehicle_types_json in rows:
+            try:
+                vehicle_types = json.loads(vehicle_types_json) if vehicle_types_json else []
+            except json.JSONDecodeError:
+                vehicle_types = []
+            index.update(provider_id, lat, lon, vehicle_types)
+        index.loaded_at = time.monotonic()
+    return index
+
+
+def ensure_provider_index_fresh(User, max_age_seconds=30):
+    """
+    Reload the process-wide index when it is older than max_age_seconds.
+    Pings handled by other gunicorn workers reach this worker through the reload.
+    """
+    loaded_at = _provider_index.loaded_at
+    if loaded_at is None or time.monotonic() - loaded_at > max_age_seconds:
+        load_provider_index(User)
+    return _provider_index
@@ -0,0 +1,203 @@
+"""
+Dashboard counters maintained incrementally.
+
+An after_flush listener turns every insert, delete and tracked column change
+of User / ServiceRequest into counter deltas and applies them with one
+INSERT ... ON CONFLICT DO UPDATE on the same connection, so the counters
+commit or roll back together with the rows. Set-based UPDATEs that bypass
+the ORM (assignment, expiry) call bump_counters() themselves.
+
+Each counter is split over STAT_COUNTER_SHARDS rows and every transaction
+bumps a random shard, so concurrent writers (every accept moves
+'Pending Assignment' -> 'Assigned') rarely wait on the same row lock;
+read_counters() sums the shards.
+rebuild_stat_counters() recomputes everything from the tables (backfill, or
+to repair drift after manual SQL): `flask rebuild-stats`.
+"""
+import collections
+import datetime
+import os
+import random
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import BigInteger, cast, event, func, inspect, select
+
+UNKNOWN = "unknown"
+STAT_COUNTER_SHARDS = max(1, int(os.environ.get("STAT_COUNTER_SHARDS", 16)))
+
+
+def hour_bucket(dt):
+    """'YYYY-MM-DD HH' bucket of a naive UTC datetime."""
+    return (dt or datetime.datetime.utcnow()).strftime("%Y-%m-%d %H")
+
+
+# counter name -> (model name, tracked attributes, function(values) -> key or None if not counted)
+COUNTERS = {
+    "users_by_type": ("User", ("user_type",), lambda v: v["user_type"] or UNKNOWN),
+    "providers_available": (
+        "User", ("user_type", "is_available"),
+        lambda v: "available" if v["user_type"] == "provider" and v["is_available"] else None
+    ),
+    "requests_by_status": ("ServiceRequest", ("status",), lambda v: v["status"] or UNKNOWN),
+    "requests_by_zone": ("ServiceRequest", ("current_location_zone",), lambda v: v["current_location_zone"] or UNKNOWN),
+    "requests_by_hour": ("ServiceRequest", ("created_at",), lambda v: hour_bucket(v["created_at"])),
+}
+
+
+def _upsert(StatCounter, dialect_name):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(StatCounter)
+    return stmt.on_conflict_do_update(
+        index_elements=[StatCounter.name, StatCounter.key, StatCounter.shard],
+        set_={"value": StatCounter.value + stmt.excluded.value},
+    )
+
+
+def bump_counters(connection, StatCounter, deltas):
+    """
+    Adds deltas to the counters in the caller's transaction.
+
+    Args:
+        connection: Connection (or Session) of the transaction that changed the rows
+        StatCounter: StatCounter model class
+        deltas: Mapping {(counter name, key): amount}
+    """
+    shard = random.randrange(STAT_COUNTER_SHARDS)
+    rows = [
+        {"name": name, "key": key, "shard": shard, "value": amount}
+        for (name, key), amount in deltas.items() if amount
+    ]
+    if not rows:
+        return
+    dialect_name = connection.get_bind().dialect.name if hasattr(connection, "get_bind") else connection.dialect.name
+    # Sorted so concurrent transactions lock counter rows in the same order (no deadlocks)
+    connection.execute(_upsert(StatCounter, dialect_name), sorted(rows, key=lambda r: (r["name"], r["key"])))
+
+
+def status_change_deltas(from_status, to_status, count):
+    """Deltas for `count` requests moved from one status to another by a bulk UPDATE."""
+    return {("requests_by_status", from_status): -count, ("requests_by_status", to_status): count}
+
+
+def _values(state, attributes, previous):
+    values = {}
+    for attribute in attributes:
+        history = state.attrs[attribute].history
+        if previous and history.deleted:
+            values[attribute] = history.deleted[0]
+        elif history.added:
+            values[attribute] = history.added[0]
+        elif history.unchanged:
+            values[attribute] = history.unchanged[0]
+        else:
+            values[attribute] = None
+    return values
+
+
+def flush_deltas(session):
+    """Counter deltas for the objects being flushed (call from after_flush)."""
+    deltas = collections.Counter()
+    for obj, sign in [(o, 1) for o in session.new] + [(o, -1) for o in session.deleted]:
+        model = type(obj).__name__
+        state = inspect(obj)
+        for name, (counter_model, attributes, key_of) in COUNTERS.items():
+            if counter_model == model:
+                key = key_of(_values(state, attributes, previous=sign < 0))
+                if key is not None:
+                    deltas[(name, key)] += sign
+    for obj in session.dirty:
+        model = type(obj).__name__
+        state = inspect(obj)
+        for name, (counter_model, attributes, key_of) in COUNTERS.items():
+            if counter_model != model or not any(state.attrs[a].history.has_changes() for a in attributes):
+                continue
+            old_key = key_of(_values(state, attributes, previous=True))
+            new_key = key_of(_values(state, attributes, previous=False))
+            if old_key != new_key:
+                if old_key is not None:
+                    deltas[(name, old_key)] -= 1
+                if new_key is not None:
+                    deltas[(name, new_key)] += 1
+    return deltas
+
+
+def install_stat_counters(session, StatCounter):
+    """Registers the after_flush listener on the app's (scoped) session."""
+    def after_flush(flush_session, flush_context):
+        bump_counters(flush_session, StatCounter, flush_deltas(flush_session))
+
+    if not event.contains(session, "after_flush", after_flush):
+        event.listen(session, "after_flush", after_flush)
+
+
+def read_counters(db, StatCounter, names=None):
+    """
+    Returns:
+        {counter name: {key: value}} read from the counters table (shards summed)
+    """
+    # SUM(bigint) is numeric on PostgreSQL: cast back so the values stay ints
+    total = cast(func.sum(StatCounter.value), BigInteger)
+    query = select(StatCounter.name, StatCounter.key, total).group_by(
+        StatCounter.name, StatCounter.key
+    )
+    if names:
+        query = query.where(StatCounter.name.in_(names))
+    counters = collections.defaultdict(dict)
+    for name, key, value in db.session.execute(query):
+        if value:
+            counters[name][key] = value
+    return counters
+
+
+def recent_hours(counters, hours=24, now=None):
+    """[(hour bucket, requests created)] for the last `hours` hours, oldest first."""
+    now = now or datetime.datetime.utcnow()
+    by_hour = counters.get("requests_by_hour", {})
+    buckets = [hour_bucket(now - datetime.timedelta(hours=h)) for h in range(hours - 1, -1, -1)]
+    return [(bucket, by_hour.get(bucket, 0)) for bucket in buckets]
+
+
+def rebuild_stat_counters(db, User, ServiceRequest, StatCounter):
+    """
+    Recomputes every counter with GROUP BY queries and replaces the table contents.
+
+    Returns:
+        Number of counter rows written
+    """
+    from sqlalchemy import delete, insert
+
+    deltas = collections.Counter()
+    for user_type, is_available, count in db.session.execute(
+        select(User.user_type, User.is_available, func.count()).group_by(User.user_type, User.is_available)
+    ):
+        deltas[("users_by_type", user_type or UNKNOWN)] += count
+        if user_type == "provider" and is_available:
+            deltas[("providers_available", "available")] += count
+    for status, zone, created_at in db.session.execute(
+        select(ServiceRequest.status, ServiceRequest.current_location_zone, ServiceRequest.created_at)
+        .execution_options(yield_per=5000)
+    ):
+        deltas[("requests_by_status", status or UNKNOWN)] += 1
+        deltas[("requests_by_zone", zone or UNKNOWN)] += 1
+        deltas[("requests_by_hour", hour_bucket(created_at))] += 1
+
+    db.session.execute(delete(StatCounter))
+    rows = [{"name": name, "key": key, "shard": 0, "value": value} for (name, key), value in deltas.items()]
+    if rows:
+        db.session.execute(insert(StatCounter), rows)
+    db.session.commit()
+    return len(rows)
+
+
+@click.command("rebuild-stats")
+@with_appcontext
+def rebuild_stats_command():
+    """Recomputes the dashboard counters from the tables."""
+    from src import db
+    from src.models import User, ServiceRequest, StatCounter
+
+    click.echo(f"{rebuild_stat_counters(db, User, ServiceRequest, StatCounter)} counters rebuilt")
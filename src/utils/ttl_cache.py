@@ -0,0 +1,197 @@
+"""
+Small key/value caches with TTL and LRU eviction.
+
+TTLCache lives in the process; SQLiteTTLCache stores entries in a local SQLite
+file so every gunicorn worker on the host shares the same hits. Both expose
+get/set/delete/clear and hit/miss counters through stats().
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry TTL and LRU eviction.
+
+    Args:
+        max_entries: Maximum number of entries kept before evicting the least recently used
+        ttl_seconds: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < now:
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        return {
+            "backend": "memory",
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteTTLCache:
+    """
+    Cache stored in a local SQLite file, shared by all processes on the host.
+    Values must be JSON serializable. LRU order is tracked with a last-access
+    timestamp; eviction trims the oldest rows once max_entries is exceeded.
+
+    Args:
+        path: Path of the SQLite file
+        max_entries: Maximum number of rows kept
+        ttl_seconds: Seconds an entry stays valid
+        table: Table name, so several caches can share one file
+    """
+
+    def __init__(self, path, max_entries=100000, ttl_seconds=3600, table="cache"):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.table = table
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_accessed_at ON {table} (accessed_at)")
+        conn.commit()
+
+    def _conn(self):
+        # One connection per thread, reopened in a forked worker
+        conn = getattr(self._local, "conn", None)
+        pid = os.getpid()
+        if conn is None or getattr(self._local, "pid", None) != pid:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def get(self, key, default=None):
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                with self._lock:
+                    self.misses += 1
+                return default
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl_seconds, now),
+            )
+            with self._lock:
+                self._writes_since_trim += 1
+                trim = self._writes_since_trim >= 100
+                if trim:
+                    self._writes_since_trim = 0
+            if trim:
+                self._trim(conn, now)
+        except sqlite3.Error:
+            pass
+
+    def _trim(self, conn, now):
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f" SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key):
+        try:
+            self._conn().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        self._conn().execute(f"DELETE FROM {self.table}")
+
+    def stats(self):
+        try:
+            size = self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def build_cache(backend, max_entries, ttl_seconds, path=None, table="cache"):
+    """Create a cache for the configured backend ("memory" or "sqlite")."""
+    if backend == "sqlite":
+        return SQLiteTTLCache(path, max_entries=max_entries, ttl_seconds=ttl_seconds, table=table)
+    return TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
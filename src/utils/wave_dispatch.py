@@ -0,0 +1,160 @@
+"""
+Escalating dispatch: alert providers in waves instead of all at once.
+
+Wave 1 goes to the nearest DISPATCH_WAVE_SIZE providers within the first
+radius of DISPATCH_WAVE_RADII_KM. If nobody accepts within
+DISPATCH_WAVE_TIMEOUT_SECONDS the next wave widens the radius, and after the
+last radius a final wave goes to every provider matching the request's zone
+(the old behaviour), so requests without coordinates or far from any tracked
+provider still reach someone. Providers already notified are never alerted
+twice, and the waves stop as soon as the request leaves 'Pending Assignment'.
+
+Wave timers run on a per-process DelayedJobScheduler. If the worker holding a
+request's timer dies, the remaining waves are skipped; the request still
+expires through the expiry scheduler.
+"""
+import time
+
+from flask import current_app
+
+from src.utils.dispatch_metrics import dispatch_metrics
+from src.utils.scheduler import DelayedJobScheduler
+from src.utils.service_assignment import find_matching_providers, find_nearest_providers, send_service_alerts
+
+_wave_jobs = DelayedJobScheduler(name="dispatch-waves")
+
+
+def wave_radii(config):
+    """DISPATCH_WAVE_RADII_KM ("3,6,10") -> [3.0, 6.0, 10.0]."""
+    radii = config.get("DISPATCH_WAVE_RADII_KM", "3,6,10")
+    if isinstance(radii, str):
+        radii = [r for r in radii.split(",") if r.strip()]
+    return sorted(float(r) for r in radii)
+
+
+def notified_provider_ids(service_request_id, db, Notification):
+    """IDs of providers that already got an alert for this request."""
+    from sqlalchemy import select
+
+    return set(db.session.execute(
+        select(Notification.provider_id).where(Notification.service_request_id == service_request_id)
+    ).scalars())
+
+
+def wave_candidates(service_request, wave, db, User, Notification):
+    """
+    Providers for one wave, best first, excluding those already notified.
+
+    Args:
+        service_request: The ServiceRequest object
+        wave: Zero-based wave number
+        db: SQLAlchemy database instance
+        User: User model class
+        Notification: Notification model class
+
+    Returns:
+        List of User objects, or None when there are no waves left
+    """
+    config = current_app.config
+    radii = wave_radii(config)
+    wave_size = config.get("DISPATCH_WAVE_SIZE", 5)
+    has_coordinates = service_request.pickup_latitude is not None and service_request.pickup_longitude is not None
+
+    if not has_coordinates and wave > 0:
+        return None  # the only wave was the zone wave
+    if wave > len(radii):
+        return None
+
+    notified = notified_provider_ids(service_request.id, db, Notification)
+    if has_coordinates and wave < len(radii):
+        # Ask for extra results so already-notified providers do not use up the wave
+        providers = find_nearest_providers(
+            service_request, db, User, k=wave_size + len(notified), radius_km=radii[wave], fallback_to_zone=False
+        )
+        return [p for p in providers if p.id not in notified][:wave_size]
+
+    # Last wave: everyone serving the request's zone
+    return [p for p in find_matching_providers(service_request, db, User) if p.id not in notified]
+
+
+def send_next_wave(service_request, wave, db, User, Notification, pricing_config):
+    """
+    Sends the first non-empty wave starting at `wave`.
+
+    Returns:
+        Tuple (wave number sent or None if the waves are exhausted, notifications sent)
+    """
+    while True:
+        providers = wave_candidates(service_request, wave, db, User, Notification)
+        if providers is None:
+            return None, 0
+        if providers:
+            sent = send_service_alerts(service_request, providers, db, Notification, pricing_config)
+            dispatch_metrics.record_wave()
+            current_app.logger.info(
+                f"Service request {service_request.id}: wave {wave + 1} sent to {sent} providers"
+            )
+            return wave, sent
+        wave += 1  # nobody new in this radius, widen right away
+
+
+def dispatch_in_waves(service_request, db, User, ServiceRequest, Notification, PricingConfig, pricing_config):
+    """
+    Sends the first wave now and schedules the next one after the wave timeout.
+
+    Args:
+        service_request: The ServiceRequest object (status 'Pending Assignment')
+        db: SQLAlchemy database instance
+        User: User model class
+        ServiceRequest: ServiceRequest model class
+        Notification: Notification model class
+        PricingConfig: PricingConfig model class (re-read by later waves)
+        pricing_config: PricingConfig object for the first wave
+
+    Returns:
+        Number of notifications sent in the first wave (0 if nobody matched at all)
+    """
+    wave, sent = send_next_wave(service_request, 0, db, User, Notification, pricing_config)
+    if wave is not None:
+        _schedule_wave(
+            current_app._get_current_object(), service_request.id, wave + 1,
+            db, User, ServiceRequest, Notification, PricingConfig
+        )
+    return sent
+
+
+def cancel_waves(service_request_id):
+    """Drops the pending wave timer of a request (e.g. once it is assigned)."""
+    _wave_jobs.cancel(service_request_id)
+
+
+def _schedule_wave(app, service_request_id, wave, db, User, ServiceRequest, Notification, PricingConfig):
+    timeout = app.config.get("DISPATCH_WAVE_TIMEOUT_SECONDS", 45)
+    _wave_jobs.start()
+    _wave_jobs.schedule(
+        service_request_id, time.time() + timeout,
+        lambda: _run_wave(app, service_request_id, wave, db, User, ServiceRequest, Notification, PricingConfig)
+    )
+
+
+def _run_wave(app, service_request_id, wave, db, User, ServiceRequest, Notification, PricingConfig):
+    from src.models.pricing_logic import get_pricing_snapshot
+
+    with app.app_context():
+        try:
+            service_request = db.session.get(ServiceRequest, service_request_id)
+            if service_request is None or service_request.status != 'Pending Assignment':
+                return
+            sent_wave, _ = send_next_wave(
+                service_request, wave, db, User, Notification, get_pricing_snapshot(PricingConfig)
+            )
+            if sent_wave is not None:
+                _schedule_wave(app, service_request_id, sent_wave + 1, db, User, ServiceRequest, Notification, PricingConfig)
+        except Exception as e:
+            app.logger.error(f"Dispatch wave {wave + 1} for service request {service_request_id} failed: {e}")
+        finally:
+            db.session.remove()
+
+
+def get_wave_dispatch_stats():
+    return {"pending_wave_timers": len(_wave_jobs)}
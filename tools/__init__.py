@@ -0,0 +1,28 @@
+"""
+Herramientas de desarrollo: benchmarks y pruebas de carga como comandos `flask`.
+
+Not part of the application package: create_app only imports this module when
+DEV_COMMANDS_ENABLED is set (on by default with FLASK_ENV=development), so
+production workers never load the harnesses, stub servers or test data
+generators.
+"""
+
+
+def register_commands(app):
+    """Adds the development commands to app.cli."""
+    from tools.accept_stress_test import accept_stress_test_command
+    from tools.geocode_benchmark import geocode_benchmark_command
+    from tools.load_test import http_client_benchmark_command, quote_load_test_command
+    from tools.matching_benchmark import provider_index_benchmark_command, provider_match_benchmark_command
+    from tools.serialization_benchmark import serialization_benchmark_command
+
+    for command in (
+        quote_load_test_command,
+        http_client_benchmark_command,
+        provider_match_benchmark_command,
+        provider_index_benchmark_command,
+        geocode_benchmark_command,
+        accept_stress_test_command,
+        serialization_benchmark_command,
+    ):
+        app.cli.add_command(command)
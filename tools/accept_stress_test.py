@@ -0,0 +1,171 @@
+"""
+Concurrency stress test of the accept path.
+
+    flask accept-stress-test [--providers 200] [--rounds 5] [--via-http]
+
+Each round creates a request in 'Pending Assignment' with an active
+notification for every provider, then releases one thread per provider
+through a barrier so they all call assign_service_request at the same time,
+each in its own app context (own session, own pooled connection). A round
+passes when exactly one provider wins, the request is assigned to that
+provider and its notifications end up one 'accepted', the rest 'rejected'.
+With --via-http each thread signs in as its provider and POSTs
+/accept_service/<notification id> through the test client instead, so the
+route (auth checks, model lookups, update_service_status) is covered too.
+The rows are committed (the threads need to see them) and deleted at the end.
+
+Run it against PostgreSQL: SQLite serializes writers on a file lock, so the
+race the conditional UPDATE guards against never happens there, and losers
+may fail with "database is locked" (counted as errors).
+"""
+import threading
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+def _accept_round(app, service_request_id, provider_ids):
+    """Runs one accept per provider concurrently. Returns (winner ids, errors)."""
+    from src import db
+    from src.models import Notification, ServiceRequest
+    from src.utils.service_assignment import assign_service_request
+
+    barrier = threading.Barrier(len(provider_ids))
+    winners, errors = [], []
+    lock = threading.Lock()
+
+    def accept(provider_id):
+        with app.app_context():
+            try:
+                barrier.wait()
+                assigned = assign_service_request(service_request_id, provider_id, db, ServiceRequest, Notification)
+                if assigned is not None:
+                    with lock:
+                        winners.append(provider_id)
+            except Exception as e:
+                db.session.rollback()
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+
+    return _run_concurrently(accept, provider_ids, winners, errors)
+
+
+def _accept_round_via_http(app, notification_ids):
+    """
+    POSTs /accept_service/<id> once per provider concurrently, each client signed
+    in as the notification's provider. Returns (winner ids, errors); a winner is a
+    200/302 answer that flashed the success message.
+    """
+    barrier = threading.Barrier(len(notification_ids))
+    winners, errors = [], []
+    lock = threading.Lock()
+
+    def accept(provider_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(provider_id)
+            session["_fresh"] = True
+        barrier.wait()
+        response = client.post(f"/accept_service/{notification_ids[provider_id]}")
+        with client.session_transaction() as session:
+            flashes = session.get("_flashes", [])
+        with lock:
+            if response.status_code >= 500:
+                errors.append(f"HTTP {response.status_code}")
+            elif any(category == "success" for category, _ in flashes):
+                winners.append(provider_id)
+
+    return _run_concurrently(accept, list(notification_ids), winners, errors)
+
+
+def _run_concurrently(target, provider_ids, winners, errors):
+    threads = [threading.Thread(target=target, args=(provider_id,)) for provider_id in provider_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return winners, errors
+
+
+@click.command("accept-stress-test")
+@click.option("--providers", default=200, show_default=True, help="Providers accepting the same request at once.")
+@click.option("--rounds", default=5, show_default=True)
+@click.option("--via-http", is_flag=True, help="Accept through POST /accept_service instead of the helper.")
+@with_appcontext
+def accept_stress_test_command(providers, rounds, via_http):
+    """Fires concurrent accepts at one request and checks exactly one provider wins."""
+    from sqlalchemy import delete, func, select
+    from src import db
+    from src.models import Notification, ServiceRequest, User
+
+    app = current_app._get_current_object()
+    provider_rows = [
+        User(fullname=f"Stress provider {n}", email=f"stress-provider-{n}@example.invalid",
+             password_hash="x", user_type="provider", is_available=True)
+        for n in range(providers)
+    ]
+    db.session.add_all(provider_rows)
+    db.session.commit()
+    provider_ids = [provider.id for provider in provider_rows]
+    request_ids = []
+
+    failed = 0
+    logger_disabled = app.logger.disabled
+    app.logger.disabled = True  # every loser logs an error
+    try:
+        for round_number in range(1, rounds + 1):
+            service_request = ServiceRequest(current_location="Stress test", destination="Stress test",
+                                             vehicle_type="sedan", status="Pending Assignment")
+            db.session.add(service_request)
+            db.session.flush()
+            request_ids.append(service_request.id)
+            notifications = {
+                provider_id: Notification(service_request_id=service_request.id, provider_id=provider_id, status="sent")
+                for provider_id in provider_ids
+            }
+            db.session.add_all(notifications.values())
+            db.session.commit()
+
+            if via_http:
+                winners, errors = _accept_round_via_http(
+                    app, {provider_id: n.id for provider_id, n in notifications.items()}
+                )
+            else:
+                winners, errors = _accept_round(app, service_request.id, provider_ids)
+
+            db.session.expire_all()
+            service_request = db.session.get(ServiceRequest, service_request.id)
+            statuses = dict(db.session.execute(
+                select(Notification.status, func.count())
+                .where(Notification.service_request_id == service_request.id)
+                .group_by(Notification.status)
+            ).all())
+            ok = (
+                len(winners) == 1
+                and service_request.status == "Assigned"
+                and service_request.assigned_provider_id == winners[0]
+                and statuses == {"accepted": 1, "rejected": providers - 1}
+            )
+            failed += not ok
+            click.echo(
+                f"round {round_number}: {len(winners)} winner(s), {len(errors)} error(s), "
+                f"request {service_request.status} to {service_request.assigned_provider_id}, "
+                f"notifications {statuses} -> {'ok' if ok else 'FAILED'}"
+            )
+            for error in sorted(set(errors))[:3]:
+                click.echo(f"    {error}")
+    finally:
+        app.logger.disabled = logger_disabled
+        db.session.rollback()
+        db.session.execute(delete(Notification).where(Notification.provider_id.in_(provider_ids)))
+        # ORM deletes, so the dashboard counters are adjusted too
+        for service_request in db.session.scalars(select(ServiceRequest).where(ServiceRequest.id.in_(request_ids))):
+            db.session.delete(service_request)
+        for provider in db.session.scalars(select(User).where(User.id.in_(provider_ids))):
+            db.session.delete(provider)
+        db.session.commit()
+
+    click.echo(f"{rounds - failed}/{rounds} rounds with exactly one winner ({providers} concurrent accepts each)")
+    if failed:
+        raise SystemExit(1)
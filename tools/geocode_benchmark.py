@@ -0,0 +1,123 @@
+"""
+Reverse geocoding cost: offline gazetteer vs the Nominatim HTTP path.
+
+    flask geocode-benchmark [--places 200000] [--lookups 20000]
+                            [--http-lookups 5] [--latency 0.15]
+
+Writes a synthetic gazetteer CSV (random places over the Dublin area) to a
+temporary directory, compiles and loads its index (src/utils/gazetteer.py)
+and times nearest-place lookups. The HTTP path runs reverse_geocode_osm
+against a local Nominatim stub answering after --latency seconds, with its
+own rate-limit file, so it pays the real 1 call per
+NOMINATIM_MIN_INTERVAL_SECONDS spacing; every point is distinct, so the
+geocode cache never answers.
+"""
+import csv
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+
+import click
+
+from tools.load_test import _CountingServer
+from tools.matching_benchmark import DUBLIN_BOUNDS
+
+
+def write_synthetic_gazetteer(path, places, rng):
+    """CSV with lat, lon, display_name, zone for `places` random points."""
+    (lat_min, lat_max), (lon_min, lon_max) = DUBLIN_BOUNDS
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["lat", "lon", "display_name", "zone"])
+        for n in range(places):
+            writer.writerow([
+                rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max),
+                f"{n} Benchmark Street, Dublin", f"D{n % 24 + 1}",
+            ])
+
+
+def start_nominatim_stub(latency):
+    """Reverse geocoding stub on a free local port. Returns (server, base URL)."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(latency)
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            body = json.dumps({"display_name": f"Stub address {query['lat'][0]},{query['lon'][0]}"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _CountingServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@click.command("geocode-benchmark")
+@click.option("--places", default=200000, show_default=True, help="Places in the synthetic gazetteer.")
+@click.option("--lookups", default=20000, show_default=True, help="Offline lookups timed.")
+@click.option("--http-lookups", default=5, show_default=True, help="Lookups through the Nominatim stub.")
+@click.option("--latency", default=0.15, show_default=True, help="Seconds the stub takes to answer.")
+def geocode_benchmark_command(places, lookups, http_lookups, latency):
+    """Reverse geocoding latency: offline gazetteer vs rate-limited Nominatim calls."""
+    from src.utils import geocode
+    from src.utils.gazetteer import OfflineGazetteer, compile_gazetteer
+    from src.utils.http_client import http_client
+
+    rng = random.Random(42)
+    (lat_min, lat_max), (lon_min, lon_max) = DUBLIN_BOUNDS
+    points = [(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)) for _ in range(lookups)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "gazetteer.csv")
+        write_synthetic_gazetteer(csv_path, places, rng)
+        start = time.perf_counter()
+        compile_gazetteer(csv_path, csv_path + ".idx")
+        compile_s = time.perf_counter() - start
+        start = time.perf_counter()
+        gazetteer = OfflineGazetteer(csv_path)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = sum(gazetteer.reverse(lat, lon) is not None for lat, lon in points)
+        offline_s = (time.perf_counter() - start) / lookups
+        click.echo(f"{places} places: index compiled in {compile_s:.2f} s, loaded in {load_s * 1000:.1f} ms")
+        click.echo(f"offline    {offline_s * 1e6:>10.1f} us/lookup ({lookups} lookups, {found} within "
+                   f"{gazetteer.max_distance_km} km)")
+
+        stub, stub_url = start_nominatim_stub(latency)
+        saved = geocode.NOMINATIM_REVERSE_URL, geocode._rate_limiter, http_client.upstream("nominatim")
+        geocode.NOMINATIM_REVERSE_URL = f"{stub_url}/reverse"
+        geocode._rate_limiter = geocode.HostRateLimiter(
+            os.path.join(directory, "nominatim.lock"), geocode.NOMINATIM_MIN_INTERVAL_SECONDS
+        )
+        http_client.register("nominatim", stub_url, retries=0, max_connections=4)
+        try:
+            start = time.perf_counter()
+            answered = sum(
+                geocode.reverse_geocode_osm(lat, lon) != geocode.UNKNOWN_LOCATION
+                for lat, lon in points[:http_lookups]
+            )
+            http_s = (time.perf_counter() - start) / http_lookups
+        finally:
+            geocode.NOMINATIM_REVERSE_URL, geocode._rate_limiter, upstream = saved
+            http_client.register(
+                "nominatim", upstream.base_url, *upstream.timeout, retries=upstream.retries,
+                max_connections=upstream.max_connections, headers=upstream.headers,
+            )
+            stub.shutdown()
+        click.echo(f"nominatim  {http_s * 1000:>10.1f} ms/lookup ({http_lookups} lookups, {answered} answered, "
+                   f"{latency * 1000:.0f} ms stub, 1 call per {geocode.NOMINATIM_MIN_INTERVAL_SECONDS:g} s)")
+        click.echo(f"speed-up   {http_s / offline_s:>10.0f}x")
@@ -0,0 +1,289 @@
+"""
+Quote throughput per gunicorn worker class, against a local Mapbox stub.
+
+For each worker class the command starts one gunicorn worker (gunicorn.conf.py,
+WEB_CONCURRENCY=1) with MAPBOX_API_URL pointing at an in-process HTTP stub that
+answers every Matrix call after --latency seconds, then sends --requests
+quotes to POST /api/pricing/calculate from --concurrency client threads, each
+with distinct coordinates so the route cache never answers.
+
+    flask quote-load-test [--worker-class sync --worker-class gthread ...]
+                          [--requests 200] [--concurrency 32] [--latency 0.2]
+
+The app uses the configured database (it needs a PricingConfig row).
+
+`flask http-client-benchmark` compares one-off requests.get() calls with the
+shared client (src/utils/http_client.py) against the same stub over TLS,
+counting the connections, hence handshakes, each one opens.
+"""
+import concurrent.futures
+import json
+import os
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+import requests
+from flask.cli import with_appcontext
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_self_signed_cert(directory):
+    """
+    Writes a throwaway certificate and key for 127.0.0.1.
+
+    Returns:
+        (certificate path, key path)
+    """
+    import datetime
+    import ipaddress
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "stub.crt"), os.path.join(directory, "stub.key")
+    with open(cert_path, "wb") as handle:
+        handle.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as handle:
+        handle.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+class _CountingServer(ThreadingHTTPServer):
+    """Counts the connections it accepts (one per TCP/TLS handshake)."""
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def start_mapbox_stub(latency, ssl_context=None):
+    """
+    Starts a Matrix API stub (HTTP/1.1, keep-alive) on a free local port.
+
+    Args:
+        latency: Seconds each answer is delayed
+        ssl_context: Server-side ssl.SSLContext to serve HTTPS
+
+    Returns:
+        (server, base URL); server.connections counts accepted connections,
+        call server.shutdown() when done
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def do_GET(self):
+            time.sleep(latency)
+            parsed = urllib.parse.urlsplit(self.path)
+            query = urllib.parse.parse_qs(parsed.query)
+            n_coords = parsed.path.rsplit("/", 1)[-1].count(";") + 1
+            rows = len(query["sources"][0].split(";")) if "sources" in query else n_coords
+            cols = len(query["destinations"][0].split(";")) if "destinations" in query else n_coords
+            body = json.dumps({
+                "code": "Ok",
+                "distances": [[5000.0] * cols for _ in range(rows)],
+                "durations": [[600.0] * cols for _ in range(rows)],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _CountingServer(("127.0.0.1", 0), Handler)
+    if ssl_context is not None:
+        server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scheme = "https" if ssl_context is not None else "http"
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_listening(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_quotes(base_url, total, concurrency, vehicle_type, offset=0):
+    """
+    Sends `total` quotes from `concurrency` threads; quote i uses coordinates
+    derived from offset + i.
+
+    Returns:
+        Dict with elapsed seconds, quotes/s, error count and latency percentiles (ms)
+    """
+    local = threading.local()
+
+    def quote(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        # Coordenadas distintas por cotización: ninguna sale de la caché de rutas
+        i += offset
+        payload = {
+            "current_location": [-70.60 + i * 0.01, -33.40],
+            "destination": [-70.65, -33.45 - i * 0.01],
+            "vehicle_type": vehicle_type,
+        }
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/api/pricing/calculate", json=payload, timeout=60)
+            ok = response.status_code == 200 and response.json().get("breakdown", {}).get("route_source") == "mapbox"
+        except (requests.exceptions.RequestException, ValueError):
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(quote, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    return {
+        "elapsed_s": elapsed,
+        "quotes_per_s": total / elapsed,
+        "errors": sum(1 for ok, _ in results if not ok),
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+@click.command("quote-load-test")
+@click.option("--worker-class", "worker_classes", multiple=True,
+              help="Worker classes to compare (default: sync, gthread and gevent if installed).")
+@click.option("--requests", "total", default=200, show_default=True, help="Quotes per worker class.")
+@click.option("--concurrency", default=32, show_default=True, help="Concurrent client threads.")
+@click.option("--latency", default=0.2, show_default=True, help="Seconds the Mapbox stub takes to answer.")
+@click.option("--threads", default=8, show_default=True, help="GUNICORN_THREADS for gthread.")
+@click.option("--vehicle-type", default="sedan", show_default=True)
+@click.option("--app", "app_path", default="wsgi:app", show_default=True, help="WSGI app gunicorn loads.")
+@with_appcontext
+def quote_load_test_command(worker_classes, total, concurrency, latency, threads, vehicle_type, app_path):
+    """Measures quote throughput of one gunicorn worker per worker class."""
+    from src.models import PricingConfig
+    from src.models.pricing_logic import get_pricing_snapshot
+
+    if get_pricing_snapshot(PricingConfig) is None:
+        raise click.ClickException("No PricingConfig in the configured database")
+
+    if not worker_classes:
+        worker_classes = ["sync", "gthread"]
+        try:
+            import gevent  # noqa: F401
+            worker_classes.append("gevent")
+        except ImportError:
+            pass
+
+    stub, stub_url = start_mapbox_stub(latency)
+    click.echo(f"Mapbox stub at {stub_url}, {latency * 1000:.0f} ms per call; "
+               f"{total} quotes from {concurrency} clients per worker class")
+    click.echo(f"{'worker':<10} {'quotes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    try:
+        for worker_class in worker_classes:
+            port = _free_port()
+            env = dict(
+                os.environ,
+                MAPBOX_API_URL=stub_url,
+                ROUTING_MODE="mapbox",
+                ROUTING_LATENCY_BUDGET_SECONDS=str(max(latency * 10, 5)),
+                ROUTE_CACHE_BACKEND="memory",
+                GUNICORN_WORKER_CLASS=worker_class,
+                # gunicorn turns sync workers with threads > 1 into gthread ones
+                GUNICORN_THREADS=str(threads if worker_class == "gthread" else 1),
+                WEB_CONCURRENCY="1",
+            )
+            process = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", os.path.join(PROJECT_ROOT, "gunicorn.conf.py"),
+                 "--bind", f"127.0.0.1:{port}", app_path],
+                cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                if not _wait_until_listening(port, process):
+                    click.echo(f"{worker_class:<10} gunicorn did not start")
+                    continue
+                warm_up = min(concurrency, total)
+                run_quotes(f"http://127.0.0.1:{port}", warm_up, concurrency, vehicle_type)
+                result = run_quotes(f"http://127.0.0.1:{port}", total, concurrency, vehicle_type, offset=warm_up)
+                click.echo(f"{worker_class:<10} {result['quotes_per_s']:>9.1f} {result['p50_ms']:>8.0f} "
+                           f"{result['p95_ms']:>8.0f} {result['errors']:>7}")
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    finally:
+        stub.shutdown()
+
+
+@click.command("http-client-benchmark")
+@click.option("--calls", default=100, show_default=True, help="Sequential calls per client.")
+@click.option("--latency", default=0.0, show_default=True, help="Seconds the stub takes to answer.")
+def http_client_benchmark_command(calls, latency):
+    """Connections and ms per call: requests.get() vs the shared pooled client."""
+    from src.utils.http_client import http_client
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = make_self_signed_cert(directory)
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert_path, key_path)
+        stub, stub_url = start_mapbox_stub(latency, ssl_context=context)
+        url = f"{stub_url}/directions-matrix/v1/mapbox/driving-traffic/-70.6,-33.4;-70.65,-33.45"
+        http_client.register("benchmark-stub", stub_url, retries=0)
+
+        clients = [
+            ("requests.get", lambda: requests.get(url, verify=cert_path, timeout=10)),
+            ("http_client", lambda: http_client.get("benchmark-stub", url, verify=cert_path)),
+        ]
+        click.echo(f"{calls} sequential HTTPS calls to a local stub ({latency * 1000:.0f} ms per answer)")
+        click.echo(f"{'client':<14} {'connections':>11} {'ms/call':>8}")
+        try:
+            for label, call in clients:
+                before = stub.connections
+                start = time.perf_counter()
+                for _ in range(calls):
+                    call().raise_for_status()
+                per_call = (time.perf_counter() - start) / calls
+                click.echo(f"{label:<14} {stub.connections - before:>11} {per_call * 1000:>8.2f}")
+        finally:
+            stub.shutdown()
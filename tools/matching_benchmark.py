@@ -0,0 +1,165 @@
+"""
+Provider matching benchmarks.
+
+    flask provider-match-benchmark [--sizes 1000,5000,20000] [--runs 20]
+
+Inserts synthetic providers (50 zones, 3 zones and 2 of 4 vehicle types each,
+80% available) into the configured database inside a transaction that is
+rolled back at the end, and times find_matching_providers (indexed join on
+provider_service_zones / provider_vehicle_types) against the former linear
+scan (load every available provider, json.loads both lists, filter in Python).
+Use a development database: the rows are never committed, but the
+transaction holds its locks while the benchmark runs.
+
+    flask provider-index-benchmark [--providers 10000] [--queries 2000]
+
+Loads random provider positions over the Dublin area into the spatial index
+(src/utils/spatial_index.py) and times k-nearest queries against a linear
+scan computing the distance to every provider, checking both agree.
+"""
+import heapq
+import json
+import random
+import time
+from types import SimpleNamespace
+
+import click
+from flask.cli import with_appcontext
+
+ZONES = [f"Z{i}" for i in range(50)]
+VEHICLE_TYPES = ["sedan", "suv", "van", "truck"]
+# Área de Dublín (lat, lon)
+DUBLIN_BOUNDS = ((53.25, 53.45), (-6.45, -6.05))
+
+
+def linear_scan_matching(service_request, User):
+    """find_matching_providers as it was before the match tables: full scan plus JSON parsing."""
+    matching = []
+    for provider in User.query.filter_by(user_type='provider', is_available=True).all():
+        zones = json.loads(provider.service_zones_json or "[]")
+        vehicle_types = json.loads(provider.accepted_vehicle_types_json or "[]")
+        if service_request.current_location_zone in zones and service_request.vehicle_type in vehicle_types:
+            matching.append(provider)
+    return matching
+
+
+def insert_synthetic_providers(db, User, ProviderServiceZone, ProviderVehicleType, first, count, rng):
+    """Bulk-inserts providers first..first+count-1 with their match rows (no commit)."""
+    from sqlalchemy import insert, select
+
+    users, plans = [], []
+    for n in range(first, first + count):
+        zones = rng.sample(ZONES, 3)
+        vehicle_types = rng.sample(VEHICLE_TYPES, 2)
+        users.append({
+            "fullname": f"Benchmark provider {n}",
+            "email": f"benchmark-provider-{n}@example.invalid",
+            "password_hash": "x",
+            "user_type": "provider",
+            "is_available": rng.random() < 0.8,
+            "service_zones_json": json.dumps(zones),
+            "accepted_vehicle_types_json": json.dumps(vehicle_types),
+        })
+        plans.append((f"benchmark-provider-{n}@example.invalid", zones, vehicle_types))
+    db.session.execute(insert(User), users)
+    ids = dict(db.session.execute(
+        select(User.email, User.id).where(User.email.in_([email for email, _, _ in plans]))
+    ).all())
+    db.session.execute(insert(ProviderServiceZone), [
+        {"provider_id": ids[email], "zone": zone} for email, zones, _ in plans for zone in zones
+    ])
+    db.session.execute(insert(ProviderVehicleType), [
+        {"provider_id": ids[email], "vehicle_type": vehicle_type}
+        for email, _, vehicle_types in plans for vehicle_type in vehicle_types
+    ])
+
+
+def time_per_call(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    return (time.perf_counter() - start) / runs, result
+
+
+@click.command("provider-match-benchmark")
+@click.option("--sizes", default="1000,5000,20000", show_default=True, help="Provider counts to measure.")
+@click.option("--runs", default=20, show_default=True, help="Matches timed per size and method.")
+@with_appcontext
+def provider_match_benchmark_command(sizes, runs):
+    """Dispatch matching latency vs provider count: indexed join vs linear scan."""
+    from src import db
+    from src.models import User, ProviderServiceZone, ProviderVehicleType
+    from src.utils.service_assignment import find_matching_providers
+
+    rng = random.Random(42)
+    request = SimpleNamespace(current_location_zone="Z7", vehicle_type="sedan")
+    click.echo(f"{'providers':>9} {'matches':>8} {'join ms':>8} {'scan ms':>8}")
+    inserted = 0
+    try:
+        for size in sorted(int(s) for s in sizes.split(",")):
+            insert_synthetic_providers(db, User, ProviderServiceZone, ProviderVehicleType, inserted, size - inserted, rng)
+            inserted = size
+            db.session.flush()
+            join_s, matches = time_per_call(lambda: find_matching_providers(request, db, User), runs)
+            db.session.expunge_all()  # the scan must load and parse every row again, as before
+            scan_s, scanned = time_per_call(lambda: linear_scan_matching(request, User), runs)
+            assert {p.id for p in matches} == {p.id for p in scanned}
+            db.session.expunge_all()
+            click.echo(f"{size:>9} {len(matches):>8} {join_s * 1000:>8.2f} {scan_s * 1000:>8.2f}")
+    finally:
+        db.session.rollback()
+
+
+def linear_scan_nearest(positions, lat, lon, vehicle_type, k, radius_km):
+    """k nearest by computing the distance to every provider (the pre-index approach)."""
+    from src.utils.spatial_index import haversine_km
+
+    candidates = (
+        (haversine_km(lat, lon, p_lat, p_lon), provider_id)
+        for provider_id, (p_lat, p_lon, vehicle_types) in positions.items()
+        if vehicle_type in vehicle_types
+    )
+    in_range = [(distance, provider_id) for distance, provider_id in candidates if distance <= radius_km]
+    return [(provider_id, distance) for distance, provider_id in heapq.nsmallest(k, in_range)]
+
+
+@click.command("provider-index-benchmark")
+@click.option("--providers", default=10000, show_default=True)
+@click.option("--queries", default=2000, show_default=True)
+@click.option("--k", default=10, show_default=True)
+@click.option("--radius-km", default=10.0, show_default=True)
+def provider_index_benchmark_command(providers, queries, k, radius_km):
+    """k-nearest query time: spatial grid index vs linear scan."""
+    from src.utils.spatial_index import ProviderSpatialIndex
+
+    rng = random.Random(42)
+    (lat_min, lat_max), (lon_min, lon_max) = DUBLIN_BOUNDS
+    positions = {
+        provider_id: (rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max),
+                      frozenset(rng.sample(VEHICLE_TYPES, 2)))
+        for provider_id in range(1, providers + 1)
+    }
+    index = ProviderSpatialIndex()
+    start = time.perf_counter()
+    for provider_id, (lat, lon, vehicle_types) in positions.items():
+        index.update(provider_id, lat, lon, vehicle_types)
+    load_s = time.perf_counter() - start
+
+    points = [(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max), rng.choice(VEHICLE_TYPES))
+              for _ in range(queries)]
+    start = time.perf_counter()
+    indexed = [index.nearest(lat, lon, vehicle_type, k=k, radius_km=radius_km) for lat, lon, vehicle_type in points]
+    index_s = (time.perf_counter() - start) / queries
+    scan_points = points[:max(1, queries // 10)]  # the scan is slow; a sample is enough
+    start = time.perf_counter()
+    scanned = [linear_scan_nearest(positions, lat, lon, vehicle_type, k, radius_km)
+               for lat, lon, vehicle_type in scan_points]
+    scan_s = (time.perf_counter() - start) / len(scan_points)
+
+    mismatches = sum(
+        [p for p, _ in a] != [p for p, _ in b] for a, b in zip(indexed, scanned)
+    )
+    click.echo(f"{providers} providers indexed in {load_s * 1000:.1f} ms; k={k}, radius {radius_km} km")
+    click.echo(f"grid index   {index_s * 1e6:>9.1f} us/query ({queries} queries)")
+    click.echo(f"linear scan  {scan_s * 1e6:>9.1f} us/query ({len(scan_points)} queries)")
+    click.echo(f"speed-up     {scan_s / index_s:>9.1f}x, {mismatches} mismatching results")
@@ -0,0 +1,122 @@
+"""
+API serialization benchmark: ORM to_dict() + jsonify vs column tuples + fast encoder.
+
+    flask serialization-benchmark [--rows 100000] [--runs 3]
+
+Inserts --rows synthetic service requests and as many users (half of them
+providers, sharing a few zone / vehicle type lists) inside a transaction that
+is rolled back at the end, then times both ways of producing the listing
+body, from the query to the encoded bytes:
+
+- old: Model.query.all(), to_dict() per row, flask.jsonify
+- new: select() of the listed columns as tuples, rows_to_dicts /
+  user_rows_to_dicts, dumps() (src/utils/serialization.py)
+
+Both bodies are decoded and compared. The best of --runs is reported.
+"""
+import datetime
+import json
+import random
+import time
+
+import click
+from flask import jsonify
+from flask.cli import with_appcontext
+
+from tools.matching_benchmark import VEHICLE_TYPES, ZONES
+
+
+def _insert_rows(db, ServiceRequest, User, rows, rng):
+    from sqlalchemy import insert
+
+    zone_lists = [json.dumps(rng.sample(ZONES, 3)) for _ in range(20)]
+    vehicle_lists = [json.dumps(rng.sample(VEHICLE_TYPES, 2)) for _ in range(6)]
+    db.session.execute(insert(User), [
+        {
+            "fullname": f"Serialization user {n}",
+            "email": f"serialization-{n}@example.invalid",
+            "password_hash": "x",
+            "user_type": "provider" if n % 2 else "customer",
+            "is_available": bool(n % 3),
+            "service_zones_json": rng.choice(zone_lists) if n % 2 else None,
+            "accepted_vehicle_types_json": rng.choice(vehicle_lists) if n % 2 else None,
+        }
+        for n in range(rows)
+    ])
+    start = datetime.datetime(2026, 1, 1)
+    db.session.execute(insert(ServiceRequest), [
+        {
+            "current_location": f"{n} Benchmark Street, Dublin",
+            "current_location_zone": rng.choice(ZONES),
+            "pickup_latitude": 53.35, "pickup_longitude": -6.26,
+            "destination": "Benchmark garage",
+            "vehicle_type": rng.choice(VEHICLE_TYPES),
+            "price": round(rng.uniform(40, 200), 2),
+            "status": "Completed",
+            "created_at": start + datetime.timedelta(minutes=n),
+            "updated_at": start + datetime.timedelta(minutes=n),
+        }
+        for n in range(rows)
+    ])
+    db.session.flush()
+
+
+def _best_of(fn, runs, db):
+    best, body = None, None
+    for _ in range(runs):
+        db.session.expunge_all()  # each run loads the rows again
+        start = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+@click.command("serialization-benchmark")
+@click.option("--rows", default=100000, show_default=True, help="Service requests and users inserted.")
+@click.option("--runs", default=3, show_default=True)
+@with_appcontext
+def serialization_benchmark_command(rows, runs):
+    """Listing serialization time: to_dict() + jsonify vs column tuples + fast encoder."""
+    from sqlalchemy import select
+    from src import db
+    from src.models import ServiceRequest, User
+    from src.utils.serialization import (
+        ENCODER_NAME, PROVIDER_FIELDS, SERVICE_REQUEST_FIELDS, USER_FIELDS,
+        dumps, rows_to_dicts, user_rows_to_dicts,
+    )
+
+    user_filter = User.email.like("serialization-%@example.invalid")
+    request_filter = ServiceRequest.destination == "Benchmark garage"
+    cases = [
+        (
+            "service_requests",
+            lambda: jsonify([r.to_dict() for r in ServiceRequest.query.filter(request_filter)
+                             .order_by(ServiceRequest.id).all()]).get_data(),
+            lambda: dumps(rows_to_dicts(db.session.execute(
+                select(*(getattr(ServiceRequest, c) for c in SERVICE_REQUEST_FIELDS))
+                .where(request_filter).order_by(ServiceRequest.id)
+            ).all(), SERVICE_REQUEST_FIELDS)),
+        ),
+        (
+            "users",
+            lambda: jsonify([u.to_dict() for u in User.query.filter(user_filter).order_by(User.id).all()]).get_data(),
+            lambda: dumps(user_rows_to_dicts(db.session.execute(
+                select(*(getattr(User, c) for c in USER_FIELDS + PROVIDER_FIELDS))
+                .where(user_filter).order_by(User.id)
+            ).all())),
+        ),
+    ]
+
+    click.echo(f"{rows} rows per listing, encoder {ENCODER_NAME}, best of {runs}")
+    click.echo(f"{'listing':<17} {'old ms':>9} {'new ms':>9} {'speed-up':>9}")
+    try:
+        _insert_rows(db, ServiceRequest, User, rows, random.Random(42))
+        for name, old, new in cases:
+            old_s, old_body = _best_of(old, runs, db)
+            new_s, new_body = _best_of(new, runs, db)
+            same = json.loads(old_body) == json.loads(new_body)
+            click.echo(f"{name:<17} {old_s * 1000:>9.1f} {new_s * 1000:>9.1f} {old_s / new_s:>8.1f}x"
+                       f"{'' if same else '  (bodies differ!)'}")
+    finally:
+        db.session.rollback()